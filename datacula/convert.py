@@ -163,7 +163,7 @@ def kappa_volume_solute(
         The volume of solute as a numpy array.
     """
 
-    kappa = max(kappa, 1e-16)  # Avoid division by zero
+    kappa = np.maximum(kappa, 1e-16)  # Avoid division by zero
 
     vol_factor = (water_activity - 1) / (
             water_activity * (1 - kappa - 1 / water_activity)
@@ -191,7 +191,7 @@ def kappa_volume_water(
         The volume of water as a float.
     """
     # Avoid division by zero
-    water_activity = min(water_activity, 1 - 1e-16)
+    water_activity = np.minimum(water_activity, 1 - 1e-16)
 
     return volume_solute * kappa / (1 / water_activity - 1)
 
@@ -383,6 +383,33 @@ def effective_refractive_index(
     return (2*r_effective + 1) / (1-r_effective)
 
 
+def sizer_bin_log_widths(diameter: np.ndarray) -> np.ndarray:
+    """
+    Computes the log10 width of each sizer bin, log10(D_upper/D_lower).
+
+    The bin width is defined as the  difference between the upper and lower
+    diameter limits of each bin. This function calculates the bin widths
+    based on the input diameter array. Assumes a log10 scale for dp edges.
+
+    Parameters:
+    -----------
+        diameter (np.ndarray): Array of particle diameters (bin centers).
+
+    Returns:
+    -----------
+        np.ndarray: Array of log10 bin widths, same length as diameter.
+    """
+    # Compute the bin widths
+    delta = np.zeros_like(diameter)
+    delta[:-1] = np.diff(diameter)
+    delta[-1] = delta[-2]**2/delta[-3]
+
+    # Compute the lower and upper bin edges
+    lower = diameter - delta/2
+    upper = diameter + delta/2
+    return np.log10(upper/lower)
+
+
 def convert_sizer_dn(
             diameter: np.ndarray,
             dn_dlogdp: np.ndarray,
@@ -399,7 +426,8 @@ def convert_sizer_dn(
     -----------
         diameter (np.ndarray): Array of particle diameters.
         dn_dlogdp (np.ndarray): Array of number concentration of particles per
-        unit logarithmic diameter.
+        unit logarithmic diameter. Can be 2-D with the bins along the last
+        axis, e.g. (time, bins), which converts every row at once.
         inverse (bool): If True, converts from d_num to dn/dlogdp.
 
     Returns:
@@ -415,39 +443,38 @@ def convert_sizer_dn(
 
     # TODO: Address potential over-counting in last/first bin
     """
-    assert len(diameter) == len(dn_dlogdp) > 0, \
+    assert len(diameter) == np.shape(dn_dlogdp)[-1] > 0, \
         "Inputs must be non-empty arrays of the same length."
 
-    # Compute the bin widths
-    delta = np.zeros_like(diameter)
-    delta[:-1] = np.diff(diameter)
-    delta[-1] = delta[-2]**2/delta[-3]
-
-    # Compute the lower and upper bin edges
-    lower = diameter - delta/2
-    upper = diameter + delta/2
+    log_widths = sizer_bin_log_widths(diameter)
 
     if inverse:
         # Convert from dn to dn/dlogdp
-        return dn_dlogdp / np.log10(upper/lower)
+        return dn_dlogdp / log_widths
 
     # Convert from dn/dlogdp to dn
-    d_num = dn_dlogdp * np.log10(upper/lower)
+    d_num = dn_dlogdp * log_widths
     return d_num
 
 
 def datetime64_from_epoch_array(
         epoch_array: np.ndarray,
-        delta: int = 0) -> np.ndarray:
+        delta: int = 0,
+        unit: str = 's') -> np.ndarray:
     """
     Converts an array of epoch times to a numpy array of datetime64 objects.
 
+    The conversion is one vectorized cast, fractions of the unit are
+    truncated toward zero as int() does, and nan times become NaT.
+
     Parameters:
     -----------
         epoch_array (np.ndarray): Array of epoch times (in seconds since
             the Unix epoch).
         delta (int): An optional offset (in seconds) to add to the epoch times
             before converting to datetime64 objects.
+        unit (str): Precision of the result, 's', 'ms' or 'us'. Defaults
+            to 's'.
 
     Returns:
     --------
@@ -455,13 +482,51 @@ def datetime64_from_epoch_array(
             epoch times.
     """
     assert len(epoch_array) > 0, "Input epoch_array must not be empty."
-    # assert np.issubdtype(epoch_array.dtype, np.integer), \
-    #     "Input epoch_array must be an array of integers."
+    per_second = {'s': 1, 'ms': 1_000, 'us': 1_000_000}
+    assert unit in per_second, "unit must be 's', 'ms' or 'us'."
 
     # Convert epoch times to datetime64 objects with an optional offset
-    return np.array(
-        [np.datetime64(int(epoch+delta), 's') for epoch in epoch_array]
-        )
+    epoch = np.asarray(epoch_array) + delta
+    if np.issubdtype(epoch.dtype, np.integer):
+        return (epoch * per_second[unit]).astype(f'datetime64[{unit}]')
+
+    epoch = epoch.astype(float) * per_second[unit]
+    finite = np.isfinite(epoch)
+    with np.errstate(invalid='ignore'):
+        datetimes = np.where(finite, epoch, 0).astype(np.int64)
+    datetimes = datetimes.astype(f'datetime64[{unit}]')
+    datetimes[~finite] = np.datetime64('NaT')
+    return datetimes
+
+
+def time_window_slice(
+        time: np.ndarray,
+        start: float = None,
+        stop: float = None) -> slice:
+    """
+    Finds the slice of a sorted time array inside a time window, with a
+    binary search, so only O(log n) elements of time are read. Useful on
+    memory-mapped streams, where slicing data with the result only reads
+    the pages of the window.
+
+    Parameters:
+    -----------
+        time (np.ndarray): Sorted array of epoch times.
+        start (float): Start of the window, inclusive. None for the start
+            of the array.
+        stop (float): Stop of the window, exclusive. None for the end of
+            the array.
+
+    Returns:
+    --------
+        slice: The index slice of the window, for time[window] and
+            data[:, window].
+    """
+    start_index = 0 if start is None \
+        else int(np.searchsorted(time, start, side='left'))
+    stop_index = len(time) if stop is None \
+        else int(np.searchsorted(time, stop, side='left'))
+    return slice(start_index, max(start_index, stop_index))
 
 
 def list_to_dict(list_of_str: list) -> dict:
@@ -7,9 +7,9 @@
 from typing import Tuple, List, Optional
 import os
 import numpy as np
-from datacula import loader, stats
+from datacula import loader, stats, stream_processes
 from datacula import convert
-from datacula.stream import Stream
+from datacula.stream import Stream, StreamAveraged
 
 
 class Lake():
@@ -40,6 +40,8 @@ class Lake():
         initialise_datastream: Initialises a datastream using the settings in
             the DataLake object.
         reaverage_datastream: Reaverages the data in the specified datastream.
+        build_average_pyramids: Precomputes averaging levels of datastreams.
+        average_datastream: Returns a datastream averaged to any interval.
         remove_zeros: Removes filter/zeros from the specified datastream.
 
     Example usage:
@@ -83,6 +85,10 @@ class Lake():
         # dictionary of datastreams to be filled in by the add_data function
         self.datastreams = {}
         self.utc_to_local = utc_to_local
+        # derived averages, see build_average_pyramids, not saved
+        self._average_pyramids = {}
+        self._average_cache = {}
+        self._average_sources = {}
 
     def info(
             self,
@@ -194,6 +200,7 @@ class Lake():
         ----------
             None.
         """
+        self._drop_derived_averages(key)
         self.datastreams[key] = DataStream(
             data_stream_header,
             average_times,
@@ -238,6 +245,116 @@ class Lake():
                 epoch_end=epoch_end
             )
 
+    def build_average_pyramids(
+                self,
+                stream_keys: Optional[List[str]] = None,
+                levels: tuple = stream_processes.PYRAMID_LEVELS
+            ) -> None:
+        """
+        Precomputes the averaging pyramid of datastreams, one pass over the
+        raw data, so average_datastream can serve any interval from it.
+
+        Parameters
+        ----------
+        stream_keys : list of str, optional
+            The keys of the datastreams, by default all datastreams.
+        levels : tuple, optional
+            The pyramid bin widths in seconds, by default
+            stream_processes.PYRAMID_LEVELS.
+        """
+        self._ensure_average_cache()
+        if stream_keys is None:
+            stream_keys = self.list_datastreams()
+        for key in stream_keys:
+            self._drop_derived_averages(key)
+            self._average_pyramids[key] = \
+                stream_processes.build_average_pyramid(
+                    self.datastreams[key], levels=levels)
+            self._average_sources[key] = self._stream_state(key)
+
+    def average_datastream(
+                self,
+                key: str,
+                average_window: float
+            ) -> StreamAveraged:
+        """
+        Returns the datastream averaged to average_window seconds.
+
+        The average is merged from the coarsest pyramid level that divides
+        average_window, see build_average_pyramids, and cached, so switching
+        between intervals does not rescan the raw data. Intervals that no
+        level divides, or datastreams without a pyramid, are averaged from
+        the raw data. The pyramid and the cached averages are dropped once
+        the datastream is replaced, appended to or given new channels, call
+        build_average_pyramids again to restore the pyramid.
+
+        Parameters
+        ----------
+        key : str
+            The key of the datastream.
+        average_window : float
+            The bin width in seconds.
+
+        Returns
+        -------
+        StreamAveraged
+            The averaged datastream, shared with the cache, copy it before
+            modifying.
+        """
+        self._ensure_average_cache()
+        self._check_average_source(key)
+        cache_key = (key, float(average_window))
+        if cache_key in self._average_cache:
+            return self._average_cache[cache_key]
+        pyramid = self._average_pyramids.get(key)
+        if pyramid is not None and stream_processes.pyramid_level_for(
+                pyramid, average_window) is not None:
+            averaged = stream_processes.average_from_pyramid(
+                pyramid, average_window)
+        else:
+            averaged = stream_processes.average_stream(
+                self.datastreams[key], average_window)
+        self._average_cache[cache_key] = averaged
+        return averaged
+
+    def _ensure_average_cache(self) -> None:
+        """Adds the average caches to lakes loaded from older saves."""
+        if not hasattr(self, '_average_pyramids'):
+            self._average_pyramids = {}
+        if not hasattr(self, '_average_cache'):
+            self._average_cache = {}
+        if not hasattr(self, '_average_sources'):
+            self._average_sources = {}
+
+    def _stream_state(self, key: str) -> tuple:
+        """The datastream, its data array and its time and header lengths."""
+        stream = self.datastreams[key]
+        return (stream, stream.data, len(stream.time), len(stream.header))
+
+    def _check_average_source(self, key: str) -> None:
+        """Drops the derived averages of a datastream changed since."""
+        state = self._stream_state(key)
+        cached = self._average_sources.get(key)
+        if cached is not None and (
+                cached[0] is not state[0] or cached[1] is not state[1]
+                or cached[2:] != state[2:]):
+            self._drop_derived_averages(key)
+        self._average_sources[key] = state
+
+    def _drop_derived_averages(self, key: str) -> None:
+        """Removes the pyramid and the cached averages of a datastream."""
+        self._ensure_average_cache()
+        self._average_pyramids.pop(key, None)
+        self._average_sources.pop(key, None)
+        self._drop_cached_averages(key)
+
+    def _drop_cached_averages(self, key: str) -> None:
+        """Removes the cached averages of a datastream."""
+        for cache_key in [
+                cache_key for cache_key in self._average_cache
+                if cache_key[0] == key]:
+            del self._average_cache[cache_key]
+
     def import_sizer_data(
                 self,
                 path: str,
@@ -260,29 +377,28 @@ class Lake():
             1D sizer data.
         """
 
-        data = loader.data_raw_loader(path)
-
         # Determine the date offset
         if 'date_location' in self.settings[key]:
-            date_offset = loader.non_standard_date_location(
-                    data=data,
+            date_offset = loader.file_date_offset(
+                    file_path=path,
                     date_location=self.settings[key]['date_location']
                 )
         else:
             date_offset = None
 
-        # Format the data
-        epoch_time, dp_header, data_2d, data_1d = loader.sizer_data_formatter(
-            data=data,
-            data_checks=self.settings[key]['data_checks'],
-            data_sizer_reader=self.settings[key]['data_sizer_reader'],
-            time_column=self.settings[key]['time_column'],
-            time_format=self.settings[key]['time_format'],
-            delimiter=self.settings[key]['data_delimiter'],
-            date_offset=date_offset,
-            seconds_shift=self.settings[key]['Time_shift_sec'],
-            timezone_identifier=self.settings[key]['timezone_identifier']
-        )
+        # Format the data, the file is streamed in row blocks
+        epoch_time, dp_header, data_2d, data_1d = \
+            loader.sizer_data_formatter_chunked(
+                file_path=path,
+                data_checks=self.settings[key]['data_checks'],
+                data_sizer_reader=self.settings[key]['data_sizer_reader'],
+                time_column=self.settings[key]['time_column'],
+                time_format=self.settings[key]['time_format'],
+                delimiter=self.settings[key]['data_delimiter'],
+                date_offset=date_offset,
+                seconds_shift=self.settings[key]['Time_shift_sec'],
+                timezone_identifier=self.settings[key]['timezone_identifier']
+            )
 
         # check data shape
         data_2d = convert.data_shape_check(
@@ -318,19 +434,17 @@ class Lake():
             Epoch time and data formatted as 2D array, transposed
             (time along the first axis).
         """
-        data = loader.data_raw_loader(path)
-
-        # Code spell with sizer data, should consolidate.
         if 'date_location' in self.settings[key].keys():
-            date_offset = loader.non_standard_date_location(
-                    data=data,
+            date_offset = loader.file_date_offset(
+                    file_path=path,
                     date_location=self.settings[key]['date_location']
                 )
         else:
             date_offset = None
 
-        epoch_time, data = loader.general_data_formatter(
-            data=data,
+        # the file is streamed in row blocks, not loaded whole
+        epoch_time, data = loader.general_data_formatter_chunked(
+            file_path=path,
             data_checks=self.settings[key]['data_checks'],
             data_column=self.settings[key]['data_column'],
             time_column=self.settings[key]['time_column'],
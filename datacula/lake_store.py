@@ -0,0 +1,454 @@
+"""Columnar on-disk store for a Lake, one directory of .npy files per stream.
+
+Layout of a store directory:
+
+    manifest.json               lake attributes and the stream index
+    streams/<name>_<hash>/      one directory per stream
+        meta.json               class, non-array fields, array field names
+        time.npy, data.npy ...  one .npy file per array field
+
+Stream directories are named by a fingerprint of their content, so a save
+only writes streams that changed, and a save is atomic: new directories are
+written first, then the manifest is replaced, then stale directories are
+removed. Streams are read lazily on first access, see LazyStreamDict, and
+the arrays can be memory-mapped read-only, so only the pages actually used
+are read from disk.
+"""
+
+from typing import Any, Dict, Optional
+import dataclasses
+import hashlib
+import json
+import os
+import re
+import shutil
+import numpy as np
+from datacula.lake import Lake
+from datacula.stream import Stream, StreamAveraged
+
+STORE_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+STREAMS_FOLDER = 'streams'
+META_NAME = 'meta.json'
+STREAM_CLASSES = {
+    'Stream': Stream,
+    'StreamAveraged': StreamAveraged,
+}
+
+
+def _json_default(value: Any) -> Any:
+    """Converts numpy scalars for json.dump."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(
+        f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _atomic_write_json(file_path: str, content: Any):
+    """Writes json to a temporary file and moves it in place."""
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf8') as file:
+        json.dump(content, file, default=_json_default)
+    os.replace(temp_path, file_path)
+
+
+def _atomic_save_array(file_path: str, array: np.ndarray):
+    """Writes a .npy file to a temporary file and moves it in place."""
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        np.save(file, array, allow_pickle=False)
+    os.replace(temp_path, file_path)
+
+
+def split_stream_fields(stream: Stream) -> tuple:
+    """
+    Splits the init fields of a Stream dataclass into arrays and json
+    serializable values.
+
+    Parameters:
+    ----------
+    stream : Stream
+        A Stream, or a subclass such as StreamAveraged.
+
+    Returns:
+    -------
+    tuple of (dict, dict)
+        The array fields, and the other fields.
+
+    Raises:
+    ------
+    TypeError
+        If the stream is not a known Stream dataclass.
+    """
+    if type(stream).__name__ not in STREAM_CLASSES:
+        raise TypeError(
+            f"Only {list(STREAM_CLASSES)} can be stored, " +
+            f"not {type(stream).__name__}")
+    arrays = {}
+    values = {}
+    for stream_field in dataclasses.fields(stream):
+        if not stream_field.init:
+            continue
+        value = getattr(stream, stream_field.name)
+        if isinstance(value, np.ndarray):
+            arrays[stream_field.name] = value
+        else:
+            values[stream_field.name] = value
+    return arrays, values
+
+
+def stream_fingerprint(stream: Stream) -> str:
+    """
+    Hash of the content of a stream, used to skip unchanged streams.
+
+    Parameters:
+    ----------
+    stream : Stream
+        The stream to hash.
+
+    Returns:
+    -------
+    str
+        Hex digest of the class, fields and array bytes.
+    """
+    arrays, values = split_stream_fields(stream)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(type(stream).__name__.encode())
+    digest.update(
+        json.dumps(values, sort_keys=True, default=_json_default).encode())
+    for name in sorted(arrays):
+        array = arrays[name]
+        digest.update(f"{name}{array.dtype.str}{array.shape}".encode())
+        if array.ndim < 2:
+            digest.update(np.ascontiguousarray(array).tobytes())
+        else:
+            # rows of the append buffer views are contiguous, no full copy
+            for row in array:
+                digest.update(np.ascontiguousarray(row).tobytes())
+    return digest.hexdigest()
+
+
+def write_stream(folder: str, stream: Stream):
+    """
+    Writes one stream to a folder, one .npy file per array field and the
+    other fields in meta.json.
+
+    Parameters:
+    ----------
+    folder : str
+        The stream folder, created if missing.
+    stream : Stream
+        The stream to write.
+    """
+    os.makedirs(folder, exist_ok=True)
+    arrays, values = split_stream_fields(stream)
+    for name, array in arrays.items():
+        _atomic_save_array(os.path.join(folder, f'{name}.npy'), array)
+    _atomic_write_json(
+        os.path.join(folder, META_NAME),
+        {
+            'class': type(stream).__name__,
+            'arrays': sorted(arrays),
+            'fields': values,
+        }
+    )
+
+
+def read_stream(folder: str, mmap_mode: str = None) -> Stream:
+    """
+    Reads one stream written by write_stream.
+
+    Parameters:
+    ----------
+    folder : str
+        The stream folder.
+    mmap_mode : str, optional
+        If 'r', the arrays are memory-mapped read-only instead of read into
+        memory, see numpy.load. Defaults to None.
+
+    Returns:
+    -------
+    Stream
+        The stream, of the class it was saved as.
+    """
+    with open(os.path.join(folder, META_NAME), 'r', encoding='utf8') as file:
+        meta = json.load(file)
+    kwargs = dict(meta['fields'])
+    for name in meta['arrays']:
+        kwargs[name] = np.load(
+            os.path.join(folder, f'{name}.npy'),
+            mmap_mode=mmap_mode,
+            allow_pickle=False)
+    return STREAM_CLASSES[meta['class']](**kwargs)
+
+
+def stream_fields_unchanged(folder: str, stream: Stream) -> bool:
+    """True if the non-array fields of a stream match its saved meta.json."""
+    _, values = split_stream_fields(stream)
+    with open(os.path.join(folder, META_NAME), 'r', encoding='utf8') as file:
+        meta = json.load(file)
+    return (
+        meta['class'] == type(stream).__name__
+        and json.dumps(values, sort_keys=True, default=_json_default)
+        == json.dumps(meta['fields'], sort_keys=True)
+    )
+
+
+class StoredStream:
+    """Placeholder for a stream that has not been read from the store yet.
+
+    Attributes:
+    ----------
+        store_path (str): The store directory.
+        folder (str): The stream folder name, inside the streams folder.
+        fingerprint (str): The fingerprint the stream was saved with.
+        mmap_mode (str): The numpy.load mmap_mode for the arrays.
+    """
+
+    def __init__(
+            self,
+            store_path: str,
+            folder: str,
+            fingerprint: str,
+            mmap_mode: str = None):
+        self.store_path = store_path
+        self.folder = folder
+        self.fingerprint = fingerprint
+        self.mmap_mode = mmap_mode
+
+    def load(self) -> Stream:
+        """Reads the stream from the store."""
+        return read_stream(
+            os.path.join(self.store_path, STREAMS_FOLDER, self.folder),
+            mmap_mode=self.mmap_mode)
+
+    def __repr__(self):
+        return f"StoredStream({self.folder!r})"
+
+
+class LazyStreamDict(dict):
+    """A dict of streams that reads each stream from the store the first
+    time it is accessed. Streams that are never accessed are never read,
+    and are not rewritten when the lake is saved to the same store.
+    Read-only memory-mapped streams that still hold the mapped arrays are
+    not rewritten either."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # key: (StoredStream, arrays) of the streams read with mmap_mode 'r'
+        self.mapped = {}
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, StoredStream):
+            stored = value
+            value = stored.load()
+            super().__setitem__(key, value)
+            if stored.mmap_mode == 'r':
+                self.mapped[key] = (stored, split_stream_fields(value)[0])
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            super().pop(key)
+            return value
+        return super().pop(key, *default)
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def unchanged_mapping(self, key) -> Optional[StoredStream]:
+        """Returns the placeholder of a stream read with mmap_mode 'r', if
+        the stream still holds the same read-only mapped arrays, else None.
+        The other fields of the stream still need to be compared."""
+        if key not in self.mapped:
+            return None
+        stored, mapped_arrays = self.mapped[key]
+        arrays, _ = split_stream_fields(super().__getitem__(key))
+        if arrays.keys() != mapped_arrays.keys():
+            return None
+        if all(arrays[name] is mapped_arrays[name] for name in arrays):
+            return stored
+        return None
+
+    def stored(self, key) -> Optional[StoredStream]:
+        """Returns the placeholder of a stream not read yet, else None."""
+        value = super().__getitem__(key)
+        if isinstance(value, StoredStream):
+            return value
+        return None
+
+
+def read_manifest(store_path: str) -> Dict[str, Any]:
+    """Reads the manifest of a store, an empty one if there is none."""
+    manifest_path = os.path.join(store_path, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        return {'format_version': STORE_FORMAT_VERSION,
+                'attributes': {}, 'streams': {}}
+    with open(manifest_path, 'r', encoding='utf8') as file:
+        return json.load(file)
+
+
+def is_lake_store(store_path: str) -> bool:
+    """True if the path is a lake store directory."""
+    return os.path.isfile(os.path.join(store_path, MANIFEST_NAME))
+
+
+def save_lake_store(store_path: str, lake: Lake) -> list:
+    """
+    Saves a Lake to a columnar store directory. Streams whose content is
+    unchanged since the last save to this store are not rewritten. Private
+    lake attributes (leading underscore) are derived caches and not saved.
+
+    Parameters:
+    ----------
+    store_path : str
+        The store directory, created if missing.
+    lake : Lake
+        The Lake to save.
+
+    Returns:
+    -------
+    list
+        The keys of the streams that were written.
+
+    Raises:
+    ------
+    TypeError
+        If a lake attribute is not json serializable, or a stream is not a
+        Stream dataclass.
+    """
+    store_path = os.path.abspath(store_path)
+    os.makedirs(os.path.join(store_path, STREAMS_FOLDER), exist_ok=True)
+    old_streams = read_manifest(store_path)['streams']
+
+    attributes = {
+        key: value for key, value in vars(lake).items()
+        if key != 'datastreams' and not key.startswith('_')
+    }
+    json.dumps(attributes, default=_json_default)  # fail before writing
+
+    new_streams = {}
+    used_folders = set()
+    written = []
+    for key in lake.datastreams:
+        old_entry = old_streams.get(key)
+        stored = None
+        if isinstance(lake.datastreams, LazyStreamDict):
+            stored = lake.datastreams.stored(key)
+        if (stored is not None and old_entry is not None
+                and os.path.abspath(stored.store_path) == store_path
+                and stored.folder == old_entry['folder']):
+            # never read since loaded from this store, nothing to do
+            new_streams[key] = old_entry
+            used_folders.add(old_entry['folder'])
+            continue
+
+        mapping = None
+        if isinstance(lake.datastreams, LazyStreamDict):
+            mapping = lake.datastreams.unchanged_mapping(key)
+        if (mapping is not None and old_entry is not None
+                and os.path.abspath(mapping.store_path) == store_path
+                and mapping.folder == old_entry['folder']
+                and stream_fields_unchanged(
+                    os.path.join(store_path, STREAMS_FOLDER, mapping.folder),
+                    lake.datastreams[key])):
+            # read-only mapped arrays of this folder, skip hashing them
+            new_streams[key] = old_entry
+            used_folders.add(old_entry['folder'])
+            continue
+
+        stream = lake.datastreams[key]
+        fingerprint = stream_fingerprint(stream)
+        if (old_entry is not None
+                and old_entry['fingerprint'] == fingerprint
+                and old_entry['folder'] not in used_folders
+                and os.path.isdir(os.path.join(
+                    store_path, STREAMS_FOLDER, old_entry['folder']))):
+            new_streams[key] = old_entry
+            used_folders.add(old_entry['folder'])
+            continue
+
+        safe_key = re.sub(r'[^A-Za-z0-9_.-]', '_', str(key))
+        folder = f'{safe_key}_{fingerprint}'
+        count = 1
+        while folder in used_folders or folder in {
+                entry['folder'] for entry in old_streams.values()}:
+            folder = f'{safe_key}_{fingerprint}_{count}'
+            count += 1
+        write_stream(os.path.join(store_path, STREAMS_FOLDER, folder), stream)
+        new_streams[key] = {'folder': folder, 'fingerprint': fingerprint}
+        used_folders.add(folder)
+        written.append(key)
+
+    _atomic_write_json(
+        os.path.join(store_path, MANIFEST_NAME),
+        {
+            'format_version': STORE_FORMAT_VERSION,
+            'attributes': attributes,
+            'streams': new_streams,
+        }
+    )
+
+    # remove the stream folders no longer in the manifest
+    for folder in os.listdir(os.path.join(store_path, STREAMS_FOLDER)):
+        if folder not in used_folders:
+            shutil.rmtree(
+                os.path.join(store_path, STREAMS_FOLDER, folder),
+                ignore_errors=True)
+    return written
+
+
+def load_lake_store(store_path: str, mmap_mode: str = None) -> Lake:
+    """
+    Loads a Lake from a columnar store directory. The streams are read
+    lazily, on first access through lake.datastreams.
+
+    Parameters:
+    ----------
+    store_path : str
+        The store directory.
+    mmap_mode : str, optional
+        If 'r', the stream arrays are memory-mapped read-only, so only the
+        parts used are read from disk, e.g. a time window selected with
+        convert.time_window_slice. Defaults to None, read into memory.
+
+    Returns:
+    -------
+    Lake
+        The loaded Lake.
+
+    Raises:
+    ------
+    FileNotFoundError
+        If the directory is not a lake store.
+    ValueError
+        If the store was written by a newer format version.
+    """
+    if not is_lake_store(store_path):
+        raise FileNotFoundError(f"No lake store found at: {store_path}")
+    store_path = os.path.abspath(store_path)
+    manifest = read_manifest(store_path)
+    if manifest['format_version'] > STORE_FORMAT_VERSION:
+        raise ValueError(
+            f"Lake store format {manifest['format_version']} is newer " +
+            f"than the supported {STORE_FORMAT_VERSION}")
+
+    attributes = dict(manifest['attributes'])
+    lake = Lake(settings=attributes.pop('settings', {}))
+    vars(lake).update(attributes)
+    lake.datastreams = LazyStreamDict({
+        key: StoredStream(
+            store_path, entry['folder'], entry['fingerprint'], mmap_mode)
+        for key, entry in manifest['streams'].items()
+    })
+    return lake
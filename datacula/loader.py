@@ -1,9 +1,12 @@
 """File readers and loaders for datacula."""
 # pylint: disable=all
 
-from typing import List, Union, Tuple, Dict, Any
+from typing import List, Union, Tuple, Dict, Any, Iterator, Iterable
+from collections import deque
+from itertools import islice
 import warnings
 import glob
+import fnmatch
 import os
 import pickle
 import netCDF4 as nc
@@ -11,9 +14,26 @@ import numpy as np
 import pandas as pd
 
 from datacula import convert
-from datacula.time_manage import time_str_to_epoch
+from datacula.time_manage import time_str_to_epoch, time_str_to_epoch_array
 
 FILTER_WARNING_FRACTION = 0.5
+CHUNK_SIZE_ROWS = 10000
+TRUE_MATCH = [
+    'ON', 'on', 'On', 'oN', '1', 'True', 'true',
+    'TRUE', 'tRUE', 't', 'T', 'Yes', 'yes', 'YES',
+    'yES', 'y', 'Y'
+]
+FALSE_MATCH = [
+    'OFF', 'off', 'Off', 'oFF', '0',
+    'False', 'false', 'FALSE', 'fALSE', 'f',
+    'F', 'No', 'no', 'NO', 'nO', 'n', 'N'
+]
+NAN_MATCH = [
+    'NaN', 'nan', 'Nan', 'nAN', 'NAN', 'NaN',
+    'nAn', 'naN', 'NA', 'Na', 'nA', 'na',
+    'N', 'n', '', 'aN', 'null', 'NULL', 'Null',
+    '-99999', '-9999', '.'
+]
 
 
 def data_raw_loader(file_path: str) -> list:
@@ -163,6 +183,177 @@ def data_format_checks(data: List[str], data_checks: dict) -> List[str]:
     return data
 
 
+def data_raw_head(file_path: str, number_of_rows: int) -> List[str]:
+    """
+    Load only the first rows of a file, e.g. the header block, without
+    reading the rest of the file.
+
+    Parameters:
+    ----------
+        file_path (str): The file path of the file to read.
+        number_of_rows (int): The number of rows to read from the top.
+
+    Returns:
+    ----------
+        List[str]: The first rows of the file, right stripped, as in
+        data_raw_loader.
+    """
+    with open(file_path, 'r', encoding='utf8', errors='replace') as file:
+        return [line.rstrip() for line in islice(file, number_of_rows)]
+
+
+def data_raw_chunks(
+            file_path: str,
+            data_checks: dict,
+            chunk_size: int = CHUNK_SIZE_ROWS
+        ) -> Iterator[List[str]]:
+    """
+    Stream a file as blocks of rows that passed the data checks.
+
+    This is the streaming counterpart of data_raw_loader followed by
+    data_format_checks. The skip_rows, skip_end, characters and char_counts
+    checks are applied in one pass while reading, so only one block of rows
+    is held in memory at a time. The rows kept, their order, the warnings
+    and the 'No data left in file' error are the same as the list version,
+    the warnings are issued once the whole file has been read.
+
+    Parameters:
+    ----------
+        file_path (str): The file path of the file to read.
+        data_checks (dict): Dictionary containing the format checks, see
+            data_format_checks.
+        chunk_size (int): The maximum number of rows in each block.
+
+    Yields:
+    ----------
+        List[str]: A block of at most chunk_size stripped rows.
+
+    Raises:
+    ----------
+        ValueError: If no rows are left after the checks.
+
+    Examples:
+    ----------
+        >>> for rows in data_raw_chunks('my_file.txt', data_checks):
+        ...     epoch_time, data = sample_data(rows, ...)
+    """
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be a positive integer')
+    characters = data_checks.get('characters', [])
+    char_counts = list(data_checks.get('char_counts', {}).items())
+
+    # running counts to reproduce the filter warnings of the list version
+    counts = {
+        'initial': 0,
+        'characters': 0,
+        'char_counts': [0] * len(char_counts),
+        'kept': 0,
+    }
+    with open(file_path, 'r', encoding='utf8', errors='replace') as file:
+        lines = _lines_between_skips(
+            file,
+            data_checks.get('skip_rows', 0),
+            data_checks.get('skip_end', 0),
+            counts)
+        rows = (
+            line.strip() for line in lines
+            if _passes_row_checks(line, characters, char_counts, counts))
+        yield from _row_blocks(rows, chunk_size)
+
+    _warn_filtered_rows(data_checks, char_counts, counts)
+    if counts['kept'] == 0:
+        raise ValueError('No data left in file')
+
+
+def _lines_between_skips(
+            file: Iterable[str],
+            skip_rows: int,
+            skip_end: int,
+            counts: dict
+        ) -> Iterator[str]:
+    """
+    Yields the right stripped lines of file, without the first skip_rows
+    and the last skip_end lines. counts['initial'] counts every line read.
+    """
+    tail = deque()  # holds back the last skip_end rows
+    for line in file:
+        counts['initial'] += 1
+        if counts['initial'] <= skip_rows:
+            continue
+        line = line.rstrip()
+        if skip_end > 0:
+            tail.append(line)
+            if len(tail) <= skip_end:
+                continue
+            line = tail.popleft()
+        yield line
+
+
+def _passes_row_checks(
+            line: str,
+            characters: List[int],
+            char_counts: List[Tuple[str, int]],
+            counts: dict
+        ) -> bool:
+    """
+    Applies the characters and char_counts checks of data_format_checks to
+    one row, and updates the running counts of the rows passing each.
+    """
+    if len(characters) == 1 and not len(line) > characters[0]:
+        return False
+    if (len(characters) == 2
+            and not characters[0] < len(line) < characters[1]):
+        return False
+    counts['characters'] += 1
+
+    for i, (char, count) in enumerate(char_counts):
+        if count > -1 and line.count(char) != count:
+            return False
+        counts['char_counts'][i] += 1
+    counts['kept'] += 1
+    return True
+
+
+def _row_blocks(
+            rows: Iterable[str],
+            chunk_size: int
+        ) -> Iterator[List[str]]:
+    """Yields rows in lists of at most chunk_size rows."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _warn_filtered_rows(
+            data_checks: dict,
+            char_counts: List[Tuple[str, int]],
+            counts: dict
+        ):
+    """
+    Issues the warnings of data_format_checks when more than
+    FILTER_WARNING_FRACTION of the rows were filtered out, from the running
+    counts of data_raw_chunks.
+    """
+    if (counts['initial'] > 0
+            and counts['characters'] / counts['initial']
+            < FILTER_WARNING_FRACTION):
+        warnings.warn(
+            f"More than {FILTER_WARNING_FRACTION} of the rows have " +
+            'been filtered out based on the characters limit ' +
+            f"{data_checks.get('characters')} or skip rows.")
+    if counts['characters'] > 0:
+        for (char, _), length in zip(char_counts, counts['char_counts']):
+            if length / counts['characters'] < FILTER_WARNING_FRACTION:
+                warnings.warn(
+                    f"More than {FILTER_WARNING_FRACTION} of the rows have " +
+                    f"been filtered out based on the character: {char}.")
+
+
 def parse_time_column(
             time_column: Union[int, List[int]],
             time_format: str,
@@ -232,6 +423,225 @@ def parse_time_column(
         f"Invalid time column or format: {time_column}, {time_format}")
 
 
+def parse_time_columns(
+            time_column: Union[int, List[int]],
+            time_format: str,
+            table: np.ndarray,
+            date_offset: str = None,
+            seconds_shift: int = 0,
+            timezone_identifier: str = 'UTC'
+        ) -> np.ndarray:
+    """
+    Parses the time column(s) of a tokenized block of data lines at once.
+    This is the batch version of parse_time_column, see
+    time_manage.time_str_to_epoch_array.
+
+    Parameters:
+    ----------
+    time_column : Union[int, List[int]]
+        The index or indices of the column(s) containing the time information.
+    time_format : str
+        The format of the time information, e.g. '%Y-%m-%d %H:%M:%S'.
+    table : np.ndarray
+        2-D array of string cells, see tokenize_lines.
+    date_offset : Optional[str], default=None
+        A fixed date offset to add to the timestamp in front.
+    seconds_shift : int, default=0
+        A number of seconds to add to the timestamp.
+    timezone_identifier : str, default='UTC'
+        The timezone identifier for the data.
+
+    Returns:
+    -------
+    np.ndarray
+        The timestamps of every row, in seconds since the epoch.
+
+    Raises:
+    ------
+    ValueError
+        If an invalid time column or format is specified.
+    """
+    if time_format == 'epoch':
+        # if the time is in epoch format
+        time_epoch = table[:, time_column].astype(np.float64)
+        if time_epoch.ndim == 2:
+            # a one element list of columns, e.g. [0]
+            if time_epoch.shape[1] != 1:
+                raise ValueError(
+                    f"Invalid time column or format: {time_column}, " +
+                    f"{time_format}")
+            time_epoch = time_epoch[:, 0]
+        return time_epoch + seconds_shift
+    if date_offset:
+        # if the time is in one column, and the date is fixed
+        time_str = np.char.add(f"{date_offset} ", table[:, time_column])
+    elif isinstance(time_column, int):
+        # if the time and date are in one column
+        time_str = table[:, time_column]
+    elif isinstance(time_column, list) and len(time_column) == 2:
+        # if the time and date are in two column
+        time_str = np.char.add(
+            np.char.add(table[:, time_column[0]], ' '),
+            table[:, time_column[1]])
+    else:
+        raise ValueError(
+            f"Invalid time column or format: {time_column}, {time_format}")
+    return time_str_to_epoch_array(
+        time_str,
+        time_format,
+        timezone_identifier
+    ) + seconds_shift
+
+
+def tokenize_lines(
+            data: List[str],
+            delimiter: str
+        ) -> np.ndarray:
+    """
+    Splits a block of lines into a 2-D array of string cells in one pass.
+
+    Rows with fewer cells than the widest row are padded with empty strings,
+    so missing trailing columns are treated as no data.
+
+    Parameters:
+    ----------
+    data : List[str]
+        The lines to split.
+    delimiter : str
+        The delimiter character used to separate columns.
+
+    Returns:
+    -------
+    np.ndarray
+        A 2-D array of strings with shape (len(data), max_columns).
+    """
+    rows = [line.split(delimiter) for line in data]
+    width = max((len(row) for row in rows), default=0)
+    if any(len(row) != width for row in rows):
+        rows = [row + [''] * (width - len(row)) for row in rows]
+    return np.array(rows, dtype=str).reshape(len(rows), width)
+
+
+def parse_data_value(value: str, row: int, column: int) -> float:
+    """
+    Converts a single stripped data cell to a float, using the value
+    vocabularies in TRUE_MATCH, FALSE_MATCH and NAN_MATCH. This is the
+    per-cell path used for values the bulk conversion cannot parse.
+
+    Parameters:
+    ----------
+    value : str
+        The stripped cell value.
+    row : int
+        Row index of the value, used in error messages.
+    column : int
+        Column index of the value, used in error messages.
+
+    Returns:
+    -------
+    float
+        The converted value. Unrecognised values that are neither numeric
+        nor alphabetic are returned as 0.
+
+    Raises:
+    ------
+    ValueError
+        If the value is not a float, or no match for the value is found.
+    """
+    if value in ('', '.') or '�' in value:  # no data
+        return np.nan
+    if value[0].isnumeric() or value[-1].isnumeric() or value[0] in '-+':
+        return float(value)
+    if value[0] == '.':
+        try:
+            return float(value)
+        except ValueError as exc:
+            raise ValueError(
+                f'Data is not a float: row {row}, col {column}, value {value}'
+                ) from exc
+    if value.isalpha():
+        return _match_word_value(value, row, column)
+    return 0.0
+
+
+def _match_word_value(value: str, row: int, column: int) -> float:
+    """
+    Converts an alphabetic cell with the TRUE_MATCH, FALSE_MATCH and
+    NAN_MATCH vocabularies, ValueError if it is in none of them.
+    """
+    if value in TRUE_MATCH:
+        return 1.0
+    if value in FALSE_MATCH:
+        return 0.0
+    if value in NAN_MATCH:
+        return np.nan
+    raise ValueError(
+        f'No match for data value: row {row}, col {column}, value {value}'
+        )
+
+
+def convert_cells_to_float(cells: np.ndarray) -> np.ndarray:
+    """
+    Converts a 2-D array of string cells to float64 in bulk.
+
+    Empty cells, '.' and cells with replacement characters become NaN.
+    Alphabetic cells are mapped through the TRUE_MATCH, FALSE_MATCH and
+    NAN_MATCH vocabularies. Everything else is converted with a single
+    numpy cast, and only the cells that cast cannot handle go through
+    parse_data_value one at a time.
+
+    Parameters:
+    ----------
+    cells : np.ndarray
+        A 2-D array of strings, shape (rows, columns).
+
+    Returns:
+    -------
+    np.ndarray
+        A 2-D float64 array with the same shape as cells.
+
+    Raises:
+    ------
+    ValueError
+        If a cell is not a float, or no match for the cell is found.
+    """
+    cells = np.char.strip(cells)
+    values = np.zeros(cells.shape, dtype=np.float64)
+
+    no_data = (cells == '') | (cells == '.') \
+        | (np.char.find(cells, '�') >= 0)
+    alpha = np.char.isalpha(cells) & ~no_data
+    numeric = ~(no_data | alpha)
+    values[no_data] = np.nan
+
+    # true/false/nan vocabularies
+    if alpha.any():
+        alpha_cells = cells[alpha]
+        true_mask = np.isin(alpha_cells, TRUE_MATCH)
+        false_mask = np.isin(alpha_cells, FALSE_MATCH) & ~true_mask
+        nan_mask = np.isin(alpha_cells, NAN_MATCH) & ~(true_mask | false_mask)
+        unmatched = ~(true_mask | false_mask | nan_mask)
+        if unmatched.any():
+            row, column = np.argwhere(alpha)[np.argmax(unmatched)]
+            parse_data_value(str(cells[row, column]), row, column)
+        alpha_values = np.zeros(alpha_cells.shape)
+        alpha_values[true_mask] = 1
+        alpha_values[nan_mask] = np.nan
+        values[alpha] = alpha_values
+
+    # numbers, falling back to the per-cell path only when needed
+    try:
+        values[numeric] = cells[numeric].astype(np.float64)
+    except ValueError:
+        for row, column in np.argwhere(numeric):
+            value = str(cells[row, column])
+            try:
+                values[row, column] = float(value)
+            except ValueError:
+                values[row, column] = parse_data_value(value, row, column)
+    return values
+
+
 def sample_data(
             data: List[str],
             time_column: int,
@@ -245,6 +655,10 @@ def sample_data(
     """
     Samples the data to get the time and data streams.
 
+    The whole block is tokenized once, the time column(s) are parsed
+    together, see parse_time_columns, and the data columns are converted
+    to float64 together, see convert_cells_to_float.
+
     Parameters:
     -----------
     data : List[str]
@@ -280,80 +694,28 @@ def sample_data(
         - If the data value is not in the correct format.
         - If no match for data value is found.
     """
-    epoch_time = np.zeros(len(data))
-    epoch_time = np.zeros(len(data))
-    data_array = np.zeros((len(data), len(data_columns)))
-
-    for i, line in enumerate(data):
-        # split the line into an array
-        line_array = np.array(line.split(delimiter))
-        # split the line into an array
-        line_array = np.array(line.split(delimiter))
-
-        epoch_time[i] = parse_time_column(
-            time_column=time_column,
-            time_format=time_format,
-            line=line_array,
-            date_offset=date_offset,
-            seconds_shift=seconds_shift,
-            timezone_identifier=timezone_identifier
-        )
+    if len(data) == 0:
+        return np.zeros(0), np.zeros((0, len(data_columns)))
+
+    table = tokenize_lines(data, delimiter)
+
+    epoch_time = parse_time_columns(
+        time_column=time_column,
+        time_format=time_format,
+        table=table,
+        date_offset=date_offset,
+        seconds_shift=seconds_shift,
+        timezone_identifier=timezone_identifier
+    )
+
+    # columns past the end of every row are no data
+    cells = np.full((len(data), len(data_columns)), '', dtype=table.dtype)
+    in_table = [
+        j for j, col in enumerate(data_columns) if col < table.shape[1]]
+    if in_table:
+        cells[:, in_table] = table[:, [data_columns[j] for j in in_table]]
 
-        for j, col in enumerate(data_columns):
-            if col < len(line_array):
-                value = line_array[col].strip()
-            else:
-                value = ''
-
-            if value == '' or value == '.':  # no data
-                data_array[i, j] = np.nan
-            elif value.count('�') > 0:
-                data_array[i, j] = np.nan
-            elif value[0].isnumeric():  # if the first character is a number
-                data_array[i, j] = float(value)
-            elif value[-1].isnumeric():
-                data_array[i, j] = float(value)
-            elif value[0] == '-':
-                data_array[i, j] = float(value)
-            elif value[0] == '+':
-                data_array[i, j] = float(value)
-            elif value[0] == '.':
-                try:
-                    data_array[i, j] = float(value)
-                except ValueError:
-                    print(line_array)
-                    raise ValueError(
-                        f'Data is not a float: row {i}, col {j}, value {value}'
-                        )
-
-            elif value.isalpha():
-                true_match = [
-                        'ON', 'on', 'On', 'oN', '1', 'True', 'true',
-                        'TRUE', 'tRUE', 't', 'T', 'Yes', 'yes', 'YES',
-                        'yES', 'y', 'Y'
-                    ]
-                false_match = [
-                        'OFF', 'off', 'Off', 'oFF', '0',
-                        'False', 'false', 'FALSE', 'fALSE', 'f',
-                        'F', 'No', 'no', 'NO', 'nO', 'n', 'N'
-                    ]
-                nan_match = [
-                        'NaN', 'nan', 'Nan', 'nAN', 'NAN', 'NaN',
-                        'nAn', 'naN', 'NA', 'Na', 'nA', 'na',
-                        'N', 'n', '', 'aN', 'null', 'NULL', 'Null',
-                        '-99999', '-9999', '.'
-                    ]
-                if value in true_match:
-                    data_array[i, j] = 1
-                elif value in false_match:
-                    data_array[i, j] = 0
-                elif value in nan_match:
-                    data_array[i, j] = np.nan
-                else:
-                    raise ValueError(
-                        f'No match for data value: row {i}, \
-                             col {j}, value {value}'
-                        )
+    data_array = convert_cells_to_float(cells)
 
     return epoch_time, data_array
 
@@ -415,6 +777,89 @@ def general_data_formatter(
     return epoch_time, data_array
 
 
+def sizer_header_columns(
+            header_row: str,
+            data_sizer_reader: Dict[str, str],
+            delimiter: str = ','
+        ) -> Tuple[List[int], List[str], List[int]]:
+    """
+    Finds the diameter bin columns and the 1D data columns of a sizer file
+    from its header row.
+
+    Parameters
+    ----------
+    header_row : str
+        The header row of the sizer file.
+    data_sizer_reader : Dict[str, str]
+        Dictionary containing information about the sizer data format.
+    delimiter : str, default=','
+        The delimiter used in the data.
+
+    Returns
+    -------
+    Tuple[List[int], List[str], List[int]]
+        The Dp bin column indices, the Dp header, and the 1D data column
+        indices.
+    """
+    # Get Dp range and columns
+    data_header = header_row.split(delimiter)
+    dp_range = [
+                data_header.index(data_sizer_reader["Dp_start_keyword"]),
+                data_header.index(data_sizer_reader["Dp_end_keyword"])
+                ]
+    dp_columns = list(range(dp_range[0]+1, dp_range[1]))
+    dp_header = list([data_header[i] for i in dp_columns])
+    # change from np.array
+
+    # Get data columns
+    data_column = [
+        data_header.index(x) for x in data_sizer_reader["list_of_data_headers"]
+        ]
+    return dp_columns, dp_header, data_column
+
+
+def sizer_convert_scale(
+            data_smps_2d: np.ndarray,
+            dp_header: List[str],
+            data_sizer_reader: Dict[str, str]
+        ) -> np.ndarray:
+    """
+    Applies the dw to dw/dlogdp scale conversion requested in the sizer
+    reader settings, if any, to the 2D sizer data.
+
+    Parameters
+    ----------
+    data_smps_2d : np.ndarray
+        The 2D sizer data, (time, bins).
+    dp_header : List[str]
+        The Dp header, the bin diameters.
+    data_sizer_reader : Dict[str, str]
+        Dictionary containing information about the sizer data format.
+
+    Returns
+    -------
+    np.ndarray
+        The 2D sizer data in dw/dlogdp.
+    """
+    if "convert_scale_from" in data_sizer_reader.keys():
+        if data_sizer_reader["convert_scale_from"] == "dw":
+            inverse = True
+        elif data_sizer_reader["convert_scale_from"] == "dw/dlogdp":
+            inverse = False
+        else:
+            raise ValueError(
+                "Invalid value for convert_scale_from in data_sizer_reader." +
+                " Either dw/dlogdp or dw must be specified."
+            )
+        # one broadcast over all rows, bin widths computed once
+        data_smps_2d = convert.convert_sizer_dn(
+            diameter=np.array(dp_header).astype(float),
+            dn_dlogdp=data_smps_2d,
+            inverse=inverse
+        )
+    return data_smps_2d
+
+
 def sizer_data_formatter(
             data: List[str],
             data_checks: Dict[str, Any],
@@ -456,62 +901,145 @@ def sizer_data_formatter(
         A tuple containing the epoch time, the Dp header, and the data arrays.
     """
 
-    # Get Dp range and columns
-    data_header = data[data_sizer_reader["header_rows"]].split(delimiter)
-    dp_range = [
-                data_header.index(data_sizer_reader["Dp_start_keyword"]),
-                data_header.index(data_sizer_reader["Dp_end_keyword"])
-                ]
-    dp_columns = list(range(dp_range[0]+1, dp_range[1]))
-    dp_header = list([data_header[i] for i in dp_columns])
-    # change from np.array
-
-    # Get data columns
-    data_column = [
-        data_header.index(x) for x in data_sizer_reader["list_of_data_headers"]
-        ]
+    dp_columns, dp_header, data_column = sizer_header_columns(
+        header_row=data[data_sizer_reader["header_rows"]],
+        data_sizer_reader=data_sizer_reader,
+        delimiter=delimiter
+    )
 
     # Format data
     data = data_format_checks(data, data_checks)
 
-    # Get data arrays
-    epoch_time, data_smps_2d = sample_data(
+    # Get data arrays, the 2D and 1D columns are parsed together
+    epoch_time, data_smps = sample_data(
         data,
         time_column,
         time_format,
-        dp_columns,
+        dp_columns + data_column,
         delimiter,
         date_offset,
         seconds_shift=seconds_shift,
         timezone_identifier=timezone_identifier
     )
-    epoch_time, data_smps_1d = sample_data(
-        data,
-        time_column,
-        time_format,
-        data_column,
-        delimiter,
-        date_offset,
-        seconds_shift=seconds_shift,
-        timezone_identifier=timezone_identifier
+    data_smps_2d = data_smps[:, :len(dp_columns)]
+    data_smps_1d = data_smps[:, len(dp_columns):]
+
+    data_smps_2d = sizer_convert_scale(
+        data_smps_2d, dp_header, data_sizer_reader)
+
+    return epoch_time, dp_header, data_smps_2d, data_smps_1d
+
+
+def general_data_formatter_chunked(
+    file_path: str,
+    data_checks: dict,
+    data_column: list,
+    time_column: Union[int, List[int]],
+    time_format: str,
+    delimiter: str = ',',
+    date_offset: str = None,
+    seconds_shift: int = 0,
+    timezone_identifier: str = 'UTC',
+    chunk_size: int = CHUNK_SIZE_ROWS
+) -> Tuple[np.array, np.array]:
+    """
+    Streaming version of general_data_formatter, reads the file in blocks
+    of rows, see data_raw_chunks, so the raw text held in memory is bounded
+    by chunk_size instead of the file size.
+
+    Parameters:
+    ----------
+    file_path : str
+        The path of the file to load.
+    chunk_size : int, default=CHUNK_SIZE_ROWS
+        The maximum number of rows parsed at a time.
+
+    The other parameters are the same as general_data_formatter.
+
+    Returns:
+    -------
+    Tuple[np.array, np.array]
+        A tuple containing two np.array objects: the first contains the
+        epoch times, and the second contains the data.
+    """
+    epoch_chunks = []
+    data_chunks = []
+    for rows in data_raw_chunks(file_path, data_checks, chunk_size):
+        epoch_time, data_array = sample_data(
+            rows,
+            time_column,
+            time_format,
+            data_column,
+            delimiter,
+            date_offset,
+            seconds_shift,
+            timezone_identifier
+        )
+        epoch_chunks.append(epoch_time)
+        data_chunks.append(data_array)
+
+    return np.concatenate(epoch_chunks), np.concatenate(data_chunks)
+
+
+def sizer_data_formatter_chunked(
+            file_path: str,
+            data_checks: Dict[str, Any],
+            data_sizer_reader: Dict[str, str],
+            time_column: int,
+            time_format: str,
+            delimiter: str = ',',
+            date_offset: str = None,
+            seconds_shift: int = 0,
+            timezone_identifier: str = 'UTC',
+            chunk_size: int = CHUNK_SIZE_ROWS
+        ) -> Tuple[np.ndarray, List[str], np.ndarray, np.ndarray]:
+    """
+    Streaming version of sizer_data_formatter, only the header block is
+    read up front and the data rows are parsed in blocks, see
+    data_raw_chunks.
+
+    Parameters
+    ----------
+    file_path : str
+        The path of the file to load.
+    chunk_size : int, default=CHUNK_SIZE_ROWS
+        The maximum number of rows parsed at a time.
+
+    The other parameters are the same as sizer_data_formatter.
+
+    Returns
+    -------
+    Tuple[np.ndarray, List(str) np.ndarray, np.ndarray]
+        A tuple containing the epoch time, the Dp header, and the data arrays.
+    """
+    header_rows = data_sizer_reader["header_rows"]
+    dp_columns, dp_header, data_column = sizer_header_columns(
+        header_row=data_raw_head(file_path, header_rows + 1)[header_rows],
+        data_sizer_reader=data_sizer_reader,
+        delimiter=delimiter
     )
 
-    if "convert_scale_from" in data_sizer_reader.keys():
-        if data_sizer_reader["convert_scale_from"] == "dw":
-            inverse = True
-        elif data_sizer_reader["convert_scale_from"] == "dw/dlogdp":
-            inverse = False
-        else:
-            raise ValueError(
-                "Invalid value for convert_scale_from in data_sizer_reader." +
-                " Either dw/dlogdp or dw must be specified."
-            )
-        for i in range(len(epoch_time)):
-            data_smps_2d[i, :] = convert.convert_sizer_dn(
-                diameter=np.array(dp_header).astype(float),
-                dn_dlogdp=data_smps_2d[i, :],
-                inverse=inverse
-            )
+    epoch_chunks = []
+    data_chunks = []
+    for rows in data_raw_chunks(file_path, data_checks, chunk_size):
+        epoch_time, data_smps = sample_data(
+            rows,
+            time_column,
+            time_format,
+            dp_columns + data_column,
+            delimiter,
+            date_offset,
+            seconds_shift=seconds_shift,
+            timezone_identifier=timezone_identifier
+        )
+        epoch_chunks.append(epoch_time)
+        data_chunks.append(data_smps)
+    epoch_time = np.concatenate(epoch_chunks)
+    data_smps = np.concatenate(data_chunks)
+
+    data_smps_2d = sizer_convert_scale(
+        data_smps[:, :len(dp_columns)], dp_header, data_sizer_reader)
+    data_smps_1d = data_smps[:, len(dp_columns):]
 
     return epoch_time, dp_header, data_smps_2d, data_smps_1d
 
@@ -556,16 +1084,42 @@ def non_standard_date_location(
     return date
 
 
-def get_files_in_folder_with_size(
+def file_date_offset(file_path: str, date_location: dict) -> str:
+    """
+    Extracts the date from a non-standard location in a file, reading only
+    the header rows needed instead of the whole file.
+
+    Parameters:
+    ----------
+    file_path : str
+        The path of the file.
+    date_location : dict
+        The date location settings, see non_standard_date_location.
+
+    Returns:
+    -------
+    str
+        The date extracted from the specified location in the file.
+    """
+    row_index = date_location.get('row', -1)
+    if row_index >= 0:
+        data = data_raw_head(file_path, row_index + 1)
+    else:  # counted from the end, needs the whole file
+        data = data_raw_loader(file_path)
+    return non_standard_date_location(data, date_location)
+
+
+def scan_files_in_folder(
     path: str,
     subfolder: str,
     filename_regex: str,
     min_size: int = 10,
-) -> Tuple[List[str], List[str], List[int]]:
+) -> Tuple[List[str], List[str], List[int], List[float]]:
     """
-    Returns a list of files in the specified folder and subfolder that
-    match the given filename pattern and have a size greater than the
-    specified minimum size.
+    Scans the specified folder and subfolder for files that match the given
+    filename pattern and have a size greater than the specified minimum
+    size. The sizes and modification times come from a single os.scandir
+    pass, so each file is only stat-ed once.
 
     Parameters:
     ----------
@@ -574,52 +1128,116 @@ def get_files_in_folder_with_size(
     subfolder : str
         The name of the subfolder containing the files.
     filename_regex : str
-        A regular expression pattern for matching the filenames.
+        A glob pattern for matching the filenames, e.g. '*.csv'. Patterns
+        with a path separator are matched with glob instead.
     min_size : int, optional
         The minimum file size in bytes (default is 10).
 
     Returns:
     -------
-    Tuple[List[str], List[str], List[int]]
-        A tuple containing three lists:
+    Tuple[List[str], List[str], List[int], List[float]]
+        A tuple containing four lists:
         - The filenames that match the pattern and size criteria
         - The full paths to the files
         - The file sizes in bytes
+        - The file modification times, in seconds since the epoch
     """
     search_path = os.path.join(path, subfolder)
 
     if not os.path.isdir(search_path):
         raise ValueError(f"{search_path} is not a directory")
 
-    file_list = glob.glob(os.path.join(search_path, filename_regex))
+    file_list = []
+    full_path = []
+    file_size_in_bytes = []
+    file_mtime = []
+    if os.sep in filename_regex or '/' in filename_regex:
+        # nested patterns, let glob walk the folders
+        for file in glob.glob(os.path.join(search_path, filename_regex)):
+            stat = os.stat(file)
+            if stat.st_size > min_size:
+                file_list.append(os.path.split(file)[-1])
+                full_path.append(file)
+                file_size_in_bytes.append(stat.st_size)
+                file_mtime.append(stat.st_mtime)
+        return file_list, full_path, file_size_in_bytes, file_mtime
+
+    # glob skips hidden files unless the pattern asks for them
+    include_hidden = filename_regex.startswith('.')
+    with os.scandir(search_path) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') and not include_hidden:
+                continue
+            if not fnmatch.fnmatch(entry.name, filename_regex):
+                continue
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            if stat.st_size > min_size:
+                file_list.append(entry.name)
+                full_path.append(os.path.join(search_path, entry.name))
+                file_size_in_bytes.append(stat.st_size)
+                file_mtime.append(stat.st_mtime)
+
+    return file_list, full_path, file_size_in_bytes, file_mtime
 
-    # filter the files by size
-    full_path = [
-        file for file in file_list
-        if os.path.getsize(os.path.join(search_path, file)) > min_size
-    ]
 
-    # get the file names onlye
-    file_list = [os.path.split(path)[-1]
-                 for path in full_path]
-    file_size_in_bytes = [os.path.getsize(path) for path in full_path]
+def get_files_in_folder_with_size(
+    path: str,
+    subfolder: str,
+    filename_regex: str,
+    min_size: int = 10,
+) -> Tuple[List[str], List[str], List[int]]:
+    """
+    Returns a list of files in the specified folder and subfolder that
+    match the given filename pattern and have a size greater than the
+    specified minimum size. See scan_files_in_folder, which also returns
+    the modification times.
+
+    Parameters:
+    ----------
+    path : str
+        The path to the parent folder.
+    subfolder : str
+        The name of the subfolder containing the files.
+    filename_regex : str
+        A regular expression pattern for matching the filenames.
+    min_size : int, optional
+        The minimum file size in bytes (default is 10).
 
+    Returns:
+    -------
+    Tuple[List[str], List[str], List[int]]
+        A tuple containing three lists:
+        - The filenames that match the pattern and size criteria
+        - The full paths to the files
+        - The file sizes in bytes
+    """
+    file_list, full_path, file_size_in_bytes, _ = scan_files_in_folder(
+        path=path,
+        subfolder=subfolder,
+        filename_regex=filename_regex,
+        min_size=min_size
+    )
     return file_list, full_path, file_size_in_bytes
 
 
 def save_datalake(path: str, data_lake: object = None, sufix_name: str = None):
     """
-    Save datalake object as a pickle file.
+    Save datalake object as a columnar store, see lake_store. Only the
+    streams changed since the last save are written.
 
     Parameters
     ----------
     data_lake : DataLake
         DataLake object to be saved.
     path : str
-        Path to save pickle file.
+        Path to save the store, in the output folder.
     sufix_name : str, optional
-        Suffix to add to pickle file name. The default is None.
+        Suffix to add to the store name. The default is None.
     """
+    from datacula import lake_store  # lake_store imports lake and loader
+
     print('Saving datalake...')
     # create output folder if it does not exist
     output_folder = os.path.join(path, 'output')
@@ -627,47 +1245,54 @@ def save_datalake(path: str, data_lake: object = None, sufix_name: str = None):
 
     # add suffix to file name if present
     if sufix_name is not None:
-        file_name = f'datalake_{sufix_name}.pk'
+        store_name = f'datalake_{sufix_name}'
     else:
-        file_name = 'datalake.pk'
-
-    # path to save pickle file
-    file_path = os.path.join(output_folder, file_name)
+        store_name = 'datalake'
 
     # save datalake
-    with open(file_path, 'wb') as file:
-        pickle.dump(data_lake, file)
+    lake_store.save_lake_store(
+        os.path.join(output_folder, store_name), data_lake)
     print('Datalake saved')
 
 
-def load_datalake(path: str, sufix_name: str = None) -> object:
+def load_datalake(
+        path: str,
+        sufix_name: str = None,
+        mmap_mode: str = None) -> object:
     """
-    Load datalake object from a pickle file.
+    Load datalake object from a columnar store, or from a pickle file
+    written by earlier versions.
 
     Parameters
     ----------
     path : str
-        Path to load pickle file.
+        Path to load the store, or pickle file, from the output folder.
+    sufix_name : str, optional
+        Suffix of the store name. The default is None.
+    mmap_mode : str, optional
+        If 'r', the stream arrays of a store are memory-mapped read-only,
+        see lake_store.load_lake_store. The default is None.
 
     Returns
     -------
     data_lake : DataLake
-        Loaded DataLake object.
+        Loaded DataLake object, the streams of a store are read on first
+        access.
     """
-    # add suffix to file name if present
-    if sufix_name is not None:
-        file_name = f'datalake_{sufix_name}.pk'
-    else:
-        file_name = 'datalake.pk'
+    from datacula import lake_store  # lake_store imports lake and loader
 
     # add suffix to file name if present
     if sufix_name is not None:
-        file_name = f'datalake_{sufix_name}.pk'
+        store_name = f'datalake_{sufix_name}'
     else:
-        file_name = 'datalake.pk'
+        store_name = 'datalake'
+
+    store_path = os.path.join(path, 'output', store_name)
+    if lake_store.is_lake_store(store_path):
+        return lake_store.load_lake_store(store_path, mmap_mode=mmap_mode)
 
-    # path to load pickle file
-    file_path = os.path.join(path, 'output', file_name)
+    # path to load the legacy pickle file
+    file_path = os.path.join(path, 'output', store_name + '.pk')
 
     # load datalake
     with open(file_path, 'rb') as file:
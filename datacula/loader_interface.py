@@ -1,5 +1,8 @@
 """interface to import data to a data stream"""
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import json
 import os
 import numpy as np
 from datacula import loader
@@ -11,6 +14,7 @@ def get_new_files(
         path: str,
         import_settings: Dict[str, Any],
         loaded_list: List[Any] = None,
+        use_mtime: bool = False,
 ) -> tuple:
     """
     Scan a directory for new files based on import settings and stream status.
@@ -18,7 +22,9 @@ def get_new_files(
     This function looks for files in a specified path using import settings.
     It compares the new list of files with a pre-loaded list in the stream
     object to determine which files are new. The comparison is made based on
-    file names and sizes. It returns a tuple with the paths of new files, a
+    file names and sizes, and optionally the modification times. The loaded
+    list is indexed in a set, so the comparison is O(N) in the number of
+    files. It returns a tuple with the paths of new files, a
     boolean indicating if this was the first pass, and a list of file
     information for new files.
 
@@ -33,9 +39,14 @@ def get_new_files(
         file names. It should also include 'min_size' key to specify the
         minimum size of the files to be considered.
     loaded_list : list of lists
-        A list of lists with file names and sizes that have already been
-        loaded. The default is None. If None, it will be assumed that no
-        files have been loaded.
+        A list of lists with file names and sizes (and modification times)
+        that have already been loaded. The default is None. If None, it will
+        be assumed that no files have been loaded.
+    use_mtime : bool
+        If True, the file information also includes the modification time,
+        [name, size, mtime], so a rewritten file of the same size is also
+        detected as new. Loaded entries of [name, size] still match on name
+        and size. The default is False.
 
     Returns:
     -------
@@ -44,11 +55,15 @@ def get_new_files(
         indicating if no previous files were loaded (True if it's the first
         pass), and a list of lists with new file names and sizes.
 
-    Returns:
     Raises:
     ------
-    YourErrorType
-        Explanation of when and why your error is raised and what it means.
+    ValueError
+        If the path is not a directory, or the loaded_list entries do not
+        have 2 or 3 items.
+    KeyError
+        If import_settings is missing a required key.
+    TypeError
+        If loaded_list is not a list of lists.
     """
     # Validate the path and settings
     if not os.path.isdir(path):
@@ -70,46 +85,151 @@ def get_new_files(
                 f"loaded_list must be a list of lists. It is currently a \
                 list of {type(loaded_list[0])}"
             )
-        if not all(len(item) == 2 for item in loaded_list):
+        if not all(len(item) in (2, 3) for item in loaded_list):
             raise ValueError(
-                f"loaded_list must be a list of lists with 2 items. It is \
-                currently a list of lists with {len(loaded_list[0])} items"
+                f"loaded_list must be a list of lists with 2 or 3 items. It \
+                is currently a list of lists with {len(loaded_list[0])} items"
             )
 
     # import data based on the settings what type
-    file_names, full_paths, file_sizes = loader.get_files_in_folder_with_size(
-        path=path,
-        subfolder=import_settings['relative_data_folder'],
-        filename_regex=import_settings['filename_regex'],
-        min_size=import_settings['MIN_SIZE_BYTES'])
+    file_names, full_paths, file_sizes, file_mtimes = \
+        loader.scan_files_in_folder(
+            path=path,
+            subfolder=import_settings['relative_data_folder'],
+            filename_regex=import_settings['filename_regex'],
+            min_size=import_settings['MIN_SIZE_BYTES'])
     # combined the file names and sizes into a list of lists
-    file_info = [[name, size]
-                 for name, size in zip(file_names, file_sizes)]
+    if use_mtime:
+        file_info = [[name, size, mtime]
+                     for name, size, mtime
+                     in zip(file_names, file_sizes, file_mtimes)]
+    else:
+        file_info = [[name, size]
+                     for name, size in zip(file_names, file_sizes)]
     # check and compare the previous file list with the new list.
     if not loaded_list:
-        first_pass = True
+        return full_paths, True, file_info
+    full_paths, file_info = _unloaded_files(
+        full_paths, file_info, loaded_list, use_mtime)
+    return full_paths, False, file_info
+
+
+def _unloaded_files(
+        full_paths: List[str],
+        file_info: List[List[Any]],
+        loaded_list: List[List[Any]],
+        use_mtime: bool,
+) -> Tuple[List[str], List[List[Any]]]:
+    """
+    Keep the files whose information is not in loaded_list.
+
+    The loaded files are indexed in a set, so the comparison is O(N). With
+    use_mtime a file matches on [name, size, mtime], and a loaded entry
+    without a mtime still matches on name and size.
+
+    Parameters:
+    ----------
+    full_paths : list of str
+        The full paths of the scanned files.
+    file_info : list of lists
+        The [name, size] or [name, size, mtime] of each scanned file.
+    loaded_list : list of lists
+        The file information of the files already loaded.
+    use_mtime : bool
+        If True, file_info includes the modification times.
+
+    Returns:
+    -------
+    tuple of (list, list)
+        The full paths and the file information of the new files.
+    """
+    if use_mtime:
+        loaded_index = {tuple(item) for item in loaded_list}
     else:
-        first_pass = False
-        # check if the files are the same
-        new_full_paths = []
-        new_file_info = []
-        for i, comparison_list in enumerate(file_info):
-            if comparison_list not in loaded_list:
-                # keep the new files
-                new_full_paths.append(full_paths[i])
-                new_file_info.append(comparison_list)
-        full_paths = new_full_paths  # replace to return only new files
-        file_info = new_file_info
-    return full_paths, first_pass, file_info
+        loaded_index = {tuple(item[:2]) for item in loaded_list}
+    new_full_paths = []
+    new_file_info = []
+    for full_path, comparison_list in zip(full_paths, file_info):
+        if (tuple(comparison_list) not in loaded_index
+                and tuple(comparison_list[:2]) not in loaded_index):
+            new_full_paths.append(full_path)
+            new_file_info.append(comparison_list)
+    return new_full_paths, new_file_info
+
+
+def save_file_catalog(
+        file_path: str,
+        loaded_list: List[List[Any]],
+) -> None:
+    """
+    Save the list of loaded files, e.g. Stream.files, as a JSON catalog so
+    new-file detection can resume in a later polling run.
+
+    Parameters:
+    ----------
+    file_path : str
+        The path of the JSON catalog file.
+    loaded_list : list of lists
+        The loaded file information, [name, size] or [name, size, mtime].
+    """
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf8') as file:
+        json.dump(loaded_list, file)
+    os.replace(temp_path, file_path)  # never leave a half written catalog
+
+
+def load_file_catalog(file_path: str) -> List[List[Any]]:
+    """
+    Load a JSON catalog of loaded files written by save_file_catalog.
+
+    Parameters:
+    ----------
+    file_path : str
+        The path of the JSON catalog file.
+
+    Returns:
+    -------
+    list of lists
+        The loaded file information, an empty list if the catalog does not
+        exist yet.
+    """
+    if not os.path.isfile(file_path):
+        return []
+    with open(file_path, 'r', encoding='utf8') as file:
+        return json.load(file)
 
 
 def load_files_interface(
         path: str,
         settings: dict,
         stream: object = None,
+        workers: int = None,
+        use_mtime: bool = False,
 ) -> object:
     """
     Load files into a stream object based on settings.
+
+    Parameters:
+    ----------
+    path : str
+        The top-level directory path to scan for files.
+    settings : dict
+        The import settings, see settings_generator.
+    stream : Stream, optional
+        The Stream to add the new files to. Defaults to a new Stream.
+    workers : int, optional
+        If more than 1, the files are parsed in a process pool of this
+        many workers. The parsed blocks are added to the stream in the
+        same file order as the serial path, so the result is the same.
+        Defaults to None, parse the files one after another.
+    use_mtime : bool, optional
+        If True, files are also compared on modification time, see
+        get_new_files. Defaults to False.
+
+    Returns:
+    -------
+    Stream
+        The Stream object with the new files loaded.
     """
     if stream is None:
         stream = Stream(
@@ -122,9 +242,32 @@ def load_files_interface(
     full_paths, first_pass, file_info = get_new_files(
         path=path,
         import_settings=settings,
-        loaded_list=stream.files
+        loaded_list=stream.files,
+        use_mtime=use_mtime
     )
 
+    if workers is not None and workers > 1 and len(full_paths) > 1:
+        if settings['data_loading_function'] != 'general_1d_load':
+            raise ValueError('Data loading function not recognised',
+                             settings['data_loading_function'])
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map returns the blocks in file order, the stream is updated
+            # while the remaining files are still being parsed
+            blocks = executor.map(
+                get_1d_data, full_paths, repeat(settings))
+            for file_i, (epoch_time, data) in enumerate(blocks):
+                print('Loading data from:', file_info[file_i][0])
+                stream = stream_add_1d_data(
+                    stream=stream,
+                    epoch_time=epoch_time,
+                    data=data,
+                    settings=settings,
+                    first_pass=first_pass
+                )
+                stream.files.append(file_info[file_i])
+                first_pass = False
+        return stream
+
     # load the data type
     for file_i, file_path in enumerate(full_paths):
         print('Loading data from:', file_info[file_i][0])
@@ -153,42 +296,30 @@ def load_files_interface(
     return stream
 
 
-def get_1d_stream(
+def get_1d_data(
     file_path: str,
     settings: dict,
-    first_pass: bool = True,
-    stream: object = None,
-) -> object:
+) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Loads and formats a 1D data stream from a file and initializes or updates
-    a Stream object.
+    Loads and formats the 1D data of one file, without touching a Stream.
+    This is the part of get_1d_stream that can run in a worker process.
 
     Parameters:
     ----------
     file_path : str
         The path of the file to load data from.
-    first_pass : bool
-        Whether this is the first time data is being loaded. If True, the
-        stream is initialized.
-        If False, raises an error as only one file can be loaded.
     settings : dict
         A dictionary containing data formatting settings such as data checks,
         column names,
         time format, delimiter, and timezone information.
-    stream : Stream, optional
-        An instance of Stream class to be updated with loaded data. Defaults
-        to a new Stream object.
 
     Returns:
     -------
-    Stream
-        The Stream object updated with the loaded data and corresponding time
-        information.
+    Tuple[np.ndarray, np.ndarray]
+        The epoch time (n,) and the data (header, n).
 
     Raises:
     ------
-    ValueError
-        If `first_pass` is False, indicating data has already been loaded.
     TypeError
         If `settings` is not a dictionary.
     FileNotFoundError
@@ -196,13 +327,6 @@ def get_1d_stream(
     KeyError
         If any required keys are missing in the `settings` dictionary.
     """
-    if stream is None:
-        stream = Stream(
-            header=[],
-            data=np.array([]),
-            time=np.array([]),
-            files=[]
-        )
     # Input validation
     if not isinstance(settings, dict):
         raise TypeError("The setting parameters must be in a dictionary.")
@@ -218,22 +342,17 @@ def get_1d_stream(
         raise FileNotFoundError(f"The file path specified does not exist: \
                                 {file_path}")
 
-    if not isinstance(first_pass, bool):
-        raise TypeError("The first_pass parameter must be a boolean.")
-
-    # should should consolidate and abstract this
-    data = loader.data_raw_loader(file_path=file_path)
-
     if 'date_location' in settings.keys():
-        date_offset = loader.non_standard_date_location(
-                data=data,
+        date_offset = loader.file_date_offset(
+                file_path=file_path,
                 date_location=settings['date_location']
             )
     else:
         date_offset = None
 
-    epoch_time, data = loader.general_data_formatter(
-        data=data,
+    # the file is streamed in row blocks, not loaded whole
+    epoch_time, data = loader.general_data_formatter_chunked(
+        file_path=file_path,
         data_checks=settings['data_checks'],
         data_column=settings['data_column'],
         time_column=settings['time_column'],
@@ -249,6 +368,37 @@ def get_1d_stream(
         time=epoch_time,
         data=data,
         header=settings['data_header'])
+    return epoch_time, data
+
+
+def stream_add_1d_data(
+    stream: object,
+    epoch_time: np.ndarray,
+    data: np.ndarray,
+    settings: dict,
+    first_pass: bool = True,
+) -> object:
+    """
+    Initializes or updates a Stream with a block from get_1d_data.
+
+    Parameters:
+    ----------
+    stream : Stream
+        The Stream object to update.
+    epoch_time : np.ndarray
+        The epoch time of the block.
+    data : np.ndarray
+        The data of the block, (header, time).
+    settings : dict
+        The settings used to load the block, for the data header.
+    first_pass : bool
+        If True, the stream is initialized with the block.
+
+    Returns:
+    -------
+    Stream
+        The Stream object updated with the block.
+    """
     if first_pass:
         stream.header = settings['data_header']
         stream.data = data
@@ -264,6 +414,70 @@ def get_1d_stream(
     return stream
 
 
+def get_1d_stream(
+    file_path: str,
+    settings: dict,
+    first_pass: bool = True,
+    stream: object = None,
+) -> object:
+    """
+    Loads and formats a 1D data stream from a file and initializes or updates
+    a Stream object.
+
+    Parameters:
+    ----------
+    file_path : str
+        The path of the file to load data from.
+    first_pass : bool
+        Whether this is the first time data is being loaded. If True, the
+        stream is initialized.
+        If False, raises an error as only one file can be loaded.
+    settings : dict
+        A dictionary containing data formatting settings such as data checks,
+        column names,
+        time format, delimiter, and timezone information.
+    stream : Stream, optional
+        An instance of Stream class to be updated with loaded data. Defaults
+        to a new Stream object.
+
+    Returns:
+    -------
+    Stream
+        The Stream object updated with the loaded data and corresponding time
+        information.
+
+    Raises:
+    ------
+    ValueError
+        If `first_pass` is False, indicating data has already been loaded.
+    TypeError
+        If `settings` is not a dictionary.
+    FileNotFoundError
+        If the file specified by `file_path` does not exist.
+    KeyError
+        If any required keys are missing in the `settings` dictionary.
+    """
+    if stream is None:
+        stream = Stream(
+            header=[],
+            data=np.array([]),
+            time=np.array([]),
+            files=[]
+        )
+    if not isinstance(first_pass, bool):
+        raise TypeError("The first_pass parameter must be a boolean.")
+
+    epoch_time, data = get_1d_data(file_path=file_path, settings=settings)
+
+    return stream_add_1d_data(
+        stream=stream,
+        epoch_time=epoch_time,
+        data=data,
+        settings=settings,
+        first_pass=first_pass
+    )
+
+
 # def initialise_2d_datastream(
 #     self,
 #     key: str,
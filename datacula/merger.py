@@ -13,8 +13,124 @@ interpolate the data to the data stream's time array.
 
 import numpy as np
 import warnings
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 from datacula import convert, stats
+from datacula.stream import HeaderIndex
+
+
+def _fill_invalid_samples(
+        time_new: np.ndarray,
+        data_new: np.ndarray,
+        valid: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Value and slope of each channel at each sample, skipping nan samples.
+
+    The indices of the valid samples are forward and backward filled along
+    each channel, so every sample is interpolated between the last valid
+    sample at or before it and the first valid sample after it. The values
+    are held flat before the first and after the last valid sample, and
+    channels without valid samples are all nan.
+
+    Parameters:
+    -----------
+    time_new : np.ndarray (n,)
+        Increasing time array of data_new.
+    data_new : np.ndarray (channels, n)
+        Data with nan samples.
+    valid : np.ndarray (channels, n)
+        Mask of the non-nan samples of data_new.
+
+    Returns:
+    --------
+    Tuple[np.ndarray, np.ndarray]
+        The value at and the slope after each sample, both (channels, n).
+    """
+    channels, samples = data_new.shape
+    sample_index = np.arange(samples)
+    previous_valid = np.maximum.accumulate(
+        np.where(valid, sample_index, -1), axis=1)
+    next_valid = np.minimum.accumulate(
+        np.where(valid, sample_index, samples)[:, ::-1], axis=1)[:, ::-1]
+    next_valid = np.concatenate(
+        (next_valid[:, 1:], np.full((channels, 1), samples)), axis=1)
+
+    has_previous = previous_valid >= 0
+    has_next = next_valid < samples
+    previous_clipped = np.clip(previous_valid, 0, samples - 1)
+    next_clipped = np.clip(next_valid, 0, samples - 1)
+    previous_value = np.take_along_axis(data_new, previous_clipped, axis=1)
+    next_value = np.take_along_axis(data_new, next_clipped, axis=1)
+    previous_time = time_new[previous_clipped]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(
+            has_previous & has_next,
+            (next_value - previous_value)
+            / (time_new[next_clipped] - previous_time),
+            0.0)
+    value = np.where(
+        has_previous,
+        previous_value + slope * (time_new - previous_time),
+        next_value)
+    value[~valid.any(axis=1)] = np.nan
+    return value, slope
+
+
+def interpolate_channels(
+        time: np.ndarray,
+        time_new: np.ndarray,
+        data_new: np.ndarray,
+    ) -> np.ndarray:
+    """
+    Interpolates every channel of data_new onto time in one batch.
+
+    Equivalent to calling np.interp per channel on its non-nan samples, with
+    the first and last valid values held outside the range. Each channel is
+    reduced to a value and slope at every sample of time_new, so the
+    searchsorted index and offset against time are computed once and all
+    channels are evaluated with one gather and blend.
+
+    Parameters:
+    -----------
+    time : np.ndarray (m,)
+        Time array to interpolate onto.
+    time_new : np.ndarray (n,)
+        Increasing time array of data_new.
+    data_new : np.ndarray (channels, n)
+        Data to interpolate.
+
+    Returns:
+    --------
+    np.ndarray (channels, m)
+        The interpolated data, all nan for channels without valid samples.
+    """
+    time = np.asarray(time, dtype=float)
+    time_new = np.asarray(time_new, dtype=float)
+    data_new = np.asarray(data_new, dtype=float)
+    samples = data_new.shape[1]
+
+    valid = ~np.isnan(data_new)
+    if valid.all():
+        # value at each sample time and slope to the next sample
+        value = data_new
+        slope = np.zeros_like(data_new)
+        # repeated times give inf slopes, never read as the searchsorted
+        # below picks the last of the repeated samples
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope[:, :-1] = np.diff(data_new, axis=1) / np.diff(time_new)
+    else:
+        value, slope = _fill_invalid_samples(time_new, data_new, valid)
+
+    # sample at or before each time, and the offset from it
+    left_sample = np.clip(
+        np.searchsorted(time_new, time, side='right') - 1, 0, samples - 1)
+    offset = np.maximum(time - time_new[left_sample], 0.0)
+
+    data_interp = slope[:, left_sample]
+    data_interp *= offset
+    data_interp += value[:, left_sample]
+    return data_interp
 
 
 def combine_data(
@@ -24,6 +140,7 @@ def combine_data(
         data_new: np.array,
         time_new: np.array,
         header_new: List[str],
+        header_index: Optional[HeaderIndex] = None,
     ) -> Tuple[np.array, List[str], Dict[str, int]]:
     """
     Merge or adds processed data together. Accounts for data shape
@@ -44,6 +161,10 @@ def combine_data(
         Time array for the new data.
     header_new : List[str]
         List of headers for the new data.
+    header_index : HeaderIndex, optional
+        Index of header_list, e.g. Stream.header_index. If given, header_list
+        is extended in place and the index is updated incrementally instead
+        of building a new header dictionary.
 
     Returns:
     --------
@@ -62,7 +183,6 @@ def combine_data(
     if np.array_equal(time, time_new):
         # no need to interpolate the data_new before adding
         # it to the data
-        header_updated = np.append(header_list, header_new)
         data_updated = np.concatenate(
             (
                 data,
@@ -71,21 +191,7 @@ def combine_data(
             axis=0,
         )
     else: # interpolate the data_new before adding it to the data_stream
-        data_interp = np.empty((data_new.shape[0], len(time)))
-        for i in range(data_new.shape[0]):
-            mask = ~np.isnan(data_new[i, :])
-            if not mask.any():
-                data_interp[i, :] = np.nan
-            else:
-                left_value = data_new[i, mask][0]
-                right_value = data_new[i, mask][-1]
-                data_interp[i, :] = np.interp(
-                    time, 
-                    time_new[mask],
-                    data_new[i, mask],
-                    left=left_value,
-                    right=right_value,
-                )
+        data_interp = interpolate_channels(time, time_new, data_new)
         # update the data array
         data_updated = np.concatenate(
             (
@@ -95,10 +201,11 @@ def combine_data(
             axis=0,
         )
 
-    header_updated = np.append(header_list, header_new)
-    header_dict = convert.list_to_dict(header_updated)
+    if header_index is None:
+        header_index = HeaderIndex(list(header_list))
+    header_index.extend(header_new)
 
-    return data_updated, header_updated, header_dict
+    return data_updated, header_index.names, header_index.columns
 
 
 def stream_add_data(
@@ -150,13 +257,14 @@ def stream_add_data(
     appended to the existing data.
 
     The function also checks whether the time stream is increasing, and if
-    not, sorts the time stream and corresponding data.
+    not, sorts the time stream and corresponding data. The data is appended
+    with Stream.append, so only the new data is copied and only the part of
+    the history overlapped by the new times is re-sorted.
     """
 
     if stream.data.size == 0:
-        stream.data = data_new
-        stream.time = time_new
-    elif header_check:
+        stream.append(time_new, data_new)
+    elif header_check and header_new != stream.header:
         stream.data, stream.header, data_new, header_new = \
             stats.merge_formatting(
                 data_current=stream.data,
@@ -165,23 +273,9 @@ def stream_add_data(
                 header_new=header_new
             )
         # updates stream
-        stream.data = np.hstack((stream.data, data_new))
-        stream.time = np.concatenate((stream.time, time_new))
+        stream.append(time_new, data_new)
     else:
-        stream.data = np.hstack((stream.data, data_new))
-        stream.time = np.concatenate((stream.time, time_new))
-
-    # check if the time stream added is increasing
-    increasing_time = np.all(
-        stream.time[1:] >= stream.time[:-1],
-        axis=0
-    )
-
-    if not increasing_time:
-        # sort the time stream
-        sorted_time_index = np.argsort(stream.time)
-        stream.time = stream.time[sorted_time_index]
-        stream.data = stream.data[:, sorted_time_index]
+        stream.append(time_new, data_new)
     return stream
 
 
@@ -206,7 +300,7 @@ def stream_add_processed_data(
     header_new : list
         List of headers for the new data.
     """
-    stream.data, stream.header, stream.header = \
+    stream.data, stream.header, _ = \
         combine_data(
             data=stream.data,
             time=stream.time,
@@ -214,5 +308,6 @@ def stream_add_processed_data(
             data_new=data_new,
             time_new=time_new,
             header_new=header_new,
+            header_index=stream.header_index,
         )
     return stream
\ No newline at end of file
@@ -7,13 +7,19 @@ TODO: clean up the linting, imports, create tests
 # pytype: skip-file
 
 
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 import numpy as np
 import PyMieScatt as ps
-from scipy.integrate import trapz
+from scipy.integrate import trapz, trapezoid, cumulative_trapezoid
 from functools import lru_cache
 from tqdm import tqdm
 from scipy.optimize import fminbound
+from scipy.special import spherical_jn, spherical_yn
 from datacula import convert
+from datacula.truncation_cache import cache_key
 
 
 @lru_cache(maxsize=100000)
@@ -48,6 +54,576 @@ def discretize_AutoMieQ(
     return Q_ext, Q_sca, Q_abs, g, Q_pr, Q_back, Q_ratio
 
 
+def mie_efficiencies(
+            m,
+            wavelength,
+            diameter,
+            nMedium=1.0,
+        ):
+    """Mie efficiencies for an array of diameters in one vectorized call,
+    the same as ps.AutoMieQ for each diameter.
+
+    The Mie coefficients of all size parameters are computed as 2D arrays,
+    (terms, diameters), padded to the largest number of terms, the terms
+    past each diameter's own nmax are zeroed before the sums. The
+    logarithmic derivative D_n(mx) downward recurrence runs once for all
+    diameters, each starting at its own nmx. Size parameters up to 0.05 use
+    the Rayleigh limit, as in PyMieScatt.
+
+    Parameters
+    ----------
+    m : complex or array_like
+        Complex refractive index of the sphere, or one per sphere,
+        broadcastable to diameter
+    wavelength : float
+        Wavelength of the incident light in nm
+    diameter : array_like
+        Diameters of the spheres in nm
+    nMedium : float, optional
+        Refractive index of the medium, by default 1.0
+
+    Returns
+    -------
+    Q_ext, Q_sca, Q_abs, g, Q_pr, Q_back, Q_ratio
+        Arrays with the shape of diameter
+    """
+    nMedium = np.real(nMedium)
+    diameter = np.asarray(diameter, dtype=np.float64)
+    m = np.asarray(m, dtype=complex) / nMedium
+    shape = np.broadcast_shapes(diameter.shape, m.shape)
+    m = np.broadcast_to(m, shape).ravel()
+    wavelength = wavelength / nMedium
+    x = np.pi * np.broadcast_to(diameter, shape).ravel() / wavelength
+
+    Q_ext = np.zeros(x.size)
+    Q_sca = np.zeros(x.size)
+    Q_back = np.zeros(x.size)
+    g = np.full(x.size, 1.5)
+    Q_ratio = np.zeros(x.size)
+
+    # Rayleigh limit, B&H eq 5.8, 5.9 and 5.11
+    rayleigh = (x > 0) & (x <= 0.05)
+    if np.any(rayleigh):
+        x_r = x[rayleigh]
+        lorentz_lorenz = (m[rayleigh]**2 - 1) / (m[rayleigh]**2 + 2)
+        Q_sca[rayleigh] = 8 * np.abs(lorentz_lorenz)**2 * x_r**4 / 3
+        Q_ext[rayleigh] = Q_sca[rayleigh] + 4 * x_r * lorentz_lorenz.imag
+        Q_back[rayleigh] = 1.5 * Q_sca[rayleigh]
+        Q_ratio[rayleigh] = 1.5
+        g[rayleigh] = 0
+
+    full = x > 0.05
+    if np.any(full):
+        x_f = x[full]
+        m_f = m[full]
+        mx = m_f * x_f
+        nmax = np.round(2 + x_f + 4 * x_f**(1 / 3))
+        nmx = np.round(np.maximum(nmax, np.abs(mx)) + 16).astype(int)
+        n = np.arange(1, nmax.max() + 1)[:, np.newaxis]
+        in_range = n <= nmax
+
+        # Riccati-Bessel functions psi_n(x), chi_n(x) and the n-1 terms
+        # padded terms past nmax may overflow, they are zeroed below
+        with np.errstate(all='ignore'):
+            px = x_f * spherical_jn(n, x_f)
+            chx = -x_f * spherical_yn(n, x_f)
+            p1x = np.vstack((np.sin(x_f), px[:-1]))
+            ch1x = np.vstack((np.cos(x_f), chx[:-1]))
+            gsx = px - 1j * chx
+            gs1x = p1x - 1j * ch1x
+
+        # B&H Equation 4.89, downward from each diameter's nmx
+        Dn = np.zeros((nmx.max(), x_f.size), dtype=complex)
+        with np.errstate(all='ignore'):
+            for i in range(nmx.max() - 1, 1, -1):
+                Dn[i - 1] = np.where(
+                    i < nmx, (i / mx) - (1 / (Dn[i] + i / mx)), 0)
+        D = Dn[1:len(n) + 1]
+
+        with np.errstate(all='ignore'):
+            da = D / m_f + n / x_f
+            db = m_f * D + n / x_f
+            an = (da * px - p1x) / (da * gsx - gs1x)
+            bn = (db * px - p1x) / (db * gsx - gs1x)
+        an = np.where(in_range, an, 0)
+        bn = np.where(in_range, bn, 0)
+
+        n1 = 2 * n + 1
+        n2 = n * (n + 2) / (n + 1)
+        n3 = n1 / (n * (n + 1))
+        x2 = x_f**2
+        Q_ext[full] = (2 / x2) * np.sum(n1 * (an.real + bn.real), axis=0)
+        Q_sca[full] = (2 / x2) * np.sum(
+            n1 * (np.abs(an)**2 + np.abs(bn)**2), axis=0)
+
+        an_next = np.vstack((an[1:], np.zeros((1, x_f.size))))
+        bn_next = np.vstack((bn[1:], np.zeros((1, x_f.size))))
+        g[full] = (4 / (Q_sca[full] * x2)) * np.sum(
+            n2 * (an.real * an_next.real + an.imag * an_next.imag
+                  + bn.real * bn_next.real + bn.imag * bn_next.imag)
+            + n3 * (an.real * bn.real + an.imag * bn.imag), axis=0)
+        Q_back[full] = (1 / x2) * np.abs(
+            np.sum(n1 * (-1.0)**n * (an - bn), axis=0))**2
+        Q_ratio[full] = Q_back[full] / Q_sca[full]
+
+    Q_abs = Q_ext - Q_sca
+    Q_pr = Q_ext - Q_sca * g
+    return tuple(
+        value.reshape(shape)
+        for value in (Q_ext, Q_sca, Q_abs, g, Q_pr, Q_back, Q_ratio))
+
+
+MIE_TABLE_VALUES = 'mie_table.npy'
+MIE_TABLE_GRID = 'mie_table_grid.json'
+MIE_TABLE_QUANTITIES = ('Q_ext', 'Q_sca', 'Q_back', 'g')
+
+
+@dataclass
+class MieTable:
+    """A precomputed table of Mie efficiencies, see build_mie_table.
+
+    Attributes:
+        m_real (np.ndarray): The real refractive index grid, increasing.
+        m_imag (np.ndarray): The imaginary refractive index grid, increasing.
+        size_parameter (np.ndarray): The size parameter grid, increasing.
+        values (np.ndarray): Q_ext, Q_sca, Q_back and g, with the shape
+            (4, len(m_real), len(m_imag), len(size_parameter)). Memory-mapped
+            when loaded with load_mie_table.
+        max_relative_error (dict): The largest relative error of each
+            quantity (absolute for g), interpolated at the size parameter
+            midpoints, at the refractive index grid nodes.
+    """
+    m_real: np.ndarray
+    m_imag: np.ndarray
+    size_parameter: np.ndarray
+    values: np.ndarray
+    max_relative_error: dict
+
+
+def _interpolate_size_parameter(size_parameter, values, x):
+    """Interpolation in log size parameter of Q_ext, Q_sca, Q_back (log-log,
+    as they follow power laws at small x) and g (log-linear)"""
+    log_grid = np.log(size_parameter)
+    log_x = np.log(x)
+    tiny = np.finfo(np.float64).tiny
+    efficiencies = [
+        np.exp(np.interp(log_x, log_grid, np.log(np.maximum(row, tiny))))
+        for row in values[:3]]
+    return np.stack(efficiencies + [np.interp(log_x, log_grid, values[3])])
+
+
+def build_mie_table(
+            path,
+            m_real=np.round(np.arange(1.30, 1.7001, 0.01), 3),
+            m_imag=np.concatenate(([0.0], np.geomspace(1e-4, 1.0, 17))),
+            size_parameter=np.geomspace(0.05, 50, 4000),
+        ):
+    """Compute a Mie efficiency table and save it to the path folder.
+
+    Wavelength and diameter only enter through the size parameter,
+    x = pi*diameter/wavelength, so the table covers any wavelength. Each
+    refractive index node is one mie_efficiencies call. The error of the
+    interpolation in x is measured against exact values at the midpoints of
+    the x grid and saved with the table. The error between refractive
+    index nodes is not measured, it grows with the node spacing times the
+    size parameter, keep the real part spacing at ~0.01 as in the defaults.
+    The narrow resonances of weakly absorbing spheres at large x are not
+    resolved by any practical grid, the errors there are large for single
+    diameters but average out over a size distribution. The default grid
+    covers diameters up to ~7 um at 450 nm, and takes a while to build,
+    once.
+
+    Parameters
+    ----------
+    path : str
+        Folder to write the table to, created if missing
+    m_real : array_like, optional
+        Real refractive index grid
+    m_imag : array_like, optional
+        Imaginary refractive index grid, non-negative
+    size_parameter : array_like, optional
+        Size parameter grid, positive, ~1300 points per decade by default
+
+    Returns
+    -------
+    MieTable
+        The table, not memory-mapped
+    """
+    m_real = np.asarray(m_real, dtype=np.float64)
+    m_imag = np.asarray(m_imag, dtype=np.float64)
+    size_parameter = np.asarray(size_parameter, dtype=np.float64)
+    midpoints = np.sqrt(size_parameter[1:] * size_parameter[:-1])
+
+    values = np.zeros(
+        (len(MIE_TABLE_QUANTITIES), len(m_real), len(m_imag),
+         len(size_parameter)))
+    max_relative_error = np.zeros(len(MIE_TABLE_QUANTITIES))
+    for i, real in enumerate(m_real):
+        for j, imag in enumerate(m_imag):
+            m = complex(real, imag)
+            # with a wavelength of pi the diameter is the size parameter
+            Q_ext, Q_sca, _, g, _, Q_back, _ = mie_efficiencies(
+                m, np.pi, size_parameter)
+            values[:, i, j] = Q_ext, Q_sca, Q_back, g
+            Q_ext, Q_sca, _, g, _, Q_back, _ = mie_efficiencies(
+                m, np.pi, midpoints)
+            exact = np.stack((Q_ext, Q_sca, Q_back, g))
+            interpolated = _interpolate_size_parameter(
+                size_parameter, values[:, i, j], midpoints)
+            with np.errstate(all='ignore'):
+                error = np.abs(interpolated - exact) / np.abs(exact)
+            # g crosses zero, its error is absolute
+            error[3] = np.abs(interpolated[3] - exact[3])
+            max_relative_error = np.maximum(
+                max_relative_error,
+                np.nanmax(np.where(exact != 0, error, 0), axis=1))
+
+    table = MieTable(
+        m_real=m_real,
+        m_imag=m_imag,
+        size_parameter=size_parameter,
+        values=values,
+        max_relative_error=dict(zip(
+            MIE_TABLE_QUANTITIES, max_relative_error.tolist())),
+    )
+    os.makedirs(path, exist_ok=True)
+    temp_path = os.path.join(path, MIE_TABLE_VALUES + '.tmp')
+    with open(temp_path, 'wb') as file:
+        np.save(file, values)
+    os.replace(temp_path, os.path.join(path, MIE_TABLE_VALUES))
+    temp_path = os.path.join(path, MIE_TABLE_GRID + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump({
+            'quantities': list(MIE_TABLE_QUANTITIES),
+            'm_real': m_real.tolist(),
+            'm_imag': m_imag.tolist(),
+            'size_parameter': size_parameter.tolist(),
+            'max_relative_error': table.max_relative_error,
+        }, file)
+    os.replace(temp_path, os.path.join(path, MIE_TABLE_GRID))
+    return table
+
+
+def load_mie_table(path, mmap_mode='r'):
+    """Load a table saved by build_mie_table, memory-mapped by default.
+
+    Parameters
+    ----------
+    path : str
+        Folder of the table
+    mmap_mode : str, optional
+        np.load mmap_mode, None reads the table into memory
+
+    Returns
+    -------
+    MieTable
+    """
+    with open(os.path.join(path, MIE_TABLE_GRID), 'r',
+              encoding='utf-8') as file:
+        grid = json.load(file)
+    return MieTable(
+        m_real=np.array(grid['m_real']),
+        m_imag=np.array(grid['m_imag']),
+        size_parameter=np.array(grid['size_parameter']),
+        values=np.load(
+            os.path.join(path, MIE_TABLE_VALUES), mmap_mode=mmap_mode),
+        max_relative_error=grid['max_relative_error'],
+    )
+
+
+def mie_table_efficiencies(
+            table,
+            m,
+            wavelength,
+            diameter,
+        ):
+    """Mie efficiencies interpolated from a MieTable, the same outputs as
+    mie_efficiencies.
+
+    Bilinear in the refractive index, then log-log in size parameter for
+    the efficiencies and log-linear for g.
+    Size parameters outside of the table are computed exactly with
+    mie_efficiencies, that is cheap below the table (Rayleigh limit) and
+    rare above it.
+
+    Parameters
+    ----------
+    table : MieTable
+        The table, see load_mie_table
+    m : complex
+        Complex refractive index of the sphere, inside the table grid
+    wavelength : float
+        Wavelength of the incident light in nm
+    diameter : array_like
+        Diameters of the spheres in nm
+
+    Returns
+    -------
+    Q_ext, Q_sca, Q_abs, g, Q_pr, Q_back, Q_ratio
+        Arrays with the shape of diameter
+
+    Raises
+    ------
+    ValueError
+        If m is outside of the table grid.
+    """
+    m = complex(m)
+    diameter = np.asarray(diameter, dtype=np.float64)
+    shape = diameter.shape
+    diameter = diameter.ravel()
+    x = np.pi * diameter / wavelength
+
+    corners = []
+    for grid, value in ((table.m_real, m.real), (table.m_imag, m.imag)):
+        if not grid[0] <= value <= grid[-1]:
+            raise ValueError(
+                f"Refractive index {m} outside of the Mie table grid")
+        index = int(np.clip(
+            np.searchsorted(grid, value, side='right') - 1, 0, len(grid) - 2))
+        weight = (value - grid[index]) / (grid[index + 1] - grid[index])
+        corners.append((index, weight))
+    (i, wi), (j, wj) = corners
+    block = np.asarray(table.values[:, i:i + 2, j:j + 2])
+    values_m = (
+        block[:, 0, 0] * (1 - wi) * (1 - wj)
+        + block[:, 1, 0] * wi * (1 - wj)
+        + block[:, 0, 1] * (1 - wi) * wj
+        + block[:, 1, 1] * wi * wj)
+
+    inside = (x >= table.size_parameter[0]) & (x <= table.size_parameter[-1])
+    Q_ext, Q_sca, Q_back, g = _interpolate_size_parameter(
+        table.size_parameter, values_m, np.where(inside, x, 1.0))
+    with np.errstate(all='ignore'):
+        Q_ratio = np.where(Q_sca > 0, Q_back / Q_sca, 0)
+    Q_abs = Q_ext - Q_sca
+    Q_pr = Q_ext - Q_sca * g
+    results = (Q_ext, Q_sca, Q_abs, g, Q_pr, Q_back, Q_ratio)
+
+    if not np.all(inside):
+        exact = mie_efficiencies(m, wavelength, diameter[~inside])
+        for value, exact_value in zip(results, exact):
+            value[~inside] = exact_value
+    return tuple(value.reshape(shape) for value in results)
+
+
+MIE_KERNEL_QUANTITIES = ('Bext', 'Bsca', 'Bback')
+
+
+def mie_kernel(
+            refractive_index,
+            wavelength,
+            diameters,
+            growth_factor=1.0,
+        ):
+    """Kernel of the optical coefficients per particle of each bin, for a
+    fixed bin grid, so the optics of a number distribution dN (#/cm^3 per
+    bin) are kernel @ dN, in 1/Mm, the same as Mie_SD with SMPS=True.
+
+    Parameters
+    ----------
+    refractive_index : complex
+        Complex refractive index of the particles
+    wavelength : float
+        Wavelength of the incident light in nm
+    diameters : array_like
+        Diameters of the bins in nm
+    growth_factor : float, optional
+        Diameter growth factor of the particles, by default 1.0
+
+    Returns
+    -------
+    kernel : array
+        (3, bins), the Bext, Bsca and Bback per particle of each bin
+    """
+    diameters = np.asarray(diameters, dtype=np.float64) * growth_factor
+    Q_ext, Q_sca, _, _, _, Q_back, _ = mie_efficiencies(
+        refractive_index, wavelength, diameters)
+    cross_section = np.pi*((diameters/2)**2)*(1e-6)
+    return np.stack((Q_ext, Q_sca, Q_back)) * cross_section
+
+
+@dataclass
+class MieKernelStack:
+    """Kernels of a fixed bin grid over refractive index and growth factor,
+    see build_mie_kernel_stack.
+
+    Attributes:
+        diameters (np.ndarray): The dry bin diameters in nm.
+        wavelength (float): The wavelength in nm.
+        refractive_index (np.ndarray): The refractive indices, along a path
+            of increasing real part, e.g. from the dry particle to water.
+        growth_factor (np.ndarray): The growth factors, increasing.
+        kernel (np.ndarray): (3, len(refractive_index), len(growth_factor),
+            bins), see mie_kernel.
+    """
+    diameters: np.ndarray
+    wavelength: float
+    refractive_index: np.ndarray
+    growth_factor: np.ndarray
+    kernel: np.ndarray
+
+
+def build_mie_kernel_stack(
+            diameters,
+            wavelength,
+            refractive_index,
+            growth_factor=np.linspace(1.0, 3.0, 81),
+        ):
+    """Precompute the kernels of a bin grid over refractive index and growth
+    factor, in one mie_efficiencies call.
+
+    For humidified optics, the effective refractive index of a particle
+    lies between the dry and the water refractive index, so a short path
+    of refractive indices between the two covers every water uptake. With
+    kappa growth the growth factor is the same for every bin.
+
+    Parameters
+    ----------
+    diameters : array_like
+        Dry diameters of the bins in nm
+    wavelength : float
+        Wavelength of the incident light in nm
+    refractive_index : array_like
+        Complex refractive indices, sorted by real part, e.g.
+        np.linspace(1.33, 1.45, 25) from water to the dry particle
+    growth_factor : array_like, optional
+        Diameter growth factors, increasing, by default 1 to 3
+
+    Returns
+    -------
+    MieKernelStack
+    """
+    diameters = np.asarray(diameters, dtype=np.float64)
+    refractive_index = np.asarray(refractive_index, dtype=complex)
+    growth_factor = np.asarray(growth_factor, dtype=np.float64)
+    if np.any(np.diff(refractive_index.real) <= 0) \
+            or np.any(np.diff(growth_factor) <= 0):
+        raise ValueError(
+            'refractive_index real part and growth_factor must increase')
+
+    grown = growth_factor[:, np.newaxis] * diameters  # (growth, bins)
+    Q_ext, Q_sca, _, _, _, Q_back, _ = mie_efficiencies(
+        refractive_index[:, np.newaxis, np.newaxis], wavelength, grown)
+    cross_section = np.pi*((grown/2)**2)*(1e-6)
+    return MieKernelStack(
+        diameters=diameters,
+        wavelength=wavelength,
+        refractive_index=refractive_index,
+        growth_factor=growth_factor,
+        kernel=np.stack((Q_ext, Q_sca, Q_back)) * cross_section,
+    )
+
+
+def _grid_weights(grid, values, name):
+    """Lower grid index and linear weight of each value, inside the grid"""
+    values = np.asarray(values, dtype=np.float64)
+    if np.any(values < grid[0]) or np.any(values > grid[-1]):
+        raise ValueError(f"{name} outside of the kernel stack grid")
+    index = np.clip(
+        np.searchsorted(grid, values, side='right') - 1, 0, len(grid) - 2)
+    weight = (values - grid[index]) / (grid[index + 1] - grid[index])
+    return index, weight
+
+
+def interpolate_mie_kernel(stack, refractive_index, growth_factor):
+    """Kernels at each sample's refractive index and growth factor, bilinear
+    in the real part of the refractive index and the growth factor.
+
+    Parameters
+    ----------
+    stack : MieKernelStack
+    refractive_index : array_like
+        Refractive index of each sample, only the real part locates it on
+        the stack path
+    growth_factor : array_like
+        Growth factor of each sample
+
+    Returns
+    -------
+    kernel : array
+        (samples, 3, bins)
+    """
+    i, wi = _grid_weights(
+        stack.refractive_index.real, np.real(refractive_index),
+        'refractive_index')
+    j, wj = _grid_weights(stack.growth_factor, growth_factor, 'growth_factor')
+    wi = wi[:, np.newaxis, np.newaxis]
+    wj = wj[:, np.newaxis, np.newaxis]
+    kernel = np.moveaxis(stack.kernel, 0, 2)  # (m, growth, 3, bins)
+    return kernel[i, j] * (1 - wi) * (1 - wj) \
+        + kernel[i + 1, j] * wi * (1 - wj) \
+        + kernel[i, j + 1] * (1 - wi) * wj \
+        + kernel[i + 1, j + 1] * wi * wj
+
+
+def kernel_optics(kernel, particle_counts):
+    """Optics of number distributions from a kernel.
+
+    Parameters
+    ----------
+    kernel : array
+        (3, bins) for all samples, see mie_kernel, or (samples, 3, bins),
+        see interpolate_mie_kernel
+    particle_counts : array_like
+        Particle counts #/cm^3, (bins,) or (samples, bins)
+
+    Returns
+    -------
+    optics : array
+        Bext, Bsca and Bback in 1/Mm, (3,) or (samples, 3)
+    """
+    return np.einsum('...qb,...b->...q', kernel, particle_counts)
+
+
+def humidified_kernel_optics(
+            stack,
+            particle_counts,
+            kappa,
+            water_activity_sizer,
+            water_activity_sample,
+            refractive_index_dry=1.45,
+            water_refractive_index=1.33,
+        ):
+    """Optics at a sample humidity of a series of sizer distributions, with
+    kappa water uptake, as extinction_ratio_wet_dry computes them, from a
+    kernel stack instead of Mie calls.
+
+    Parameters
+    ----------
+    stack : MieKernelStack
+        Kernels over the sizer bins, see build_mie_kernel_stack
+    particle_counts : array_like
+        Particle counts #/cm^3, (samples, bins)
+    kappa : array_like
+        kappa of each sample
+    water_activity_sizer : array_like
+        water activity of the size distributions
+    water_activity_sample : array_like
+        water activity of the optical measurements
+    refractive_index_dry : float, optional
+        refractive index of the dry aerosol
+    water_refractive_index : float, optional
+        refractive index of water
+
+    Returns
+    -------
+    optics : array
+        Bext, Bsca and Bback in 1/Mm, (samples, 3)
+    """
+    kappa = np.asarray(kappa, dtype=np.float64)
+    # the volume ratios are the same for every bin
+    volume_dry = convert.kappa_volume_solute(
+        1.0, kappa, np.asarray(water_activity_sizer, dtype=np.float64))
+    volume_water = convert.kappa_volume_water(
+        volume_dry, kappa, np.asarray(water_activity_sample, dtype=np.float64))
+    growth_factor = np.cbrt(volume_dry + volume_water)
+    n_effective = convert.effective_refractive_index(
+        refractive_index_dry, water_refractive_index,
+        volume_dry, volume_water)
+    kernel = interpolate_mie_kernel(stack, n_effective, growth_factor)
+    return kernel_optics(kernel, particle_counts)
+
+
 def Mie_SD(
         m,
         wavelength,
@@ -60,7 +636,8 @@ def Mie_SD(
         extinction_only=False,
         discretize=False,
         truncation_calculation=False,
-        truncation_Bsca_multiple=None):
+        truncation_Bsca_multiple=None,
+        mie_table=None):
     """Return the extinction coefficient only if set to true
 
     Parameters
@@ -90,6 +667,9 @@ def Mie_SD(
     truncation_Bsca_multiple : float, optional
         The multiple of the backscattering coefficient to truncate the Qsca
         coefficent by default None. Qsca_trunc = Qsca*truncation_Bsca_multiple
+    mie_table : MieTable, optional
+        Interpolate the efficiencies from this table instead of computing
+        them, see load_mie_table. Takes precedence over discretize.
 
     Returns
     -------
@@ -104,20 +684,15 @@ def Mie_SD(
     wavelength /= nMedium
     dp = convert.coerce_type(dp, np.ndarray)
     ndp = convert.coerce_type(ndp, np.ndarray)
-    _length = np.size(dp)
-    Q_ext = np.zeros(_length)
-    Q_sca = np.zeros(_length)
-    Q_abs = np.zeros(_length)
-    Q_pr = np.zeros(_length)
-    Q_back = np.zeros(_length)
-    Q_ratio = np.zeros(_length)
-    g = np.zeros(_length)
 
     # scaling of 1e-6 to cast in units of inverse megameters - see docs
     aSDn = np.pi*((dp/2)**2)*ndp*(1e-6)
     # _logdp = np.log10(dp)
 
-    if discretize:
+    if mie_table is not None:
+        Q_ext, Q_sca, Q_abs, g, Q_pr, Q_back, Q_ratio = \
+            mie_table_efficiencies(mie_table, m, wavelength, dp)
+    elif discretize:
         m_real = convert.round_arbitrary(np.real(m), base=0.001, mode='round')
         m_imag = convert.round_arbitrary(np.imag(m), base=0.001, mode='round')
         if m_imag == 0:
@@ -135,11 +710,11 @@ def Mie_SD(
                 mode='round',
                 nonzero_edge=True
             )
-        for i in range(_length):
-            Q_ext[i], Q_sca[i], Q_abs[i], g[i], Q_pr[i], Q_back[i], Q_ratio[i] = discretize_AutoMieQ(m_discretized, wavelength_discretized, dp_discretized[i], nMedium)
+        Q_ext, Q_sca, Q_abs, g, Q_pr, Q_back, Q_ratio = mie_efficiencies(
+            m_discretized, wavelength_discretized, dp_discretized)
     else:
-        for i in range(_length):
-            Q_ext[i], Q_sca[i], Q_abs[i], g[i], Q_pr[i], Q_back[i], Q_ratio[i] = ps.AutoMieQ(m, wavelength, dp[i], nMedium)
+        Q_ext, Q_sca, Q_abs, g, Q_pr, Q_back, Q_ratio = mie_efficiencies(
+            m, wavelength, dp)
 
     # apply truncation of bsca if requested
     if truncation_calculation:
@@ -193,6 +768,7 @@ def extinction_ratio_wet_dry(
         discretize_Mie=True,
         return_coefficients=False,
         return_all_optics=False,
+        mie_table=None,
         ):
     """
     Calculate the extinction ratio of a dry aerosol to a wet aerosol.
@@ -224,6 +800,8 @@ def extinction_ratio_wet_dry(
         return the extinction of the wet and dry aerosol
     return_all_optics : bool optional
         return all the optics of the wet and dry aerosol
+    mie_table : MieTable optional
+        interpolate the Mie efficiencies from this table, see load_mie_table
 
     Returns
     -------
@@ -272,7 +850,8 @@ def extinction_ratio_wet_dry(
             ndp=particle_counts,
             SMPS=True,
             extinction_only=not(return_all_optics),
-            discretize=discretize_Mie
+            discretize=discretize_Mie,
+            mie_table=mie_table
         )
     optics_wet = Mie_SD(
             n_effective_wet,
@@ -281,7 +860,8 @@ def extinction_ratio_wet_dry(
             ndp=particle_counts,
             SMPS=True,
             extinction_only=not(return_all_optics),
-            discretize=discretize_Mie
+            discretize=discretize_Mie,
+            mie_table=mie_table
         )
 
     if return_coefficients:
@@ -305,6 +885,7 @@ def fit_extinction_ratio_with_kappa(
         kappa_bounds=(0, 1),
         kappa_tolerance=1e-6,
         kappa_maxiter=100,
+        mie_table=None,
         ):
     """
     Fit the extinction ratio of a dry aerosol to a wet aerosol.
@@ -341,6 +922,8 @@ def fit_extinction_ratio_with_kappa(
         tolerance for the kappa value
     kappa_maxiter : int optional
         maximum number of iterations for the kappa fit
+    mie_table : MieTable optional
+        interpolate the Mie efficiencies from this table, see load_mie_table
     
     Returns
     -------
@@ -360,7 +943,8 @@ def fit_extinction_ratio_with_kappa(
             water_refractive_index=water_refractive_index,
             wavelength=wavelength,
             discretize_Mie=discretize_Mie,
-            return_coefficients=False
+            return_coefficients=False,
+            mie_table=mie_table
         )
         return np.abs(ratio_guess - Bext_wet/Bext_dry)
 
@@ -376,6 +960,252 @@ def fit_extinction_ratio_with_kappa(
     return out[0]
 
 
+def _extinction_batch(m, wavelength, dp, ndp, discretize, mie_table):
+    """Bext of many size distributions, as Mie_SD with SMPS=True and
+    extinction_only=True, m is one refractive index per distribution."""
+    aSDn = np.pi*((dp/2)**2)*ndp*(1e-6)
+    if mie_table is not None:
+        Q_ext = np.zeros(dp.shape)
+        unique_m, index = np.unique(m, return_inverse=True)
+        for j, m_value in enumerate(unique_m):
+            rows = index.ravel() == j
+            Q_ext[rows] = mie_table_efficiencies(
+                mie_table, m_value, wavelength, dp[rows])[0]
+    else:
+        if discretize:
+            m = convert.round_arbitrary(np.real(m), base=0.001, mode='round') \
+                + 1j*convert.round_arbitrary(
+                    np.imag(m), base=0.001, mode='round')
+            wavelength = convert.round_arbitrary(
+                wavelength, base=1, mode='round')
+            dp = convert.round_arbitrary(
+                dp, base=5, mode='round', nonzero_edge=True)
+        Q_ext = mie_efficiencies(m[:, np.newaxis], wavelength, dp)[0]
+    return np.sum(Q_ext*aSDn, axis=1)
+
+
+def extinction_ratio_wet_dry_batch(
+        kappa,
+        particle_counts,
+        diameters,
+        water_activity_sizer,
+        water_activity_dry,
+        water_activity_wet,
+        refractive_index_dry=1.45,
+        water_refractive_index=1.33,
+        wavelength=450,
+        discretize_Mie=True,
+        mie_table=None,
+        return_coefficients=False,
+        ):
+    """
+    extinction_ratio_wet_dry for many samples in one vectorized call, every
+    Mie efficiency of every sample and diameter bin at once.
+
+    Parameters
+    ----------
+    kappa : array_like
+        kappa parameter of each sample, (samples,)
+    particle_counts : array_like
+        particle counts of each sample, (samples, bins)
+    diameters : array_like
+        diameter of each bin, (bins,)
+    water_activity_sizer : array_like
+        water activity of the size distributions, (samples,)
+    water_activity_dry : array_like
+        water activity of the 'dry' aerosol extinctions, (samples,)
+    water_activity_wet : array_like
+        water activity of the 'wet' aerosol extinctions, (samples,)
+    refractive_index_dry : float or array_like optional
+        refractive index of the dry aerosol, or one per sample
+    water_refractive_index : float optional
+        refractive index of water
+    wavelength : float optional
+        wavelength of light in nm
+    discretize_Mie : bool optional
+        round the Mie inputs as Mie_SD does, for the same results
+    mie_table : MieTable optional
+        interpolate the Mie efficiencies from this table, see load_mie_table
+    return_coefficients : bool optional
+        return the extinction of the wet and dry aerosol
+
+    Returns
+    -------
+    extinction_ratio : array
+        extinction ratio of wet / dry aerosol of each sample
+    """
+    kappa = np.asarray(kappa, dtype=float)[:, np.newaxis]
+    water_activity_sizer = np.asarray(
+        water_activity_sizer, dtype=float)[:, np.newaxis]
+    water_activity_dry = np.asarray(
+        water_activity_dry, dtype=float)[:, np.newaxis]
+    water_activity_wet = np.asarray(
+        water_activity_wet, dtype=float)[:, np.newaxis]
+    particle_counts = np.asarray(particle_counts, dtype=float)
+
+    # (samples, bins)
+    volume_sizer = convert.length_to_volume(
+        np.asarray(diameters, dtype=float), length_type='diameter')
+    volume_dry = convert.kappa_volume_solute(
+        volume_sizer, kappa, water_activity_sizer)
+    volume_water_dry = convert.kappa_volume_water(
+        volume_dry, kappa, water_activity_dry)
+    volume_water_wet = convert.kappa_volume_water(
+        volume_dry, kappa, water_activity_wet)
+
+    n_effective_dry = convert.effective_refractive_index(
+        refractive_index_dry,
+        water_refractive_index,
+        volume_dry[:, -1],
+        volume_water_dry[:, -1])
+    n_effective_wet = convert.effective_refractive_index(
+        refractive_index_dry,
+        water_refractive_index,
+        volume_dry[:, -1],
+        volume_water_wet[:, -1])
+
+    extinction_dry = _extinction_batch(
+        np.asarray(n_effective_dry, dtype=complex),
+        wavelength,
+        convert.volume_to_length(
+            volume_dry+volume_water_dry, length_type='diameter'),
+        particle_counts,
+        discretize_Mie,
+        mie_table)
+    extinction_wet = _extinction_batch(
+        np.asarray(n_effective_wet, dtype=complex),
+        wavelength,
+        convert.volume_to_length(
+            volume_dry+volume_water_wet, length_type='diameter'),
+        particle_counts,
+        discretize_Mie,
+        mie_table)
+
+    if return_coefficients:
+        return extinction_wet, extinction_dry
+    return extinction_wet / extinction_dry
+
+
+def fit_extinction_ratio_with_kappa_batch(
+        Bext_dry,
+        Bext_wet,
+        particle_counts,
+        diameters,
+        water_activity_sizer,
+        water_activity_dry,
+        water_activity_wet,
+        refractive_index_dry=1.45,
+        water_refractive_index=1.33,
+        wavelength=450,
+        discretize_Mie=True,
+        kappa_bounds=(0, 1),
+        kappa_tolerance=1e-6,
+        kappa_maxiter=100,
+        mie_table=None,
+        batch_size=1000,
+        ):
+    """
+    fit_extinction_ratio_with_kappa for many samples at once, by bisection
+    run in lockstep across the samples.
+
+    The extinction ratio is monotonic in kappa, rising when the wet
+    humidity is above the dry one and falling when it is below, so the
+    direction of each sample is taken from its ratios at kappa_bounds.
+    Each iteration then halves the bracket of every unconverged sample
+    with one batched extinction_ratio_wet_dry_batch call. Converged samples
+    are masked out. Samples whose ratio is outside of the ratios at
+    kappa_bounds end at the nearest bound, as with fminbound. The samples
+    are solved in blocks of batch_size, as the Mie arrays of an iteration
+    grow with samples x bins x terms.
+
+    Parameters
+    ----------
+    Bext_dry : array_like
+        measured extinction of the dry aerosol, (samples,)
+    Bext_wet : array_like
+        measured extinction of the wet aerosol, (samples,)
+    particle_counts : array_like
+        particle counts of each sample, (samples, bins)
+    diameters : array_like
+        diameter of each bin, (bins,)
+    water_activity_sizer : array_like
+        water activity of the size distributions, (samples,)
+    water_activity_dry : array_like
+        water activity of the 'dry' aerosol extinctions, (samples,)
+    water_activity_wet : array_like
+        water activity of the 'wet' aerosol extinctions, (samples,)
+    refractive_index_dry : float or array_like optional
+        refractive index of the dry aerosol, or one per sample
+    water_refractive_index : float optional
+        refractive index of water
+    wavelength : float optional
+        wavelength of light in nm
+    discretize_Mie : bool optional
+        round the Mie inputs as Mie_SD does
+    kappa_bounds : tuple optional
+        bounds for the kappa value
+    kappa_tolerance : float optional
+        tolerance for the kappa value
+    kappa_maxiter : int optional
+        maximum number of bisection iterations
+    mie_table : MieTable optional
+        interpolate the Mie efficiencies from this table, see load_mie_table
+    batch_size : int optional
+        number of samples solved together, bounds the memory use
+
+    Returns
+    -------
+    kappa : array
+        kappa parameter of each sample
+    """
+    target = np.asarray(Bext_wet, dtype=float) \
+        / np.asarray(Bext_dry, dtype=float)
+    samples = len(target)
+    particle_counts = np.asarray(particle_counts, dtype=float)
+    water_activity_sizer = np.broadcast_to(water_activity_sizer, samples)
+    water_activity_dry = np.broadcast_to(water_activity_dry, samples)
+    water_activity_wet = np.broadcast_to(water_activity_wet, samples)
+    refractive_index_dry = np.broadcast_to(refractive_index_dry, samples)
+
+    def ratio_at(kappa, active):
+        return extinction_ratio_wet_dry_batch(
+            kappa,
+            particle_counts=particle_counts[active],
+            diameters=diameters,
+            water_activity_sizer=water_activity_sizer[active],
+            water_activity_dry=water_activity_dry[active],
+            water_activity_wet=water_activity_wet[active],
+            refractive_index_dry=refractive_index_dry[active],
+            water_refractive_index=water_refractive_index,
+            wavelength=wavelength,
+            discretize_Mie=discretize_Mie,
+            mie_table=mie_table,
+        )
+
+    def bisect(block):
+        low = np.full(block.size, float(kappa_bounds[0]))
+        high = np.full(block.size, float(kappa_bounds[1]))
+        increasing = ratio_at(high, block) >= ratio_at(low, block)
+        for _ in range(kappa_maxiter):
+            unconverged = np.flatnonzero(high - low > 2*kappa_tolerance)
+            if unconverged.size == 0:
+                break
+            active = block[unconverged]
+            middle = (low[unconverged] + high[unconverged]) / 2
+            ratio = ratio_at(middle, active)
+            # the root is below middle when the ratio is past the target
+            above = (ratio > target[active]) == increasing[unconverged]
+            high[unconverged] = np.where(above, middle, high[unconverged])
+            low[unconverged] = np.where(above, low[unconverged], middle)
+        return (low + high) / 2
+
+    kappa = np.empty(samples)
+    for start in range(0, samples, batch_size):
+        block = np.arange(start, min(start + batch_size, samples))
+        kappa[block] = bisect(block)
+    return kappa
+
+
 @lru_cache(maxsize=100000)
 def discretize_ScatteringFunction(
         m,
@@ -427,6 +1257,102 @@ def discretize_ScatteringFunction(
     return measure, SL, SR, SU
 
 
+# geometry and numerics of the CAPS-PM-SSA truncation calculation, all of
+# them change trunc_mono results, so they are part of the cache key
+CAPS_TRUNCATION_GEOMETRY = {
+    'diam_sphere': 10.0,  # diameter of integrating tube in CAPS in cm
+    'diam_tube': 1.0,  # diameter of tube in CAPS in cm
+    'extra_length': 0.6,  # length outside both sides of integrating sphere
+    'npos': 100,  # z-axis points
+    'angRes': 0.2,  # angular resolution of the scattering function
+    'trunc_calibration': 1.02245612148504,  # truncation at 150nm
+}
+
+
+@lru_cache(maxsize=1)
+def caps_truncation_limits():
+    """
+    The integration limits of the CAPS-PM-SSA truncation calculation, they
+    depend only on CAPS_TRUNCATION_GEOMETRY, not on the particle.
+
+    Returns
+    -------
+    z_axis: array of floats
+        z-axis positions of particles within cavity. Units are in cm.
+    theta1: array of floats
+        Forward scattering angle in radians of integration, truncated by
+        opening on far side of cavity.
+    theta2: array of floats
+        Backward scattering angle in radians truncated by opening on near
+        side of cavity.
+    inside: array of bools
+        z-axis positions inside of the integrating sphere, where the ideal
+        instrument sees the full scattering.
+    """
+    diam_sphere = CAPS_TRUNCATION_GEOMETRY['diam_sphere']
+    diam_tube = CAPS_TRUNCATION_GEOMETRY['diam_tube']
+    extra_length = CAPS_TRUNCATION_GEOMETRY['extra_length']
+    z1 = -0.5 * diam_sphere - extra_length  # lower limit of z-axis integral
+    z2 = 0.5 * diam_sphere + extra_length  # upper limit of z-axis integral
+    z_axis = np.linspace(z1, z2, CAPS_TRUNCATION_GEOMETRY['npos'])
+
+    # forward and back scattering angles, pi/2 at the sphere openings
+    alpha = np.arctan2(0.5*diam_tube, np.abs(0.5*diam_sphere - z_axis))
+    beta = np.arctan2(0.5*diam_tube, np.abs(-0.5*diam_sphere - z_axis))
+    before = z_axis < -0.5 * diam_sphere  # outside of sphere
+    after = z_axis > 0.5 * diam_sphere
+    inside = ~before & ~after
+
+    theta1 = np.where(after, np.pi - alpha, alpha)
+    theta2 = np.where(before, beta, np.pi - beta)
+    for array in (z_axis, theta1, theta2, inside):
+        array.flags.writeable = False
+    return z_axis, theta1, theta2, inside
+
+
+def truncated_scattering_efficiencies(theta, su, size_param):
+    """
+    Truncated and ideal scattering efficiencies along the CAPS z-axis, for
+    one or many scattering functions at once.
+
+    The scattering function is integrated once, cumulatively, and the
+    integral between the limits of each z position is the difference of
+    the cumulative integral at the first and last angle inside the limits,
+    the same grid points a per-position trapz would use.
+
+    Parameters
+    ----------
+    theta: array of floats
+        Scattering angles in radians, increasing.
+    su: array of floats
+        Unpolarized scattering functions, (..., len(theta)).
+    size_param: float or array of floats
+        Size parameters, the shape of su without the last axis.
+
+    Returns
+    -------
+    qsca_trunc: array of floats
+        Truncated scattering efficiency at each z position, (..., npos).
+    qsca_ideal: array of floats
+        Non-truncated scattering efficiency at each z position, (..., npos).
+    """
+    _, theta1, theta2, inside = caps_truncation_limits()
+    size_param = np.asarray(size_param, dtype=np.float64)
+    integrand = 2 * su * np.sin(theta) / size_param[..., np.newaxis]**2
+    cumulative = cumulative_trapezoid(integrand, theta, axis=-1, initial=0)
+    q_mie = cumulative[..., -1]
+
+    first = np.searchsorted(theta, theta1, side='left')
+    last = np.searchsorted(theta, theta2, side='right') - 1
+    in_range = last > first  # two or more angles to integrate
+    first = np.where(in_range, first, 0)
+    last = np.where(in_range, last, 0)
+    qsca_trunc = np.where(
+        in_range, cumulative[..., last] - cumulative[..., first], 0.0)
+    qsca_ideal = np.where(inside, q_mie[..., np.newaxis], 0.0)
+    return qsca_trunc, qsca_ideal
+
+
 @lru_cache(maxsize=100000)
 def trunc_mono(
         m,
@@ -480,36 +1406,17 @@ def trunc_mono(
             Backward scattering angle in radians truncated by opening on near
             side of cavity.
     """
-    # diameter=list(diameter)
-
-    # constants for the geometry of the CAPS
-    diam_sphere = 10.0  # diameter of integrating tube in CAPS in cm
-    diam_tube = 1.0  # diameter of tube in CAPS in cm
-    extra_length = 0.6  # length outside both sides of integrating sphere
-    # calculation is performed (cm)
-    z1 = -0.5 * diam_sphere - extra_length  # lower limit of z-axis integral
-    z2 = 0.5 * diam_sphere + extra_length  # upper limit of z-axis integral
-    npos = 100
-    angRes = 0.2
-
-    trunc_calibration = 1.02245612148504  # truncation at calibration diameter
-    # of 150nm trunc_calibration value seems to be dependent on angular
-    # resolution of Scattering Function and positional resolution of z_axis.
+    angRes = CAPS_TRUNCATION_GEOMETRY['angRes']
+    # truncation at calibration diameter of 150nm, the trunc_calibration
+    # value seems to be dependent on angular resolution of Scattering
+    # Function and positional resolution of z_axis.
+    trunc_calibration = CAPS_TRUNCATION_GEOMETRY['trunc_calibration']
 
     size_param = (np.pi * diameter)/wavelength  # size parameter
 
     if discretize:
-        m_real = convert.round_arbitrary(np.real(m), base=0.002, mode='round')
-        m_imag = convert.round_arbitrary(np.imag(m), base=0.002, mode='round')
-        if m_imag == 0:
-            m_discretized = m_real
-        else:
-            m_discretized = m_real + 1j*m_imag
-        wavelength_discretized = convert.round_arbitrary(
-                wavelength,
-                base=1,
-                mode='round'
-            )
+        m_discretized, wavelength_discretized = _discretize_truncation_inputs(
+            m, wavelength)
         dp_discretized = float(convert.round_arbitrary(
                 diameter,
                 base=5,
@@ -525,15 +1432,6 @@ def trunc_mono(
             maxAngle=180,
             angularResolution=angRes
             )
-
-        # theta, _, _, su = ps.ScatteringFunction(
-        #     m,
-        #     wavelength,
-        #     diameter,
-        #     minAngle=0,
-        #     maxAngle=180,
-        #     angularResolution=angRes
-        #     )
     else:
         theta, _, _, su = ps.ScatteringFunction(
             m,
@@ -548,63 +1446,11 @@ def trunc_mono(
     # q_mie = ps.MieQ(n, wavelength, diameter)#Mie efficiencies, 0-360 degrees
     # q_mie to high for <100nm particles in the center of integrating sphere.
     # Must integrate su instead
-    q_mie = trapz((2 * su * np.sin(theta))/size_param**2, theta)
-
-    z_axis = np.linspace(z1, z2, npos)
-    theta1 = np.zeros(len(z_axis))
-    theta2 = np.zeros(len(z_axis))
-    qsca_trunc = np.zeros(len(z_axis))
-    qsca_ideal = np.zeros(len(z_axis))
-    i = 0
-
-    for z in np.nditer(z_axis):
-        if z != 0.5 * diam_sphere:
-            alpha = np.arctan((0.5*diam_tube)/abs(0.5*diam_sphere - z))  #
-            # forward scattering angle
-        else:
-            pass
-        if z != -0.5 * diam_sphere:
-            beta = np.arctan((0.5*diam_tube)/abs(-0.5*diam_sphere - z))
-            # back scattering angle
-
-        # alpha and beta need to be adjusted based on section of cell we are in
-        if z < -0.5 * diam_sphere:  # outside of sphere
-            theta1[i] = alpha
-            theta2[i] = beta
-            qsca_ideal[i] = 0  # ideally light would not come from outside
-        elif z == -0.5 * diam_sphere:
-            theta1[i] = alpha
-            theta2[i] = np.pi/2
-            qsca_ideal[i] = q_mie
-        elif -0.5 * diam_sphere <= z <= 0.5 * diam_sphere:  # inside cavity
-            theta1[i] = alpha
-            theta2[i] = np.pi - beta
-            qsca_ideal[i] = q_mie  # ideally full scattering efficiency measure
-        elif z == 0.5 * diam_sphere:
-            theta1[i] = np.pi/2
-            theta2[i] = np.pi - beta
-            qsca_ideal[i] = q_mie  # ideally full scattering efficiency measure
-        elif z > 0.5 * diam_sphere:
-            theta1[i] = np.pi - alpha
-            theta2[i] = np.pi - beta
-            qsca_ideal[i] = 0  # ideally light would not get into cavity
-            # from outside
-
-        su_trunc = su[np.where(
-                np.logical_and(theta >= theta1[i], theta <= theta2[i])
-                )]
-        theta_trunc = theta[np.where(
-            np.logical_and(theta >= theta1[i], theta <= theta2[i])
-            )]
-
-        # calculate scattering efficiency
-        qsca_trunc[i] = trapz(
-                (2 * su_trunc * np.sin(theta_trunc))/size_param**2,
-                theta_trunc
-            )
-        i += 1
-    trunc = trapz(qsca_trunc, z_axis)
-    ideal = trapz(qsca_ideal, z_axis)
+    qsca_trunc, qsca_ideal = truncated_scattering_efficiencies(
+        theta, su, size_param)
+    z_axis, theta1, theta2, _ = caps_truncation_limits()
+    trunc = trapezoid(qsca_trunc, z_axis)
+    ideal = trapezoid(qsca_ideal, z_axis)
 
     if calTrunc:
         trunc_corr = ideal / trunc
@@ -617,12 +1463,96 @@ def trunc_mono(
         return trunc_corr
 
 
+def _discretize_truncation_inputs(m, wavelength):
+    """Rounds m to 0.002 and wavelength to 1 nm, as trunc_mono does."""
+    m_real = convert.round_arbitrary(np.real(m), base=0.002, mode='round')
+    m_imag = convert.round_arbitrary(np.imag(m), base=0.002, mode='round')
+    if m_imag == 0:
+        m_discretized = m_real
+    else:
+        m_discretized = m_real + 1j*m_imag
+    wavelength_discretized = convert.round_arbitrary(
+            wavelength,
+            base=1,
+            mode='round'
+        )
+    return m_discretized, wavelength_discretized
+
+
+def trunc_mono_diameters(
+        m,
+        diameters,
+        wavelength=450,
+        calTrunc=False,
+        discretize=True,
+        ):
+    """
+    trunc_mono for many diameters, the truncation geometry is integrated
+    for all of them at once. The scattering functions are computed per
+    diameter, cached when discretize is True.
+
+    Parameters
+    ----------
+    m: complex float
+        Complex refrative index of the aerosol.
+    diameters: array of floats
+        Diameters of monodisperse aerosol.
+    wavelength: float, optional
+        Wavelength of CAPS instrument. The default is 450.
+    calTrunc: boolean, optional
+        Return the uncalibrated truncation, as trunc_mono.
+    discretize: boolean, optional
+        Round the inputs and cache the scattering functions, as trunc_mono.
+
+    Returns
+    -------
+    trunc_corr: array of floats
+        Truncation for CAPS SSA measurement of each diameter.
+    """
+    diameters = np.asarray(diameters, dtype=np.float64)
+    if diameters.size == 0:
+        return np.zeros(0)
+    angRes = CAPS_TRUNCATION_GEOMETRY['angRes']
+    size_param = (np.pi * diameters)/wavelength
+    if discretize:
+        m, wavelength = _discretize_truncation_inputs(m, wavelength)
+        diameters = np.atleast_1d(convert.round_arbitrary(
+                diameters,
+                base=5,
+                mode='round',
+                nonzero_edge=True
+            )).astype(float)
+        scattering = [
+            discretize_ScatteringFunction(
+                m, wavelength, float(diameter), minAngle=0, maxAngle=180,
+                angularResolution=angRes)
+            for diameter in diameters]
+    else:
+        scattering = [
+            ps.ScatteringFunction(
+                m, wavelength, diameter, minAngle=0, maxAngle=180,
+                angularResolution=angRes)
+            for diameter in diameters]
+    theta = scattering[0][0]
+    su = np.stack([values[3] for values in scattering])
+
+    qsca_trunc, qsca_ideal = truncated_scattering_efficiencies(
+        theta, su, size_param)
+    z_axis = caps_truncation_limits()[0]
+    trunc_corr = trapezoid(qsca_ideal, z_axis, axis=-1) \
+        / trapezoid(qsca_trunc, z_axis, axis=-1)
+    if not calTrunc:
+        trunc_corr = trunc_corr / CAPS_TRUNCATION_GEOMETRY['trunc_calibration']
+    return trunc_corr
+
+
 def truncation_for_diameters(
             refractive_index,
             diameter_array,
             calibration_diameter,
             wavelength,
-            discretize=True
+            discretize=True,
+            truncation_cache=None
         ):
     """
     Calculate the truncation correction for a given refractive index and
@@ -638,6 +1568,9 @@ def truncation_for_diameters(
         Diameter of the calibration sphere.
     wavelength : float
         Wavelength of the light source.
+    truncation_cache : TruncationCache, optional
+        Persistent cache of the corrections, only the diameters missing
+        from it are computed, and then added to it.
     
     Returns
     -------
@@ -646,6 +1579,7 @@ def truncation_for_diameters(
     """
 
     truncation_array = np.zeros(len(diameter_array))
+    inputs = []
 
     # self_cal = trunc_mono(
     #     refractive_index,
@@ -656,7 +1590,7 @@ def truncation_for_diameters(
     #     discretize=discretize
     #     )
 
-    for i, diameter in enumerate(diameter_array):
+    for diameter in diameter_array:
         if discretize:
             m_real = convert.round_arbitrary(
                     np.real(refractive_index),
@@ -686,24 +1620,67 @@ def truncation_for_diameters(
         else:
             pass
 
-        truncation_array[i] = trunc_mono(
-            refractive_index,
-            diameter,
-            wavelength=wavelength,
-            fullOutput=False,
+        inputs.append((refractive_index, diameter, wavelength))
+
+    keys = [truncation_cache_key(*input_values) for input_values in inputs]
+    cached = {} if truncation_cache is None \
+        else truncation_cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+    for i, key in enumerate(keys):
+        if key in cached:
+            truncation_array[i] = cached[key]
+    if missing:
+        # the inputs only differ in diameter
+        truncation_array[missing] = trunc_mono_diameters(
+            inputs[missing[0]][0],
+            [inputs[i][1] for i in missing],
+            wavelength=inputs[missing[0]][2],
             calTrunc=False,
             discretize=True
             )
+    computed = {keys[i]: truncation_array[i] for i in missing}
+    if truncation_cache is not None:
+        truncation_cache.put_many(computed)
     return truncation_array  #/self_cal
 
 
+def truncation_cache_key(m, diameter, wavelength):
+    """
+    Content address of a trunc_mono result, for a TruncationCache.
+
+    Parameters
+    ----------
+    m : complex
+        Refractive index, as passed to trunc_mono.
+    diameter : float
+        Diameter in nm, as passed to trunc_mono.
+    wavelength : float
+        Wavelength in nm.
+
+    Returns
+    -------
+    str
+        The cache key, it includes CAPS_TRUNCATION_GEOMETRY.
+    """
+    m = complex(m)
+    return cache_key(
+        function='trunc_mono',
+        m_real=float(m.real),
+        m_imag=float(m.imag),
+        diameter=float(diameter),
+        wavelength=float(wavelength),
+        geometry=CAPS_TRUNCATION_GEOMETRY,
+    )
+
+
 def bsca_correction_for_distribution_measurements(
             refractive_index,
             diameter_array,
             particle_counts,
             calibration_diameter,
             wavelength,
-            discretize=True
+            discretize=True,
+            truncation_cache=None
         ):
     """
     Calculate the truncation correction for a given refractive index and
@@ -724,6 +1701,8 @@ def bsca_correction_for_distribution_measurements(
     discretize : bool, optional
         If True, the calculation will be done with discretized values of
         refractive index, wavelength, and diameter. (Default is True)
+    truncation_cache : TruncationCache, optional
+        Persistent cache of the truncation corrections. (Default is None)
 
     Returns
     -------
@@ -737,7 +1716,8 @@ def bsca_correction_for_distribution_measurements(
         diameter_array,
         calibration_diameter,
         wavelength=wavelength,
-        discretize=discretize
+        discretize=discretize,
+        truncation_cache=truncation_cache
         )
 
     # calculate the truncation Bsca
@@ -776,6 +1756,7 @@ def bsca_correction_for_humidified_measurements(
         wavelength=450,
         discretize=True,
         calibration_diameter=150,
+        truncation_cache=None,
         ):
     """
     Calculate the truncation correction for a given refractive index and
@@ -803,6 +1784,8 @@ def bsca_correction_for_humidified_measurements(
     discretize : bool, optional
         If True, the calculation will be done with discretized values of
         refractive index, wavelength, and diameter. (Default is True)
+    truncation_cache : TruncationCache, optional
+        Persistent cache of the truncation corrections. (Default is None)
 
     Returns
     -------
@@ -844,22 +1827,236 @@ def bsca_correction_for_humidified_measurements(
             particle_counts=particle_counts,
             calibration_diameter=calibration_diameter,
             wavelength=wavelength,
-            discretize=discretize
+            discretize=discretize,
+            truncation_cache=truncation_cache
         )
     return bsca_correction
 
 
+def caps_kappa_fit_inputs(datalake):
+    """Pull the arrays of every time step out of the datalake once, for
+    kappa_fitting_caps_data.
+
+    Parameters
+    ----------
+    datalake : DataLake
+        DataLake object with the CAPS_data, smps_1D and smps_2D streams
+
+    Returns
+    -------
+    inputs : dict
+        bext_dry, bext_wet, water_activity_dry, water_activity_wet and
+        water_activity_sizer arrays over time, diameters of the sizer bins,
+        particle_counts (time, bins) and valid, the time steps with the
+        data to fit.
+    """
+    caps_dry = datalake.datastreams['CAPS_data'].return_data(
+        keys=['Bext_dry_CAPS_450nm[1/Mm]', 'dualCAPS_inlet_RH[%]'])
+    caps_wet = datalake.datastreams['CAPS_data'].return_data(
+        keys=['Bext_wet_CAPS_450nm[1/Mm]', 'Wet_RH_preCAPS[%]',
+              'Wet_RH_postCAPS[%]'])
+    sizer_diameter = np.array(
+        datalake.datastreams['smps_2D'].return_header_list()).astype(float)
+    sizer_dndlogdp = np.nan_to_num(
+        datalake.datastreams['smps_2D'].return_data())
+    sizer_humidity = datalake.datastreams['smps_1D'].return_data(
+        keys=['Relative_Humidity_(%)'])[0]
+    sizer_total_n = datalake.datastreams['smps_1D'].return_data(
+        keys=['Total_Conc_(#/cc)'])[0]
+
+    # (time, bins), each time step scaled to the total concentration
+    sizer_dn = convert.convert_sizer_dn(sizer_diameter, sizer_dndlogdp.T)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sizer_dn = sizer_dn * (
+            sizer_total_n / np.sum(sizer_dn, axis=1))[:, np.newaxis]
+
+    valid = ~np.isnan(caps_dry).any(axis=0) \
+        & ~np.isnan(caps_wet).any(axis=0) \
+        & ~np.isnan(sizer_humidity) \
+        & ~np.isnan(sizer_dn).all(axis=1)
+    if np.isnan(sizer_diameter).any():
+        valid[:] = False
+
+    return dict(
+        bext_dry=caps_dry[0],
+        bext_wet=caps_wet[0],
+        water_activity_dry=caps_dry[1]/100,
+        water_activity_wet=np.mean(caps_wet[1:], axis=0)/100,
+        water_activity_sizer=sizer_humidity/100,
+        diameters=sizer_diameter,
+        particle_counts=sizer_dn,
+        valid=valid,
+    )
+
+
+# nominal, upper and lower refractive index of the kappa fits
+KAPPA_REFRACTIVE_INDEX_FACTORS = (1.0, 1.05, 0.95)
+
+_kappa_fit_settings = {}
+
+
+def _init_kappa_fit_worker(settings):
+    """Keeps the fit settings in each worker, sent once not per step."""
+    _kappa_fit_settings.clear()
+    _kappa_fit_settings.update(settings)
+
+
+def _fit_kappa_time_step(step):
+    """Fit the three refractive index variants of one time step, then the
+    truncation corrections, with the settings of _init_kappa_fit_worker.
+
+    Parameters
+    ----------
+    step : tuple
+        bext_dry, bext_wet, water_activity_dry, water_activity_wet,
+        water_activity_sizer and particle_counts of the time step, and the
+        fitted kappa variants, or None to fit them here
+
+    Returns
+    -------
+    kappa : array
+        [kappa, lower, upper]
+    bsca_truncation_dry, bsca_truncation_wet : float
+        nan if truncation_bsca is False
+    """
+    settings = _kappa_fit_settings
+    (bext_dry, bext_wet, water_activity_dry, water_activity_wet,
+     water_activity_sizer, particle_counts, kappa) = step
+    refractive_index = settings['refractive_index']
+    if kappa is None:
+        kappa = np.array([
+            fit_extinction_ratio_with_kappa(
+                Bext_dry=bext_dry,
+                Bext_wet=bext_wet,
+                particle_counts=particle_counts,
+                diameters=settings['diameters'],
+                water_activity_sizer=water_activity_sizer,
+                water_activity_dry=water_activity_dry,
+                water_activity_wet=water_activity_wet,
+                refractive_index_dry=refractive_index*factor,
+                water_refractive_index=1.33,
+                wavelength=450,
+                discretize_Mie=True,
+                kappa_bounds=(0, 1),
+                kappa_tolerance=1e-6,
+                kappa_maxiter=100,
+                mie_table=settings['mie_table'],
+            )
+            for factor in KAPPA_REFRACTIVE_INDEX_FACTORS])
+
+    bsca_truncation = [np.nan, np.nan]
+    if settings['truncation_bsca']:
+        for j, water_activity_sample in enumerate(
+                (water_activity_dry, water_activity_wet)):
+            bsca_truncation[j] = bsca_correction_for_humidified_measurements(
+                kappa=kappa[0],
+                particle_counts=particle_counts,
+                diameters=settings['diameters'],
+                water_activity_sizer=water_activity_sizer,
+                water_activity_sample=water_activity_sample,
+                refractive_index_dry=refractive_index,
+                water_refractive_index=1.33,
+                wavelength=450,
+                discretize=True,
+                calibration_diameter=150,
+                truncation_cache=settings['truncation_cache'],
+            )
+    return kappa, bsca_truncation[0], bsca_truncation[1]
+
+
+def _fit_kappa_block(block):
+    """Fit a block of samples with fit_extinction_ratio_with_kappa_batch,
+    with the settings of _init_kappa_fit_worker.
+
+    Parameters
+    ----------
+    block : tuple
+        bext_dry, bext_wet, water_activity_dry, water_activity_wet,
+        water_activity_sizer, particle_counts and refractive_index_dry of
+        the samples
+
+    Returns
+    -------
+    kappa : array
+        kappa parameter of each sample
+    """
+    settings = _kappa_fit_settings
+    (bext_dry, bext_wet, water_activity_dry, water_activity_wet,
+     water_activity_sizer, particle_counts, refractive_index_dry) = block
+    return fit_extinction_ratio_with_kappa_batch(
+        Bext_dry=bext_dry,
+        Bext_wet=bext_wet,
+        particle_counts=particle_counts,
+        diameters=settings['diameters'],
+        water_activity_sizer=water_activity_sizer,
+        water_activity_dry=water_activity_dry,
+        water_activity_wet=water_activity_wet,
+        refractive_index_dry=refractive_index_dry,
+        water_refractive_index=1.33,
+        wavelength=450,
+        discretize_Mie=True,
+        kappa_bounds=(0, 1),
+        kappa_tolerance=1e-6,
+        kappa_maxiter=100,
+        mie_table=settings['mie_table'],
+        batch_size=settings['batch_size'],
+    )
+
+
+def _run_kappa_tasks(task, items, settings, workers):
+    """Runs task over items, in a process pool when workers is above one,
+    with the settings of _init_kappa_fit_worker."""
+    if workers is not None and workers > 1 and len(items) > 1:
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_kappa_fit_worker,
+                initargs=(settings,)) as executor:
+            return list(tqdm(
+                executor.map(
+                    task,
+                    items,
+                    chunksize=max(1, len(items) // (workers * 4))),
+                total=len(items)))
+    _init_kappa_fit_worker(settings)
+    return [task(item) for item in tqdm(items)]
+
+
 def kappa_fitting_caps_data(
         datalake,
         truncation_bsca=True,
         refractive_index=1.45,
+        mie_table=None,
+        truncation_cache=None,
+        workers=None,
+        solver='batch',
+        batch_size=1000,
         ):
     """Fit the extinction ratio with kappa
 
+    The inputs of all time steps are pulled out of the datalake once, see
+    caps_kappa_fit_inputs. With the batch solver the nominal and +-5%
+    refractive index of every time step are fitted together, one task per
+    block of batch_size fits, see fit_extinction_ratio_with_kappa_batch.
+    The fminbound solver, and the truncation corrections, run one task per
+    time step. The tasks optionally run across a process pool.
+
     Parameters
     ----------
     datalake : DataLake
         DataLake object
+    mie_table : MieTable, optional
+        interpolate the Mie efficiencies from this table, see load_mie_table
+    truncation_cache : TruncationCache, optional
+        persistent cache of the truncation corrections, reused across runs
+    workers : int, optional
+        run the block and time step tasks in a process pool of this many
+        workers, by default None, one after another
+    solver : str, optional
+        'batch' for the lockstep bisection of all time steps (default), or
+        'fminbound' for a scalar fit per time step
+    batch_size : int, optional
+        number of fits the batch solver solves together, the refractive
+        index variants count separately
 
     Returns
     -------
@@ -868,120 +2065,62 @@ def kappa_fitting_caps_data(
     bsca_truncation : array
         bsca truncation correction factor.
     """
-    kappa_fit = np.zeros(
-            (len(datalake.datastreams['smps_1D'].return_data(
-                keys=['Relative_Humidity_(%)'])[0]), 3),
-            dtype=float
-        )
+    if solver not in ('batch', 'fminbound'):
+        raise ValueError("solver must be one of ['batch', 'fminbound']")
+    inputs = caps_kappa_fit_inputs(datalake)
+    valid_index = np.flatnonzero(inputs['valid'])
+    settings = dict(
+        diameters=inputs['diameters'],
+        refractive_index=refractive_index,
+        truncation_bsca=truncation_bsca,
+        mie_table=mie_table,
+        truncation_cache=truncation_cache,
+        batch_size=batch_size,
+    )
+    kappa_valid = [None] * len(valid_index)
+    if solver == 'batch' and len(valid_index) > 0:
+        # the refractive index variants are stacked, (variants, steps)
+        variants = len(KAPPA_REFRACTIVE_INDEX_FACTORS)
+        stacked = [
+            np.tile(inputs[name][valid_index], variants)
+            for name in ('bext_dry', 'bext_wet', 'water_activity_dry',
+                         'water_activity_wet', 'water_activity_sizer')]
+        stacked.append(
+            np.tile(inputs['particle_counts'][valid_index], (variants, 1)))
+        stacked.append(np.repeat(
+            refractive_index*np.array(KAPPA_REFRACTIVE_INDEX_FACTORS),
+            len(valid_index)))
+        blocks = [
+            tuple(values[start:start + batch_size] for values in stacked)
+            for start in range(0, variants*len(valid_index), batch_size)]
+        kappa_valid = np.concatenate(_run_kappa_tasks(
+            _fit_kappa_block, blocks, settings, workers),
+        ).reshape(variants, len(valid_index)).T
+    steps = [
+        (inputs['bext_dry'][i], inputs['bext_wet'][i],
+         inputs['water_activity_dry'][i], inputs['water_activity_wet'][i],
+         inputs['water_activity_sizer'][i], inputs['particle_counts'][i],
+         kappa)
+        for i, kappa in zip(valid_index, kappa_valid)]
+
+    kappa_fit = np.full((len(inputs['valid']), 3), np.nan)
     bsca_truncation_dry = np.zeros(len(kappa_fit), dtype=float)
     bsca_truncation_wet = np.zeros(len(kappa_fit), dtype=float)
+    if truncation_bsca:
+        bsca_truncation_dry[~inputs['valid']] = np.nan
+        bsca_truncation_wet[~inputs['valid']] = np.nan
 
-    for i in tqdm(range(len(kappa_fit))):
-        caps_dry = datalake.datastreams['CAPS_data'].return_data(keys=['Bext_dry_CAPS_450nm[1/Mm]','dualCAPS_inlet_RH[%]'])[:, i]
-        caps_wet = datalake.datastreams['CAPS_data'].return_data(keys=['Bext_wet_CAPS_450nm[1/Mm]','Wet_RH_preCAPS[%]', 'Wet_RH_postCAPS[%]'])[:, i]
-        sizer_diameter = np.array(datalake.datastreams['smps_2D'].return_header_list()).astype(float)
-        #datalake.datastreams['smps_2D'].return_header_list().astype(float)
-        sizer_dndlogdp = np.nan_to_num(datalake.datastreams['smps_2D'].return_data()[:, i])
-        sizer_humidity = datalake.datastreams['smps_1D'].return_data(keys=['Relative_Humidity_(%)'])[0, i]
-        sizer_total_n = datalake.datastreams['smps_1D'].return_data(keys=['Total_Conc_(#/cc)'])[0, i]
-
-        sizer_dn = convert.convert_sizer_dn(sizer_diameter, sizer_dndlogdp)
-        sizer_dn = sizer_dn * sizer_total_n / np.sum(sizer_dn)
-
-        if np.isnan(caps_dry).any():
-            blank_value = True
-        elif np.isnan(caps_wet).any():
-            blank_value = True
-        elif np.isnan(sizer_diameter).any():
-            blank_value = True
-        elif np.isnan(sizer_humidity).any():
-            blank_value = True
-        elif np.sum(np.isnan(sizer_dn))==len(sizer_dn):
-            blank_value = True
-        else:
-            blank_value = False
-
-        if blank_value:
-            kappa_fit[i, :] = np.nan
-            if truncation_bsca:
-                bsca_truncation_dry[i] = np.nan
-                bsca_truncation_wet[i] = np.nan
-        else:
-            kappa_fit[i, 0] = fit_extinction_ratio_with_kappa(
-                Bext_dry=caps_dry[0],
-                Bext_wet=caps_wet[0],
-                particle_counts=sizer_dn,
-                diameters=sizer_diameter,
-                water_activity_sizer=sizer_humidity/100,
-                water_activity_dry=caps_dry[1]/100,
-                water_activity_wet=np.mean(caps_wet[1:])/100,
-                refractive_index_dry=refractive_index,
-                water_refractive_index=1.33,
-                wavelength=450,
-                discretize_Mie=True,
-                kappa_bounds=(0, 1),
-                kappa_tolerance=1e-6,
-                kappa_maxiter=100,
-            )
-
-            kappa_fit[i, 1] = fit_extinction_ratio_with_kappa(
-                Bext_dry=caps_dry[0],
-                Bext_wet=caps_wet[0],
-                particle_counts=sizer_dn,
-                diameters=sizer_diameter,
-                water_activity_sizer=sizer_humidity/100,
-                water_activity_dry=caps_dry[1]/100,
-                water_activity_wet=np.mean(caps_wet[1:])/100,
-                refractive_index_dry=refractive_index*1.05,
-                water_refractive_index=1.33,
-                wavelength=450,
-                discretize_Mie=True,
-                kappa_bounds=(0, 1),
-                kappa_tolerance=1e-6,
-                kappa_maxiter=100,
-            )
-
-            kappa_fit[i, 2] = fit_extinction_ratio_with_kappa(
-                Bext_dry=caps_dry[0],
-                Bext_wet=caps_wet[0],
-                particle_counts=sizer_dn,
-                diameters=sizer_diameter,
-                water_activity_sizer=sizer_humidity/100,
-                water_activity_dry=caps_dry[1]/100,
-                water_activity_wet=np.mean(caps_wet[1:])/100,
-                refractive_index_dry=refractive_index*0.95,
-                water_refractive_index=1.33,
-                wavelength=450,
-                discretize_Mie=True,
-                kappa_bounds=(0, 1),
-                kappa_tolerance=1e-6,
-                kappa_maxiter=100,
-            )
+    if solver == 'batch' and not truncation_bsca:
+        results = [(kappa, np.nan, np.nan) for kappa in kappa_valid]
+    else:
+        results = _run_kappa_tasks(
+            _fit_kappa_time_step, steps, settings, workers)
 
-            if truncation_bsca:
-                bsca_truncation_dry[i] = bsca_correction_for_humidified_measurements(
-                    kappa=kappa_fit[i, 0],
-                    particle_counts=sizer_dn,
-                    diameters=sizer_diameter,
-                    water_activity_sizer=sizer_humidity/100,
-                    water_activity_sample=caps_dry[1]/100,
-                    refractive_index_dry=refractive_index,
-                    water_refractive_index=1.33,
-                    wavelength=450,
-                    discretize=True,
-                    calibration_diameter=150,
-                )
-                bsca_truncation_wet[i] = bsca_correction_for_humidified_measurements(
-                    kappa=kappa_fit[i, 0],
-                    particle_counts=sizer_dn,
-                    diameters=sizer_diameter,
-                    water_activity_sizer=sizer_humidity/100,
-                    water_activity_sample=np.mean(caps_wet[1:])/100,
-                    refractive_index_dry=refractive_index,
-                    water_refractive_index=1.33,
-                    wavelength=450,
-                    discretize=True,
-                    calibration_diameter=150,
-                )
+    for i, (kappa, truncation_dry, truncation_wet) in zip(
+            valid_index, results):
+        kappa_fit[i] = kappa
+        if truncation_bsca:
+            bsca_truncation_dry[i] = truncation_dry
+            bsca_truncation_wet[i] = truncation_wet
 
-    return kappa_fit, bsca_truncation_dry, bsca_truncation_wet
\ No newline at end of file
+    return kappa_fit, bsca_truncation_dry, bsca_truncation_wet
@@ -8,6 +8,7 @@ from typing import Tuple, List, Optional
 
 import numpy as np
 from scipy.interpolate import interp1d
+from scipy import sparse
 
 from datacula.mie import kappa_fitting_caps_data
 import datacula.size_distribution as size_distribution
@@ -63,30 +64,16 @@ def caps_processing(
         kappa_len = len(datalake.datastreams['CAPS_data'].return_time(datetime64=False))
         kappa_fit = np.ones((kappa_len, 3)) * kappa_fixed
 
-    datalake.datastreams['CAPS_data'].add_processed_data(
-    if kappa_fixed is None:
-        kappa_fit, _, _ = kappa_fitting_caps_data(
-            datalake=datalake,
-            truncation_bsca=False,
-            refractive_index=refractive_index
-        )
-    else:
-        kappa_len = len(datalake.datastreams['CAPS_data'].return_time(datetime64=False))
-        kappa_fit = np.ones((kappa_len, 3)) * kappa_fixed
-
     datalake.datastreams['CAPS_data'].add_processed_data(
             data_new=kappa_fit.T,
             time_new=datalake.datastreams['CAPS_data'].return_time(datetime64=False),
-            time_new=datalake.datastreams['CAPS_data'].return_time(datetime64=False),
             header_new=['kappa_fit', 'kappa_fit_lower', 'kappa_fit_upper'],
         )
     orignal_average = datalake.datastreams['CAPS_data'].average_base_sec
-    orignal_average = datalake.datastreams['CAPS_data'].average_base_sec
 
     # calc truncation corrections and add to datalake
     print('CAPS truncation corrections')
     if truncation_bsca:
-        datalake.reaverage_datastreams(
         datalake.reaverage_datastreams(
             truncation_interval_sec,
             stream_keys=['CAPS_data', 'smps_1D', 'smps_2D'],
@@ -102,21 +89,18 @@ def caps_processing(
 
         if truncation_interp:
             interp_dry = interp1d(
-                datalake.datastreams['CAPS_data'].return_time(datetime64=False),
                 datalake.datastreams['CAPS_data'].return_time(datetime64=False),
                 bsca_truncation_dry,
                 kind='linear',
                 fill_value='extrapolate'
             )
             interp_wet = interp1d(
-                datalake.datastreams['CAPS_data'].return_time(datetime64=False),
                 datalake.datastreams['CAPS_data'].return_time(datetime64=False),
                 bsca_truncation_wet,
                 kind='linear',
                 fill_value='extrapolate'
             )
 
-            time = datalake.datastreams['CAPS_data'].return_time(
             time = datalake.datastreams['CAPS_data'].return_time(
                 datetime64=False,
                 raw=True
@@ -127,13 +111,11 @@ def caps_processing(
             time = datalake.datastreams['CAPS_data'].return_time(
                 datetime64=False)
 
-        datalake.datastreams['CAPS_data'].add_processed_data(
         datalake.datastreams['CAPS_data'].add_processed_data(
             data_new=bsca_truncation_dry.T,
             time_new=time,
             header_new=['bsca_truncation_dry'],
         )
-        datalake.datastreams['CAPS_data'].add_processed_data(
         datalake.datastreams['CAPS_data'].add_processed_data(
             data_new=bsca_truncation_wet.T,
             time_new=time,
@@ -142,7 +124,6 @@ def caps_processing(
     else:
         bsca_truncation_wet = np.array([1])
         bsca_truncation_dry = np.array([1])
-        time = datalake.datastreams['CAPS_data'].return_time(
         time = datalake.datastreams['CAPS_data'].return_time(
                 datetime64=False,
                 raw=True
@@ -150,39 +131,30 @@ def caps_processing(
 
     # index for Bsca wet and dry
     index_dic = datalake.datastreams['CAPS_data'].return_header_dict()
-    index_dic = datalake.datastreams['CAPS_data'].return_header_dict()
     
     # check if raw in dict
     if 'raw_Bsca_dry_CAPS_450nm[1/Mm]' in index_dic:
         pass
     else:
         # save raw data
-        datalake.datastreams['CAPS_data'].add_processed_data(
-            data_new=datalake.datastreams['CAPS_data'].data_stream[index_dic['Bsca_wet_CAPS_450nm[1/Mm]'], :],
         datalake.datastreams['CAPS_data'].add_processed_data(
             data_new=datalake.datastreams['CAPS_data'].data_stream[index_dic['Bsca_wet_CAPS_450nm[1/Mm]'], :],
             time_new=time,
             header_new=['raw_Bsca_wet_CAPS_450nm[1/Mm]'],
         )
-        datalake.datastreams['CAPS_data'].add_processed_data(
-            data_new=datalake.datastreams['CAPS_data'].data_stream[index_dic['Bsca_dry_CAPS_450nm[1/Mm]'], :],
         datalake.datastreams['CAPS_data'].add_processed_data(
             data_new=datalake.datastreams['CAPS_data'].data_stream[index_dic['Bsca_dry_CAPS_450nm[1/Mm]'], :],
             time_new=time,
             header_new=['raw_Bsca_dry_CAPS_450nm[1/Mm]'],
         )
         index_dic = datalake.datastreams['CAPS_data'].return_header_dict()
-        index_dic = datalake.datastreams['CAPS_data'].return_header_dict()
 
 
-    datalake.datastreams['CAPS_data'].data_stream[index_dic['Bsca_wet_CAPS_450nm[1/Mm]'], :] = datalake.datastreams['CAPS_data'].data_stream[index_dic['raw_Bsca_wet_CAPS_450nm[1/Mm]'], :] * bsca_truncation_wet.T * calibration_wet
     datalake.datastreams['CAPS_data'].data_stream[index_dic['Bsca_wet_CAPS_450nm[1/Mm]'], :] = datalake.datastreams['CAPS_data'].data_stream[index_dic['raw_Bsca_wet_CAPS_450nm[1/Mm]'], :] * bsca_truncation_wet.T * calibration_wet
     
     datalake.datastreams['CAPS_data'].data_stream[index_dic['Bsca_dry_CAPS_450nm[1/Mm]'], :] = datalake.datastreams['CAPS_data'].data_stream[index_dic['raw_Bsca_dry_CAPS_450nm[1/Mm]'], :] * bsca_truncation_dry.T * calibration_dry
-    datalake.datastreams['CAPS_data'].data_stream[index_dic['Bsca_dry_CAPS_450nm[1/Mm]'], :] = datalake.datastreams['CAPS_data'].data_stream[index_dic['raw_Bsca_dry_CAPS_450nm[1/Mm]'], :] * bsca_truncation_dry.T * calibration_dry
 
 
-    datalake.datastreams['CAPS_data'].reaverage(
     datalake.datastreams['CAPS_data'].reaverage(
         reaverage_base_sec=orignal_average
     )  # updates the averages to the original value
@@ -208,32 +180,24 @@ def albedo_processing(
         DataLake object with the processed data added.
     """
 
-    ssa_wet = datalake.datastreams['CAPS_data'].return_data(keys=['Bsca_wet_CAPS_450nm[1/Mm]'])[0]/datalake.datastreams['CAPS_data'].return_data(keys=['Bext_wet_CAPS_450nm[1/Mm]'])[0]
-    ssa_dry = datalake.datastreams['CAPS_data'].return_data(keys=['Bsca_dry_CAPS_450nm[1/Mm]'])[0]/datalake.datastreams['CAPS_data'].return_data(keys=['Bext_dry_CAPS_450nm[1/Mm]'])[0]
     ssa_wet = datalake.datastreams['CAPS_data'].return_data(keys=['Bsca_wet_CAPS_450nm[1/Mm]'])[0]/datalake.datastreams['CAPS_data'].return_data(keys=['Bext_wet_CAPS_450nm[1/Mm]'])[0]
     ssa_dry = datalake.datastreams['CAPS_data'].return_data(keys=['Bsca_dry_CAPS_450nm[1/Mm]'])[0]/datalake.datastreams['CAPS_data'].return_data(keys=['Bext_dry_CAPS_450nm[1/Mm]'])[0]
 
-    babs_wet = datalake.datastreams['CAPS_data'].return_data(keys=['Bext_wet_CAPS_450nm[1/Mm]'])[0] - datalake.datastreams['CAPS_data'].return_data(keys=['Bsca_wet_CAPS_450nm[1/Mm]'])[0]
-    babs_dry = datalake.datastreams['CAPS_data'].return_data(keys=['Bext_dry_CAPS_450nm[1/Mm]'])[0] - datalake.datastreams['CAPS_data'].return_data(keys=['Bsca_dry_CAPS_450nm[1/Mm]'])[0]
     babs_wet = datalake.datastreams['CAPS_data'].return_data(keys=['Bext_wet_CAPS_450nm[1/Mm]'])[0] - datalake.datastreams['CAPS_data'].return_data(keys=['Bsca_wet_CAPS_450nm[1/Mm]'])[0]
     babs_dry = datalake.datastreams['CAPS_data'].return_data(keys=['Bext_dry_CAPS_450nm[1/Mm]'])[0] - datalake.datastreams['CAPS_data'].return_data(keys=['Bsca_dry_CAPS_450nm[1/Mm]'])[0]
 
-    time = datalake.datastreams['CAPS_data'].return_time(datetime64=False)
     time = datalake.datastreams['CAPS_data'].return_time(datetime64=False)
 
-    datalake.datastreams['CAPS_data'].add_processed_data(
     datalake.datastreams['CAPS_data'].add_processed_data(
         data_new=ssa_wet,
         time_new=time,
         header_new=['SSA_wet_CAPS_450nm[1/Mm]'],
     )
-    datalake.datastreams['CAPS_data'].add_processed_data(
     datalake.datastreams['CAPS_data'].add_processed_data(
         data_new=ssa_dry,
         time_new=time,
         header_new=['SSA_dry_CAPS_450nm[1/Mm]'],
     )
-    datalake.datastreams['CAPS_data'].add_processed_data(
     datalake.datastreams['CAPS_data'].add_processed_data(
         data_new=babs_wet,
         time_new=time,
@@ -375,66 +339,25 @@ def sizer_mean_properties(
     # # TODO: fix aps data to concentrations
     # sizer_dndlogdp_aps = datalake.datastreams['aps_2D'].return_data()/5
 
-    total_concentration = np.zeros_like(time) * np.nan
-    unit_mass_ugPm3 = np.zeros_like(time) * np.nan
-    mean_diameter_nm = np.zeros_like(time) * np.nan
-    mean_vol_diameter_nm = np.zeros_like(time) * np.nan
-    geometric_mean_diameter_nm = np.zeros_like(time) * np.nan
-    mode_diameter = np.zeros_like(time) * np.nan
-    mode_diameter_mass = np.zeros_like(time) * np.nan
-
-    total_concentration_PM01 = np.zeros_like(time) * np.nan
-    unit_mass_ugPm3_PM01 = np.zeros_like(time) * np.nan
-
-    total_concentration_PM1 = np.zeros_like(time) * np.nan
-    unit_mass_ugPm3_PM1 = np.zeros_like(time) * np.nan
-
-    total_concentration_PM25 = np.zeros_like(time) * np.nan
-    unit_mass_ugPm3_PM25 = np.zeros_like(time) * np.nan
-
-    total_concentration_PM10 = np.zeros_like(time) * np.nan
-    unit_mass_ugPm3_PM10 = np.zeros_like(time) * np.nan
-
-    for i in range(len(time)):
-        total_concentration[i], unit_mass_ugPm3[i], mean_diameter_nm[i], \
-            mean_vol_diameter_nm[i], geometric_mean_diameter_nm[i], \
-                mode_diameter[i], mode_diameter_mass[i] = \
-                     size_distribution.mean_properties(
-            sizer_dndlogdp_smps[:, i],
-            sizer_diameter_smps,
-            sizer_limits=sizer_limits
-        )
-
-        # total PM 100 nm concentration
-        total_concentration_PM01[i], unit_mass_ugPm3_PM01[i], _, _, _, _, _ = \
-            size_distribution.mean_properties(
-            sizer_dndlogdp_smps[:, i],
+    # full range, then total PM 100 nm, PM1, PM2.5 and PM10 concentrations
+    (total_concentration_all, unit_mass_ugPm3_all, mean_diameter_nm,
+        mean_vol_diameter_nm, geometric_mean_diameter_nm, mode_diameter,
+        mode_diameter_mass) = size_distribution.mean_properties_matrix(
+            sizer_dndlogdp_smps,
             sizer_diameter_smps,
-            sizer_limits=[0, 100]
-        )
-
-        # total PM1 um concentration
-        total_concentration_PM1[i], unit_mass_ugPm3_PM1[i], _, _, _, _, _ = \
-            size_distribution.mean_properties(
-            sizer_dndlogdp_smps[:, i],
-            sizer_diameter_smps,
-            sizer_limits=[0, 1000]
-        )
-        # total PM <2.5 um concentration
-        total_concentration_PM25[i], unit_mass_ugPm3_PM25[i], _, _, _, _, _ = \
-                     size_distribution.mean_properties(
-            sizer_dndlogdp_smps[:, i],
-            sizer_diameter_smps,
-            sizer_limits=[0, 2500]
-        )
-
-        # total PM <10 um concentration
-        total_concentration_PM10[i], unit_mass_ugPm3_PM10[i], _, _, _, _, _ = \
-                     size_distribution.mean_properties(
-            sizer_dndlogdp_smps[:, i],
-            sizer_diameter_smps,
-            sizer_limits=[0, 10000]
+            sizer_limits_list=[
+                sizer_limits, [0, 100], [0, 1000], [0, 2500], [0, 10000]]
         )
+    total_concentration, total_concentration_PM01, total_concentration_PM1, \
+        total_concentration_PM25, total_concentration_PM10 = \
+        total_concentration_all
+    unit_mass_ugPm3, unit_mass_ugPm3_PM01, unit_mass_ugPm3_PM1, \
+        unit_mass_ugPm3_PM25, unit_mass_ugPm3_PM10 = unit_mass_ugPm3_all
+    mean_diameter_nm = mean_diameter_nm[0]
+    mean_vol_diameter_nm = mean_vol_diameter_nm[0]
+    geometric_mean_diameter_nm = geometric_mean_diameter_nm[0]
+    mode_diameter = mode_diameter[0]
+    mode_diameter_mass = mode_diameter_mass[0]
 
     mass_ugPm3 = unit_mass_ugPm3 * density
     mass_ugPm3_PM01 = unit_mass_ugPm3_PM01 * density
@@ -580,6 +503,106 @@ def merge_distributions(
     return new_2d, new_diameter
 
 
+def merge_distributions_matrix(
+    diameters_lower: np.ndarray,
+    diameters_upper: np.ndarray
+) -> Tuple[np.ndarray, sparse.csr_matrix]:
+    """
+    Precompute the merge of two diameter grids as a sparse matrix.
+
+    The merge in `merge_distributions` is linear in the two concentrations,
+    so for fixed grids it is one matrix acting on the stacked lower and
+    upper distributions. Building it once lets every scan of a campaign
+    be merged with a single sparse product.
+
+    Parameters
+    ----------
+    diameters_lower : np.ndarray
+        The diameters of the lower distribution, ascending.
+    diameters_upper : np.ndarray
+        The diameters of the upper distribution, ascending.
+
+    Returns
+    -------
+    new_diameter : np.ndarray
+        The merged diameter grid, as returned by `merge_distributions`.
+    merge_matrix : sparse.csr_matrix
+        Shape (len(new_diameter), len(diameters_lower) +
+        len(diameters_upper)). Multiplying it with the lower distributions
+        stacked on top of the upper ones gives the merged distributions.
+    """
+    diameters_lower = np.asarray(diameters_lower, dtype=float)
+    diameters_upper = np.asarray(diameters_upper, dtype=float)
+    lower_bins = len(diameters_lower)
+
+    # overlap geometry, as in merge_distributions
+    min_diameter = max(np.min(diameters_upper), np.min(diameters_lower))
+    max_diameter = min(np.max(diameters_upper), np.max(diameters_lower))
+
+    lower_min_overlap = np.argmin(np.abs(diameters_lower - min_diameter))
+    upper_max_overlap = np.argmin(np.abs(diameters_upper - max_diameter))
+
+    weighted_diameter = diameters_lower[lower_min_overlap:]
+    weight = np.clip(
+        (weighted_diameter - min_diameter) / (max_diameter - min_diameter),
+        0, 1)
+    overlap_rows = np.arange(len(weighted_diameter)) + lower_min_overlap
+
+    # linear interpolation of the upper grid, zero outside it
+    upper_index = np.searchsorted(
+        diameters_upper, weighted_diameter, side='right') - 1
+    inside = (weighted_diameter >= diameters_upper[0]) \
+        & (weighted_diameter <= diameters_upper[-1])
+    left = np.clip(upper_index, 0, len(diameters_upper) - 1)
+    right = np.clip(upper_index + 1, 0, len(diameters_upper) - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(
+            right > left,
+            (weighted_diameter - diameters_upper[left])
+            / (diameters_upper[right] - diameters_upper[left]),
+            0.0)
+    upper_weight = np.where(inside, weight, 0.0)
+
+    # rows: lower only, overlap (lower + interpolated upper), upper only
+    upper_only = np.arange(upper_max_overlap, len(diameters_upper))
+    upper_rows = np.arange(len(upper_only)) + lower_bins
+    rows = np.concatenate((
+        np.arange(lower_min_overlap),
+        overlap_rows,
+        overlap_rows,
+        overlap_rows,
+        upper_rows
+    ))
+    columns = np.concatenate((
+        np.arange(lower_min_overlap),
+        overlap_rows,
+        lower_bins + left,
+        lower_bins + right,
+        lower_bins + upper_only
+    ))
+    values = np.concatenate((
+        np.ones(lower_min_overlap),
+        1 - weight,
+        upper_weight * (1 - fraction),
+        upper_weight * fraction,
+        np.ones(len(upper_only))
+    ))
+
+    merge_matrix = sparse.csr_matrix(
+        (values, (rows, columns)),
+        shape=(lower_bins + len(upper_only),
+               lower_bins + len(diameters_upper))
+    )
+    merge_matrix.eliminate_zeros()
+
+    new_diameter = np.concatenate((
+        diameters_lower[:lower_min_overlap],
+        weighted_diameter,
+        diameters_upper[upper_max_overlap:]
+        ))
+    return new_diameter, merge_matrix
+
+
 def iterate_merge_distributions(
     concentration_lower: np.ndarray,
     diameters_lower: np.ndarray,
@@ -602,25 +625,14 @@ def iterate_merge_distributions(
     A tuple containing the merged diameter distribution and the merged
         concentration distribution.
     """
-    # Iterate over all columns in the concentration datastream
-    merged_2d_list = []
-    for i in range(concentration_lower.shape[1]):
-        # Get the current column of the lower concentration distribution
-        concentration_lower_col = concentration_lower[:, i]
-
-        # Merge the current column of the lower and upper concentration
-        merged_2d, merged_diameter = merge_distributions(
-            concentration_lower_col,
-            diameters_lower,
-            concentration_upper[:, i],
-            diameters_upper
-        )
-
-        # Add the merged concentration distribution to the list
-        merged_2d_list.append(merged_2d)
-
-    # Combine the merged concentration distributions into a single array
-    merged_2d_array = np.column_stack(merged_2d_list)
+    # The grids are the same for every column, so the merge is built once
+    # and applied to all columns in one sparse product
+    merged_diameter, merge_matrix = merge_distributions_matrix(
+        diameters_lower,
+        diameters_upper
+    )
+    merged_2d_array = merge_matrix @ np.vstack(
+        (concentration_lower, concentration_upper))
 
     # Return the merged diameter distribution and the merged concentration
     return merged_diameter, merged_2d_array
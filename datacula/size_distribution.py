@@ -103,3 +103,221 @@ def mean_properties(
     return total_concentration, unit_mass_ugPm3, mean_diameter_nm, \
         mean_vol_diameter_nm, geometric_mean_diameter_nm, \
         mode_diameter, mode_diameter_mass
+
+
+def _cumulative_bins(values: np.ndarray) -> np.ndarray:
+    """
+    Cumulative sums along the bin axis with a leading zero row, so the sum
+    over bins [lower, upper) is cumulative[upper] - cumulative[lower].
+
+    Accumulating row by row keeps each add contiguous, which is several
+    times faster than np.cumsum along axis 0 here.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Values per bin, shape (bins, time).
+
+    Returns
+    -------
+    np.ndarray
+        The cumulative sums, shape (bins + 1, time).
+    """
+    summed = np.zeros((values.shape[0] + 1, values.shape[1]))
+    for row, value in enumerate(values):
+        np.add(summed[row], value, out=summed[row + 1])
+    return summed
+
+
+def _range_sum(cumulative: np.ndarray, lower: int, upper: int) -> np.ndarray:
+    """
+    Sum over bins [lower, upper) from the output of `_cumulative_bins`.
+
+    Parameters
+    ----------
+    cumulative : np.ndarray
+        Cumulative sums with a leading zero row, shape (bins + 1, time).
+    lower : int
+        First bin of the size range.
+    upper : int
+        One past the last bin of the size range.
+
+    Returns
+    -------
+    np.ndarray
+        The sum over the range for each time step, shape (time,).
+    """
+    return cumulative[upper] - cumulative[lower]
+
+
+def _median_crossing(
+    cumulative: np.ndarray,
+    lower: int,
+    upper: int,
+    diameter: np.ndarray
+) -> np.ndarray:
+    """
+    Diameter where the cumulative sum over bins [lower, upper) of each row
+    reaches half of the range total.
+
+    Row-wise equivalent of ``np.interp(0.5, cumsum/total, diameter,
+    left=np.nan, right=np.nan)`` used by `mean_properties`.
+
+    Parameters
+    ----------
+    cumulative : np.ndarray
+        Cumulative sums with a leading zero row, shape (bins + 1, time).
+    lower : int
+        First bin of the size range.
+    upper : int
+        One past the last bin of the size range.
+    diameter : np.ndarray
+        Sorted bin centers, shape (bins,).
+
+    Returns
+    -------
+    np.ndarray
+        Median diameter for each row, shape (time,).
+    """
+    start = cumulative[lower]
+    total = cumulative[upper] - start
+    last = upper - lower - 1
+    columns = np.arange(cumulative.shape[1])
+
+    # index of the last bin at or below half, -1 when the first is above
+    below = np.sum(
+        cumulative[lower+1:upper+1] <= start + 0.5 * total,
+        axis=0
+    ) - 1
+    left = np.clip(below, 0, last)
+    right = np.clip(below + 1, 0, last)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_left = (cumulative[lower + left + 1, columns] - start) / total
+        x_right = (cumulative[lower + right + 1, columns] - start) / total
+        diameter_range = diameter[lower:upper]
+        slope = (diameter_range[right] - diameter_range[left]) \
+            / (x_right - x_left)
+        median = diameter_range[left] + slope * (0.5 - x_left)
+
+    median = np.where(below == last, diameter_range[last], median)
+    return np.where(
+        (below < 0) | ((below == last) & (x_left != 0.5)),
+        np.nan,
+        median
+    )
+
+
+def mean_properties_matrix(
+    sizer_dndlogdp: np.ndarray,
+    sizer_diameter: np.ndarray,
+    total_concentration: Optional[np.ndarray] = None,
+    sizer_limits_list: Optional[List[Optional[Tuple[float, float]]]] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray,
+           np.ndarray, np.ndarray]:
+    """
+    Calculates the mean properties of every size distribution in a 2d array,
+    for several size limits at once.
+
+    Matrix form of `mean_properties`. The moments are built as cumulative
+    sums along the (sorted) bin axis, so each size limit only needs the
+    difference between its two boundary bins, and the medians are found with
+    one comparison pass per limit instead of a Python loop over time.
+    As in `mean_properties`, a nan bin makes every property of the size
+    ranges that include it nan, and ranges without nan bins are unaffected.
+
+    Parameters
+    ----------
+    sizer_dndlogdp : np.ndarray
+        Concentration of particles in each bin, shape (bins, time) as stored
+        in the datastreams.
+    sizer_diameter : np.ndarray
+        Bin centers, shape (bins,).
+    total_concentration : Optional[np.ndarray], default=None
+        Total concentration of particles for each time step, shape (time,).
+        The distributions are scaled to it before the limits are applied.
+    sizer_limits_list : Optional[List[Optional[Tuple[float, float]]]]
+        The lower and upper limits of each size range of interest, None
+        for the full distribution. The default is [None].
+
+    Returns
+    -------
+    Tuple[np.ndarray, ...]
+        The same seven properties as `mean_properties`, each with shape
+        (len(sizer_limits_list), time): total concentration, total mass,
+        mean diameter by number, mean diameter by volume, geometric mean
+        diameter, mode diameter by number and mode diameter by volume.
+    """
+    if sizer_limits_list is None:
+        sizer_limits_list = [None]
+
+    sizer_diameter = np.asarray(sizer_diameter, dtype=float)
+    order = np.argsort(sizer_diameter, kind='stable')
+    diameter = sizer_diameter[order]
+
+    # convert to dn from dn/dlogDp, kept as (bins, time) so the sums along
+    # the bins run over contiguous rows
+    sizer_dn = np.ascontiguousarray(convert.convert_sizer_dn(
+        sizer_diameter,
+        np.asarray(sizer_dndlogdp, dtype=float).T
+    ).T[order])
+    if total_concentration is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sizer_dn *= np.asarray(total_concentration, dtype=float) \
+                / np.sum(sizer_dn, axis=0)
+
+    # nan bins are summed as zero and counted, so only the ranges that
+    # include them become nan
+    nan_bins = np.isnan(sizer_dn)
+    cumulative_nan_bins = _cumulative_bins(nan_bins.astype(float))
+    sizer_dn[nan_bins] = 0.0
+
+    # mass in ugPm3 assuming a density of 1.
+    mass_ugPm3 = sizer_dn * (4*pi/3 * (diameter/2)**3 * 1e-9)[:, np.newaxis]
+
+    diameter_column = diameter[:, np.newaxis]
+    cumulative_number = _cumulative_bins(sizer_dn)
+    cumulative_mass = _cumulative_bins(mass_ugPm3)
+    cumulative_number_diameter = _cumulative_bins(sizer_dn * diameter_column)
+    cumulative_mass_diameter = _cumulative_bins(mass_ugPm3 * diameter_column)
+    cumulative_number_log = _cumulative_bins(
+        sizer_dn * np.log(diameter_column))
+
+    properties = np.full(
+        (7, len(sizer_limits_list), sizer_dn.shape[1]),
+        np.nan
+    )
+    for i, sizer_limits in enumerate(sizer_limits_list):
+        if sizer_limits is None:
+            lower, upper = 0, len(diameter)
+        else:  # inclusive limits, as in mean_properties
+            lower = np.searchsorted(diameter, sizer_limits[0], side='left')
+            upper = np.searchsorted(diameter, sizer_limits[1], side='right')
+
+        # if no bins are in the range, leave nans
+        if upper <= lower:
+            continue
+
+        total = _range_sum(cumulative_number, lower, upper)
+        unit_mass_ugPm3 = _range_sum(cumulative_mass, lower, upper)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            properties[0, i] = total
+            properties[1, i] = unit_mass_ugPm3
+            properties[2, i] = _range_sum(
+                cumulative_number_diameter, lower, upper) / total
+            properties[3, i] = _range_sum(
+                cumulative_mass_diameter, lower, upper) / unit_mass_ugPm3
+            properties[4, i] = np.exp(
+                _range_sum(cumulative_number_log, lower, upper) / total)
+        properties[5, i] = _median_crossing(
+            cumulative_number, lower, upper, diameter)
+        properties[6, i] = _median_crossing(
+            cumulative_mass, lower, upper, diameter)
+        properties[:, i, _range_sum(cumulative_nan_bins, lower, upper) > 0] \
+            = np.nan
+
+        # the full range reports the given total, as in mean_properties
+        if sizer_limits is None and total_concentration is not None:
+            properties[0, i] = total_concentration
+
+    return tuple(properties)
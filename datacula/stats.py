@@ -6,6 +6,7 @@
 
 from typing import Union, Tuple
 import numpy as np
+from datacula.stream import HeaderIndex
 
 
 def drop_zeros(datastream_object: object, zero_keys: list) -> object:
@@ -61,13 +62,13 @@ def merge_formatting(
         ValueError: If the data arrays are not the same shape.
         ValueError: If the headers are not the same length.
     """
+    # index the headers once, so the lookups below are O(1) per column
+    header_current_index = HeaderIndex(header_current)
+    header_new_index = HeaderIndex(header_new)
+
     # elements in header_new that are not in header_current
-    header_new_not_listed = [
-            x for x in header_new if x not in header_current
-        ]
-    header_list_not_new = [
-            x for x in header_current if x not in header_new
-        ]
+    header_new_not_listed = header_current_index.missing(header_new)
+    header_list_not_new = header_new_index.missing(header_current)
 
     # expand the data array to include the new columns if there are any
     if bool(header_new_not_listed):
@@ -138,14 +139,118 @@ def merge_formatting(
         data_new = data_new[header_new_indices, :]
     else:
         # match header_new to header_current and sort the data
-        header_new_indices = [
-                header_new.index(x) for x in header_current
-            ]
+        header_new_indices = header_new_index.indices(header_current)
         header_new = [header_new[i] for i in header_new_indices]
         data_new = data_new[header_new_indices, :]
     return data_current, header_current, data_new, header_new
 
 
+def interval_bin_edges(
+            time_stream: np.ndarray,
+            average_base_time: np.ndarray
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the index range of the time stream in each averaging interval,
+    with one binary search over the sorted time stream.
+
+    Each interval is labelled by its end time, interval i covers
+    average_base_time[i-1] <= time < average_base_time[i]. The first
+    interval starts at the time stream sample closest to
+    average_base_time[0].
+
+    Parameters:
+    ----------
+        time_stream (np.ndarray): An array of timestamps, sorted in ascending
+            order.
+        average_base_time (np.ndarray): An array of timestamps labelling the
+            time intervals.
+
+    Returns:
+    -------
+        Tuple[np.ndarray, np.ndarray]: The start and stop indices of each
+            interval in time_stream, empty intervals have start == stop.
+    """
+    start_index = np.argmin(np.abs(average_base_time[0] - time_stream))
+    stop_index = np.searchsorted(time_stream, average_base_time, side='left')
+    stop_index = np.maximum(stop_index, start_index)
+    start_index = np.concatenate(([start_index], stop_index[:-1]))
+    return start_index, stop_index
+
+
+def average_bins(
+            time_stream: np.ndarray,
+            average_base_time: np.ndarray,
+            data_stream: np.ndarray
+        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Averages the data stream over the time intervals of average_base_time,
+    for all channels at once.
+
+    The intervals come from interval_bin_edges. As the intervals tile the
+    time stream, the sums are done with np.add.reduceat over the NaN masked
+    data, and the standard deviation with a second pass over the deviations
+    from the interval means. NaN values are ignored, as np.nanmean and
+    np.nanstd (ddof=0).
+
+    Parameters:
+    ----------
+        time_stream (np.ndarray): An array of timestamps, sorted in ascending
+            order.
+        average_base_time (np.ndarray): An array of timestamps labelling the
+            time intervals.
+        data_stream (np.ndarray): The data, of shape
+            (num_channels, len(time_stream)).
+
+    Returns:
+    -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The mean,
+            standard deviation and count of non-NaN values, each of shape
+            (num_channels, num_intervals), and a (num_intervals,) bool array
+            of the intervals that contain samples. Mean and standard
+            deviation are NaN where the count is 0.
+    """
+    data_stream = np.asarray(data_stream, dtype=np.float64)
+    num_channels = data_stream.shape[0]
+    num_intervals = len(average_base_time)
+    mean = np.full((num_channels, num_intervals), np.nan)
+    std = np.full((num_channels, num_intervals), np.nan)
+    count = np.zeros((num_channels, num_intervals), dtype=np.int64)
+
+    start_index, stop_index = interval_bin_edges(
+        time_stream, average_base_time)
+    filled = stop_index > start_index
+    if not filled.any():
+        return mean, std, count, filled
+
+    # the filled intervals are contiguous in the time stream
+    first = start_index[filled][0]
+    segment = data_stream[:, first:stop_index[filled][-1]]
+    offsets = start_index[filled] - first
+    lengths = stop_index[filled] - start_index[filled]
+
+    missing = np.isnan(segment)
+    has_missing = missing.any()
+    if has_missing:
+        bin_count = lengths - np.add.reduceat(
+            missing, offsets, axis=1, dtype=np.int64)
+        segment = np.where(missing, 0.0, segment)
+    else:  # skip the masking passes
+        bin_count = np.broadcast_to(lengths, (num_channels, len(lengths)))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bin_mean = np.add.reduceat(segment, offsets, axis=1) / bin_count
+        deviation = segment - np.repeat(bin_mean, lengths, axis=1)
+        if has_missing:
+            deviation[missing] = 0.0
+        deviation *= deviation
+        bin_std = np.sqrt(
+            np.add.reduceat(deviation, offsets, axis=1) / bin_count)
+
+    mean[:, filled] = bin_mean
+    std[:, filled] = bin_std
+    count[:, filled] = bin_count
+    return mean, std, count, filled
+
+
 def average_to_interval(
             time_stream: np.ndarray,
             average_base_sec: float,
@@ -160,13 +265,16 @@ def average_to_interval(
     This function calculates the average of the data stream over a series of
     time intervals specified by `average_base_time`. The average and standard
     deviation of the data are calculated for each interval, and the results
-    are returned as two arrays.
+    are returned as two arrays. See average_bins, which does the averaging
+    for all intervals at once.
 
     Parameters:
     ----------
         time_stream (np.ndarray): An array of timestamps, sorted in ascending
             order.
         average_base_sec (float): The length of each time interval in seconds.
+            Kept for compatibility, the intervals are set by
+            `average_base_time`.
         average_base_time (np.ndarray): An array of timestamps representing
             the start times of each time interval.
         data_stream (np.ndarray): An array of data points corresponding to the
@@ -182,89 +290,18 @@ def average_to_interval(
     -------
         Tuple[np.ndarray, np.ndarray]: A tuple containing the average data
             and the standard deviation of the data, both as arrays of shape
-            (num_channels, num_intervals).
+            (num_channels, num_intervals). Intervals without samples are
+            left as they were passed in.
 
     TODO: add custom average starting interval
     """
-
-    # average the data in the time interval initialization
-    # find closet index in time_stream to the start time
-    start_index = np.argmin(np.abs(average_base_time[0] - time_stream))
-    # start_index = 0
-    stop_index = 0
-    interval_look_buffer_multiple = 2
-    start_time = time_stream[0]
-
-    # estimating how much of the time_stream we would need to look at for a
-    # given average interval.
-    if len(time_stream) > 100:
-        time_lookup_span = round(
-                average_base_sec
-                * interval_look_buffer_multiple
-                / np.nanmean(np.diff(time_stream[0:100]))
-            )
-    else:
-        time_lookup_span = 100
-
-    # loop through the average time intervals
-    for i, time_i in enumerate(average_base_time, start=1):
-        if (stop_index < len(time_stream)) and (start_time < time_i):
-
-            # trying to only look at the time_stream in the average time
-            # interval, assumes that the time stream is sorted
-            if start_index+time_lookup_span < len(time_stream):
-                compare_bool = np.nonzero(
-                        time_stream[start_index:start_index+time_lookup_span]
-                        >= time_i
-                    )
-                if len(compare_bool[0]) > 0:
-                    stop_index = start_index + compare_bool[0][0]
-                else:
-                    # used it all for this iteration
-                    compare_bool = np.nonzero(
-                            time_stream[start_index:]
-                            >= time_i
-                        )
-                    stop_index = start_index+compare_bool[0][0]
-                    # re-calculate time look up span,
-                    # as timesteps have changed
-                    if len(time_stream[start_index:]) > 100:
-                        time_lookup_span = round(
-                                average_base_sec
-                                * interval_look_buffer_multiple
-                                / np.nanmean(
-                                    np.diff(
-                                        time_stream[
-                                            start_index:start_index+100
-                                        ]
-                                    )
-                                )
-                            )
-                    else:
-                        time_lookup_span = 100
-            else:
-                compare_bool = np.nonzero(
-                            time_stream[
-                                    start_index:start_index + time_lookup_span
-                                ] >= time_i
-                        )
-                if len(compare_bool[0]) > 0:
-                    stop_index = start_index + compare_bool[0][0]
-                else:
-                    stop_index = len(time_stream)
-
-            if start_index < stop_index:
-                # average the data in the time interval
-                average_base_data[:, i-1] = np.nanmean(
-                    data_stream[:, start_index:stop_index], axis=1
-                    )  # the actual averaging of data is here
-                average_base_data_std[:, i-1] = np.nanstd(
-                    data_stream[:, start_index:stop_index], axis=1
-                    )  # the actual std data is here
-            else:
-                start_time = time_stream[stop_index]
-            start_index = stop_index
-
+    mean, std, _, filled = average_bins(
+        time_stream=time_stream,
+        average_base_time=average_base_time,
+        data_stream=data_stream
+    )
+    average_base_data[:, filled] = mean[:, filled]
+    average_base_data_std[:, filled] = std[:, filled]
     return average_base_data, average_base_data_std
 
 
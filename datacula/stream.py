@@ -1,11 +1,75 @@
 
 
-from typing import List
-from dataclasses import dataclass, field
+from typing import List, Tuple, ClassVar, Iterable, Dict
+from dataclasses import dataclass, field, replace
 import numpy as np
 from datacula import convert
 
 
+class HeaderIndex:
+    """Ordered header names with a name to column dictionary.
+
+    Wraps a header list without copying it. Names added with extend, or
+    appended to the list directly, are indexed incrementally on the next
+    lookup, so membership and column lookups are O(1) instead of list scans.
+    Duplicate names map to their first column, as list.index does.
+
+    Attributes:
+    ---------
+    names : List[str]
+        The header list, shared with the owner.
+    columns : Dict[str, int]
+        Header names to their column index.
+    """
+
+    def __init__(self, names: List[str] = None):
+        self.names = [] if names is None else names
+        self.columns: Dict[str, int] = {}
+        self._indexed = 0
+        self.sync()
+
+    def sync(self):
+        """Indexes names appended to the list since the last lookup."""
+        if self._indexed > len(self.names):  # shrunk, start over
+            self.columns = {}
+            self._indexed = 0
+        for column in range(self._indexed, len(self.names)):
+            self.columns.setdefault(self.names[column], column)
+        self._indexed = len(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        self.sync()
+        return name in self.columns
+
+    def index(self, name: str) -> int:
+        """Returns the column of name, ValueError if it is not listed."""
+        self.sync()
+        try:
+            return self.columns[name]
+        except KeyError:
+            raise ValueError(f"{name!r} is not in the header") from None
+
+    def indices(self, names: Iterable[str]) -> List[int]:
+        """Returns the columns of names, in the order given."""
+        return [self.index(name) for name in names]
+
+    def missing(self, names: Iterable[str]) -> List[str]:
+        """Returns the names that are not in the header, in order."""
+        self.sync()
+        return [name for name in names if name not in self.columns]
+
+    def extend(self, names: Iterable[str]):
+        """Appends names to the header list and indexes them."""
+        self.names.extend(names)
+        self.sync()
+
+
 @dataclass
 class Stream:
     """A class for consistent data storage and format.
@@ -28,9 +92,29 @@ class Stream:
     datetime64 -> np.ndarray
         Returns an array of datetime64 objects representing the time stream.
         Useful for plotting, with matplotlib.dates.
+    header_index -> HeaderIndex
+        Returns the name to column index of the header, kept in sync with
+        header.
     return_header_dict -> dict
         Returns the header as a dictionary with keys as header elements and
         values as their indices.
+    append
+        Appends new data along the time axis, amortized O(1) per sample.
+    window
+        Returns the samples inside a time range as a stream of views.
+
+    Class attributes:
+    ---------
+    sample_fields : Tuple[str, ...]
+        Names of the fields that share the time axis and grow with append,
+        time first.
+
+    Notes:
+    -----
+    After an append, data and time are views into a growable backing
+    buffer, whose capacity doubles when full. Assigning data or time
+    directly is still supported, the buffer is rebuilt from the assigned
+    arrays on the next append.
     """
 
     # Initialize other fields as empty arrays
@@ -39,9 +123,183 @@ class Stream:
     time: np.ndarray = field(default_factory=lambda: np.array([]))
     files: List[str] = field(default_factory=list)
 
+    # growable backing store for append, not part of the stream state
+    _buffers: dict = field(
+        default=None, init=False, repr=False, compare=False)
+    _length: int = field(default=0, init=False, repr=False, compare=False)
+    _header_index: HeaderIndex = field(
+        default=None, init=False, repr=False, compare=False)
+    # (time, datetime64) of the last datetime64 conversion
+    _datetime64_cache: tuple = field(
+        default=None, init=False, repr=False, compare=False)
+
+    # fields that share the time axis and grow with append, time first
+    sample_fields: ClassVar[Tuple[str, ...]] = ('time', 'data')
+
     def __post_init__(self):
         self.validate_inputs()
 
+    def __getstate__(self):
+        """Drops the backing buffers when pickling, the fields are stored
+        as plain arrays and the buffers are rebuilt on append."""
+        state = self.__dict__.copy()
+        state['_buffers'] = None
+        state['_length'] = 0
+        state['_datetime64_cache'] = None
+        return state
+
+    def _buffer_in_sync(self) -> bool:
+        """True if the sample fields are still the views of the buffers,
+        i.e. they have not been reassigned since the last append."""
+        if self._buffers is None:
+            return False
+        for name in self.sample_fields:
+            value = getattr(self, name)
+            if (value.base is not self._buffers[name]
+                    or value.shape[-1] != self._length):
+                return False
+        return True
+
+    def _adopt_arrays(self):
+        """Uses the current sample field arrays as the buffers, without a
+        copy. The capacity is the current length, so the first append
+        allocates new buffers. Unsorted time is sorted once here."""
+        time = np.asarray(self.time)
+        arrays = {name: np.asarray(getattr(self, name))
+                  for name in self.sample_fields}
+        for name in self.sample_fields[2:]:
+            if arrays[name].shape != arrays['data'].shape:
+                # not kept per sample, e.g. left empty, so not known
+                arrays[name] = np.full(arrays['data'].shape, np.nan)
+        if time.size > 1 and not np.all(time[1:] >= time[:-1]):
+            sorted_time_index = np.argsort(time, kind='stable')
+            arrays = {name: value[..., sorted_time_index]
+                      for name, value in arrays.items()}
+        self._buffers = arrays
+        self._length = time.shape[0]
+
+    def _reserve(self, length: int, new_values: dict):
+        """Grows the buffers, doubling the capacity, so length samples fit.
+        Also reallocates if the rows or the dtypes of the new values
+        differ."""
+        capacity = self._buffers['time'].shape[-1]
+        same_layout = all(
+            np.result_type(self._buffers[name], value)
+            == self._buffers[name].dtype
+            and self._buffers[name].shape[:-1] == value.shape[:-1]
+            for name, value in new_values.items())
+        if length <= capacity and same_layout:
+            return
+        capacity = max(length, 2 * capacity)
+        for name, value in new_values.items():
+            buffer = np.empty(
+                value.shape[:-1] + (capacity,),
+                dtype=np.result_type(self._buffers[name], value))
+            buffer[..., :self._length] = \
+                self._buffers[name][..., :self._length]
+            self._buffers[name] = buffer
+
+    def append(
+            self,
+            time_new: np.ndarray,
+            data_new: np.ndarray,
+            **sample_values: np.ndarray):
+        """
+        Appends new samples along the time axis, the last axis of data.
+
+        Only the new samples are copied, into spare capacity of the buffer.
+        If the new times are not after the existing ones, only the
+        overlapping tail is re-sorted (stable), so in order appends are
+        amortized O(1) per sample. Re-sorting existing samples is done in
+        a copy of the buffer, so arrays or windows taken before the append
+        keep their contents.
+
+        Args:
+            time_new (np.ndarray): The new times, shape (m,).
+            data_new (np.ndarray): The new data, shape (header, m), with the
+                same number of rows as data.
+            **sample_values (np.ndarray): Values for the other per sample
+                fields of a subclass, e.g. standard_deviation of a
+                StreamAveraged, shaped as data_new. Missing ones are NaN.
+        """
+        new_values = {
+            'time': np.asarray(time_new),
+            'data': np.asarray(data_new),
+        }
+        for name in self.sample_fields[2:]:
+            new_values[name] = np.asarray(sample_values.pop(
+                name, np.full(new_values['data'].shape, np.nan)))
+        if sample_values:
+            raise TypeError(
+                f"Unknown per sample fields: {list(sample_values)}")
+
+        if self.data.size == 0:
+            self._buffers = {
+                name: value[..., :0] for name, value in new_values.items()}
+            self._length = 0
+        elif not self._buffer_in_sync():
+            self._adopt_arrays()
+
+        start = self._length
+        stop = start + new_values['time'].shape[0]
+        self._reserve(stop, new_values)
+        for name, value in new_values.items():
+            self._buffers[name][..., start:stop] = value
+        self._length = stop
+
+        time = self._buffers['time'][:stop]
+        check = max(start - 1, 0)
+        if not np.all(time[check + 1:] >= time[check:-1]):
+            # merge the new segment into the part of the history it overlaps
+            merge_start = np.searchsorted(
+                time[:start], np.min(new_values['time']), side='right')
+            order = np.argsort(time[merge_start:], kind='stable')
+            for name in self.sample_fields:
+                buffer = self._buffers[name]
+                if merge_start < start:
+                    # earlier views of the fields share the buffer, sort
+                    # in a copy so their contents never change
+                    buffer = buffer.copy()
+                    self._buffers[name] = buffer
+                buffer[..., merge_start:stop] = \
+                    buffer[..., merge_start:stop][..., order]
+
+        for name in self.sample_fields:
+            setattr(self, name, self._buffers[name][..., :stop])
+
+    def window(self, start: float = None, stop: float = None) -> 'Stream':
+        """
+        Returns the samples with start <= time < stop as a new stream.
+
+        The window is found with a binary search on the sorted time, and
+        time, data and the other per sample fields (e.g. standard_deviation
+        of a StreamAveraged) are views into this stream, so no samples are
+        copied. The datetime64 property of the window only converts the
+        window's times. Appending to the window copies it first, so this
+        stream is left unchanged, and out of order appends to this stream
+        re-sort a copy of its buffer, so the window is left unchanged.
+
+        Args:
+            start (float): Start of the window, inclusive. None for the
+                first sample.
+            stop (float): Stop of the window, exclusive. None for the last
+                sample.
+
+        Returns:
+            Stream: A stream of the same class with the same header and
+                settings, over the window.
+        """
+        window = convert.time_window_slice(self.time, start, stop)
+        samples = len(self.time)
+        sample_values = {}
+        for name in self.sample_fields:
+            value = getattr(self, name)
+            # per sample fields that are not tracked are left as they are
+            if np.ndim(value) > 0 and np.shape(value)[-1] == samples:
+                value = value[..., window]
+            sample_values[name] = value
+        return replace(self, header=list(self.header), **sample_values)
+
     def validate_inputs(self):
         """
         Validates the inputs for the DataStream object.
@@ -57,14 +315,34 @@ class Stream:
         """
         Returns an array of datetime64 objects representing the time stream.
         Useful for plotting, with matplotlib.dates.
+
+        The result is cached until time changes, i.e. is reassigned or
+        appended to. Changing the values of time in place is not tracked.
         """
-        return convert.datetime64_from_epoch_array(self.time)
+        if self._datetime64_cache is None \
+                or self._datetime64_cache[0] is not self.time:
+            self._datetime64_cache = (
+                self.time, convert.datetime64_from_epoch_array(self.time))
+        return self._datetime64_cache[1]
+
+    @property
+    def header_index(self) -> HeaderIndex:
+        """Returns the HeaderIndex of header. It is built once and updated
+        incrementally as names are appended, and rebuilt if header is
+        reassigned."""
+        if self._header_index is None \
+                or self._header_index.names is not self.header:
+            self._header_index = HeaderIndex(self.header)
+        else:
+            self._header_index.sync()
+        return self._header_index
 
     @property
     def return_header_dict(self) -> dict:
-        """Returns the header as a dictionary with index (0, 1) as the keys
-        and the names as values."""
-        return dict(enumerate(self.header))
+        """Returns the header as a dictionary with the names as keys and
+        their column index as values. The dictionary is cached with the
+        header index, so treat it as read only."""
+        return self.header_index.columns
 
 
 @dataclass
@@ -76,12 +354,26 @@ class StreamAveraged(Stream):
         start_time (float): The start time for averaging.
         stop_time (float): The stop time for averaging.
         standard_deviation (float): The standard deviation of the data.
+        sample_count (np.ndarray): The number of non-NaN samples averaged in
+            each interval, per channel. Empty if not tracked.
+        sum_squared_deviation (np.ndarray): The sum of squared deviations
+            from the mean in each interval, per channel. With sample_count
+            these are the running accumulators used by
+            stream_processes.update_averaged_stream. Empty if not tracked.
     """
 
     average_window: float = field(default_factory=float)
     start_time: float = field(default_factory=float)
     stop_time: float = field(default_factory=float)
-    standard_deviation: np.array = field(default_factory=np.array)
+    standard_deviation: np.ndarray = field(
+        default_factory=lambda: np.array([]))
+    sample_count: np.ndarray = field(default_factory=lambda: np.array([]))
+    sum_squared_deviation: np.ndarray = field(
+        default_factory=lambda: np.array([]))
+
+    sample_fields: ClassVar[Tuple[str, ...]] = (
+        'time', 'data', 'standard_deviation', 'sample_count',
+        'sum_squared_deviation')
 
     def __post_init__(self):
         super().__post_init__()
@@ -1,5 +1,448 @@
 """Processes that can act on a stream of data."""
 
+from typing import Optional
+import numpy as np
+from datacula import convert, stats
+from datacula.stream import Stream, StreamAveraged
+
+
+def bin_index_in_grid(
+        time: np.ndarray,
+        start_time: float,
+        average_window: float
+        ) -> np.ndarray:
+    """
+    Returns the averaging bin of each time, bin k covers
+    [start_time + k*average_window, start_time + (k+1)*average_window)
+    and is labelled by its end time.
+
+    Parameters:
+    -----------
+    time : np.ndarray
+        Epoch times.
+    start_time : float
+        The start of the averaging grid.
+    average_window : float
+        The bin width in seconds.
+
+    Returns:
+    --------
+    np.ndarray
+        The integer bin index of each time, negative before start_time.
+    """
+    index = np.floor((time - start_time) / average_window).astype(np.int64)
+    # agree with the bin edges as computed elsewhere, despite rounding
+    index -= time < start_time + average_window * index
+    index += time >= start_time + average_window * (index + 1)
+    return index
+
+
+def _writeable_accumulators(averaged: StreamAveraged):
+    """Copies read-only (e.g. memory-mapped) accumulator arrays, so they
+    can be updated in place."""
+    for name in averaged.sample_fields:
+        if not getattr(averaged, name).flags.writeable:
+            setattr(averaged, name, np.array(getattr(averaged, name)))
+
+
+def _extend_grid(
+        averaged: StreamAveraged,
+        first: int,
+        last: int
+        ) -> int:
+    """
+    Extends the bins of an averaged stream to cover the bins first to last
+    of its grid, with empty bins. Appending is amortized, see Stream.append,
+    prepending rebuilds the arrays.
+
+    Returns:
+    --------
+    int
+        The number of bins prepended, the shift of the bin indices.
+    """
+    window = averaged.average_window
+    channels = len(averaged.header)
+    shift = 0
+    if first < 0 and len(averaged.time) > 0:
+        shift = -first
+        empty = np.full((channels, shift), np.nan)
+        averaged.start_time = averaged.start_time - shift * window
+        averaged.time = averaged.start_time + window * np.arange(
+            1, len(averaged.time) + shift + 1)
+        averaged.data = np.concatenate((empty, averaged.data), axis=1)
+        averaged.standard_deviation = np.concatenate(
+            (empty, averaged.standard_deviation), axis=1)
+        averaged.sample_count = np.concatenate(
+            (np.zeros((channels, shift)), averaged.sample_count), axis=1)
+        averaged.sum_squared_deviation = np.concatenate(
+            (np.zeros((channels, shift)), averaged.sum_squared_deviation),
+            axis=1)
+    elif first < 0:
+        # nothing averaged yet, move the start of the grid instead
+        averaged.start_time = averaged.start_time + first * window
+        last -= first
+
+    bins = len(averaged.time)
+    if last + shift >= bins:
+        count = last + shift - bins + 1
+        averaged.append(
+            averaged.start_time + window * np.arange(
+                bins + 1, bins + count + 1),
+            np.full((channels, count), np.nan),
+            standard_deviation=np.full((channels, count), np.nan),
+            sample_count=np.zeros((channels, count)),
+            sum_squared_deviation=np.zeros((channels, count)),
+        )
+    averaged.stop_time = averaged.start_time + window * len(averaged.time)
+    return shift
+
+
+def update_averaged_stream(
+        averaged: StreamAveraged,
+        time_new: np.ndarray,
+        data_new: np.ndarray
+        ) -> StreamAveraged:
+    """
+    Adds new raw samples to an averaged stream, updating only the bins
+    they fall in.
+
+    Each bin keeps running accumulators, the count of non-NaN samples, the
+    mean (the data) and the sum of squared deviations, per channel. The new
+    samples are averaged with stats.average_bins and merged into the
+    touched bins with the parallel (Chan et al.) update, so the cost depends
+    on the size of the new chunk, not on the length of the stream. New bins
+    are added when the samples fall outside of the current bins.
+
+    Parameters:
+    -----------
+    averaged : StreamAveraged
+        The averaged stream, with accumulators, see average_stream.
+    time_new : np.ndarray
+        The epoch times of the new samples, in any order.
+    data_new : np.ndarray
+        The new samples, (channels, len(time_new)).
+
+    Returns:
+    --------
+    StreamAveraged
+        The updated averaged stream, the same object.
+
+    Raises:
+    -------
+    ValueError
+        If the averaged stream has data but no accumulators.
+    """
+    time_new = np.asarray(time_new, dtype=np.float64)
+    if time_new.size == 0:
+        return averaged
+    if averaged.data.size > 0 and \
+            averaged.sample_count.shape != averaged.data.shape:
+        raise ValueError(
+            "The averaged stream has no sample_count accumulators, " +
+            "rebuild it with average_stream.")
+    data_new = convert.data_shape_check(
+        time=time_new,
+        data=np.asarray(data_new, dtype=np.float64),
+        header=averaged.header)
+    order = np.argsort(time_new, kind='stable')
+    time_new = time_new[order]
+    data_new = data_new[:, order]
+
+    window = averaged.average_window
+    first, last = bin_index_in_grid(
+        time_new[[0, -1]], averaged.start_time, window)
+    _extend_grid(averaged, first, last)
+    first, last = bin_index_in_grid(
+        time_new[[0, -1]], averaged.start_time, window)
+    _writeable_accumulators(averaged)
+
+    # bins first to last, the leading edge only opens the first bin
+    edges = averaged.start_time + window * np.arange(first, last + 2)
+    mean_new, std_new, count_new, _ = stats.average_bins(
+        time_stream=time_new,
+        average_base_time=edges,
+        data_stream=data_new)
+    mean_new = mean_new[:, 1:]
+    count_new = count_new[:, 1:]
+    sum_squared_new = np.where(
+        count_new > 0, std_new[:, 1:] ** 2 * count_new, 0.0)
+
+    touched = slice(first, last + 1)
+    count_old = averaged.sample_count[:, touched]
+    mean_old = averaged.data[:, touched]
+    sum_squared_old = averaged.sum_squared_deviation[:, touched]
+
+    count = count_old + count_new
+    with np.errstate(invalid='ignore', divide='ignore'):
+        delta = mean_new - mean_old
+        mean = np.where(
+            count_old == 0, mean_new,
+            np.where(count_new == 0, mean_old,
+                     mean_old + delta * count_new / count))
+        sum_squared = np.where(
+            count_old == 0, sum_squared_new,
+            np.where(count_new == 0, sum_squared_old,
+                     sum_squared_old + sum_squared_new
+                     + delta ** 2 * count_old * count_new / count))
+        standard_deviation = np.sqrt(sum_squared / count)
+
+    averaged.data[:, touched] = mean
+    averaged.standard_deviation[:, touched] = standard_deviation
+    averaged.sample_count[:, touched] = count
+    averaged.sum_squared_deviation[:, touched] = sum_squared
+    return averaged
+
+
+def average_stream(
+        stream: Stream,
+        average_window: float,
+        start_time: float = None
+        ) -> StreamAveraged:
+    """
+    Averages a stream to fixed bins, keeping the per bin accumulators so it
+    can later be updated with update_averaged_stream, or coarsened with
+    reaverage_stream, without rescanning the raw data.
+
+    Parameters:
+    -----------
+    stream : Stream
+        The raw stream.
+    average_window : float
+        The bin width in seconds.
+    start_time : float, optional
+        The start of the first bin. Defaults to the first time of the stream
+        rounded down to a multiple of average_window.
+
+    Returns:
+    --------
+    StreamAveraged
+        The averaged stream, labelled by the bin end times.
+    """
+    if start_time is None:
+        start_time = convert.round_arbitrary(
+            np.nanmin(stream.time), base=average_window, mode='floor')
+    averaged = StreamAveraged(
+        header=list(stream.header),
+        data=np.array([]),
+        time=np.array([]),
+        files=list(stream.files),
+        average_window=average_window,
+        start_time=float(start_time),
+        stop_time=float(start_time) + average_window,
+    )
+    return update_averaged_stream(averaged, stream.time, stream.data)
+
+
+def reaverage_stream(
+        averaged: StreamAveraged,
+        average_window: float
+        ) -> StreamAveraged:
+    """
+    Coarsens an averaged stream to a longer window by merging the bin
+    accumulators, without the raw data.
+
+    Parameters:
+    -----------
+    averaged : StreamAveraged
+        The averaged stream, with accumulators, see average_stream.
+    average_window : float
+        The new bin width in seconds, an integer multiple of the current
+        one. The new bins start at averaged.start_time.
+
+    Returns:
+    --------
+    StreamAveraged
+        A new averaged stream, with accumulators.
+
+    Raises:
+    -------
+    ValueError
+        If average_window is not an integer multiple of the current window,
+        or the averaged stream has no accumulators.
+    """
+    factor = average_window / averaged.average_window
+    if factor < 1 or not np.isclose(factor, np.round(factor)):
+        raise ValueError(
+            f"average_window {average_window} must be an integer multiple " +
+            f"of the current window {averaged.average_window}")
+    if averaged.sample_count.shape != averaged.data.shape:
+        raise ValueError(
+            "The averaged stream has no sample_count accumulators, " +
+            "rebuild it with average_stream.")
+    factor = int(np.round(factor))
+
+    channels = len(averaged.header)
+    bins = len(averaged.time)
+    bins_new = -(-bins // factor)
+    pad = ((0, 0), (0, bins_new * factor - bins))
+    count = np.pad(averaged.sample_count, pad).reshape(
+        channels, bins_new, factor)
+    mean = np.pad(np.nan_to_num(averaged.data), pad).reshape(
+        channels, bins_new, factor)
+    mean = np.where(count > 0, mean, 0.0)
+    sum_squared = np.pad(averaged.sum_squared_deviation, pad).reshape(
+        channels, bins_new, factor)
+
+    count_merged = count.sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_merged = (count * mean).sum(axis=2) / count_merged
+        sum_squared_merged = sum_squared.sum(axis=2) + (
+            count * (mean - mean_merged[:, :, np.newaxis]) ** 2
+            ).sum(axis=2)
+        standard_deviation = np.sqrt(sum_squared_merged / count_merged)
+
+    return StreamAveraged(
+        header=list(averaged.header),
+        data=mean_merged,
+        time=averaged.start_time + average_window * np.arange(
+            1, bins_new + 1),
+        files=list(averaged.files),
+        average_window=average_window,
+        start_time=averaged.start_time,
+        stop_time=averaged.start_time + average_window * max(bins_new, 1),
+        standard_deviation=standard_deviation,
+        sample_count=count_merged,
+        sum_squared_deviation=sum_squared_merged,
+    )
+
+
+PYRAMID_LEVELS = (10, 60, 600, 3600, 86400)
+
+
+def build_average_pyramid(
+        stream: Stream,
+        levels: tuple = PYRAMID_LEVELS
+        ) -> dict:
+    """
+    Builds a pyramid of averaged streams, one per level, from one pass over
+    the raw data. The finest level is averaged from the raw stream, each
+    coarser level is merged from the finest level that divides it. All
+    levels start at the UTC day boundary before the first sample, so the
+    bins of every level nest in the bins of the coarser ones.
+
+    Parameters:
+    -----------
+    stream : Stream
+        The raw stream.
+    levels : tuple, optional
+        The bin widths in seconds, default PYRAMID_LEVELS.
+
+    Returns:
+    --------
+    dict
+        The StreamAveraged for each level, keyed by the bin width.
+    """
+    levels = sorted(levels)
+    start_time = convert.round_arbitrary(
+        np.nanmin(stream.time), base=86400.0, mode='floor')
+    pyramid = {levels[0]: average_stream(
+        stream, levels[0], start_time=float(start_time))}
+    for level in levels[1:]:
+        finer = pyramid_level_for(pyramid, level)
+        if finer is None:
+            pyramid[level] = average_stream(
+                stream, level, start_time=float(start_time))
+        else:
+            pyramid[level] = reaverage_stream(pyramid[finer], level)
+    return pyramid
+
+
+def pyramid_level_for(
+        pyramid: dict,
+        average_window: float
+        ) -> Optional[float]:
+    """
+    Returns the coarsest level of the pyramid that divides average_window,
+    or None if no level does.
+
+    Parameters:
+    -----------
+    pyramid : dict
+        The pyramid, see build_average_pyramid.
+    average_window : float
+        The requested bin width in seconds.
+    """
+    for level in sorted(pyramid, reverse=True):
+        factor = average_window / level
+        if factor >= 1 and np.isclose(factor, np.round(factor)):
+            return level
+    return None
+
+
+def average_from_pyramid(
+        pyramid: dict,
+        average_window: float
+        ) -> StreamAveraged:
+    """
+    Averages to average_window by merging the coarsest pyramid level that
+    divides it, the raw data is not needed.
+
+    Parameters:
+    -----------
+    pyramid : dict
+        The pyramid, see build_average_pyramid.
+    average_window : float
+        The requested bin width in seconds.
+
+    Returns:
+    --------
+    StreamAveraged
+        The averaged stream, bins start at the pyramid start time.
+
+    Raises:
+    -------
+    ValueError
+        If no level of the pyramid divides average_window.
+    """
+    level = pyramid_level_for(pyramid, average_window)
+    if level is None:
+        raise ValueError(
+            f"No pyramid level divides average_window {average_window}")
+    if np.isclose(level, average_window):
+        return pyramid[level]
+    return reaverage_stream(pyramid[level], average_window)
+
+
+def update_average_pyramid(
+        pyramid: dict,
+        time_new: np.ndarray,
+        data_new: np.ndarray
+        ) -> dict:
+    """
+    Adds new raw samples to every level of a pyramid, see
+    update_averaged_stream.
+
+    Parameters:
+    -----------
+    pyramid : dict
+        The pyramid, see build_average_pyramid.
+    time_new : np.ndarray
+        The epoch times of the new samples.
+    data_new : np.ndarray
+        The new samples, (channels, len(time_new)).
+
+    Returns:
+    --------
+    dict
+        The updated pyramid, the same object.
+    """
+    time_new = np.asarray(time_new, dtype=np.float64)
+    if time_new.size == 0:
+        return pyramid
+    # move every level back to the same day boundary, to keep them nested
+    start_time = min(averaged.start_time for averaged in pyramid.values())
+    if np.nanmin(time_new) < start_time:
+        start_time = float(convert.round_arbitrary(
+            np.nanmin(time_new), base=86400.0, mode='floor'))
+        for averaged in pyramid.values():
+            first = int(np.round(
+                (start_time - averaged.start_time) / averaged.average_window))
+            _extend_grid(averaged, first, len(averaged.time) - 1)
+    for averaged in pyramid.values():
+        update_averaged_stream(averaged, time_new, data_new)
+    return pyramid
+
+
 # from typing import List, Union
 # import numpy as np
 # from datacula import convert, stats, merger
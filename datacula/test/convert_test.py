@@ -283,3 +283,53 @@ def test_datetime64_from_epoch_array():
             "Function should raise an AssertionError for non-integer array."
     except AssertionError:
         pass
+
+
+def test_datetime64_from_epoch_array_precision():
+    """Test the truncation, unit and nan handling of the conversion."""
+    epoch_array = np.array([1.9, 2.0, -0.5, np.nan])
+    result = convert.datetime64_from_epoch_array(epoch_array)
+    assert result.dtype == np.dtype('datetime64[s]')
+    assert np.array_equal(result[:3], np.array(
+        [1, 2, 0], dtype='datetime64[s]'))
+    assert np.isnat(result[3])
+
+    result = convert.datetime64_from_epoch_array(
+        epoch_array, delta=1, unit='ms')
+    assert np.array_equal(result[:3], np.array(
+        [2900, 3000, 500], dtype='datetime64[ms]'))
+
+
+def test_convert_sizer_dn():
+    """Test the convert_sizer_dn function on 1D and 2D inputs."""
+    diameter = np.array([10.0, 12.0, 14.5, 17.5])
+    dn_dlogdp = np.array([[1.0, 2.0, 3.0, 4.0],
+                          [5.0, 6.0, 7.0, 8.0]])
+
+    log_widths = convert.sizer_bin_log_widths(diameter)
+    assert log_widths.shape == diameter.shape
+    assert np.all(log_widths > 0)
+
+    # 2D input matches the row by row conversion
+    d_num = convert.convert_sizer_dn(diameter, dn_dlogdp)
+    for i in range(dn_dlogdp.shape[0]):
+        assert np.array_equal(
+            d_num[i], convert.convert_sizer_dn(diameter, dn_dlogdp[i]))
+
+    # round trip
+    assert np.allclose(
+        convert.convert_sizer_dn(diameter, d_num, inverse=True), dn_dlogdp)
+
+    # mismatched bins
+    with pytest.raises(AssertionError):
+        convert.convert_sizer_dn(diameter, dn_dlogdp[:, :3])
+
+
+def test_time_window_slice():
+    """Test the time_window_slice function."""
+    time = np.array([0.0, 1.0, 2.0, 2.0, 3.0, 4.0])
+    assert convert.time_window_slice(time, 1.0, 3.0) == slice(1, 4)
+    assert convert.time_window_slice(time, None, 2.0) == slice(0, 2)
+    assert convert.time_window_slice(time, 2.5) == slice(4, 6)
+    assert convert.time_window_slice(time, 10.0, 20.0) == slice(6, 6)
+    assert convert.time_window_slice(time, 3.0, 1.0) == slice(4, 4)
@@ -0,0 +1,146 @@
+"""Test the lake_store module."""
+
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+from datacula import lake_store, loader
+from datacula.lake import Lake
+from datacula.stream import Stream, StreamAveraged
+
+
+def create_sample_lake():
+    """Create a lake with a raw and an averaged stream."""
+    lake = Lake(settings={'cpc': {'data_header': ['a', 'b']}}, path='/data')
+    lake.datastreams['cpc'] = Stream(
+        header=['a', 'b'],
+        data=np.arange(10, dtype=float).reshape(2, 5),
+        time=np.arange(5, dtype=float),
+        files=[['file1.csv', 100]],
+    )
+    lake.datastreams['cpc_avg'] = StreamAveraged(
+        header=['a', 'b'],
+        data=np.ones((2, 2)),
+        time=np.array([0.0, 60.0]),
+        files=[],
+        average_window=60,
+        start_time=0.0,
+        stop_time=60.0,
+        standard_deviation=np.zeros((2, 2)),
+    )
+    return lake
+
+
+def assert_stream_equal(stream, expected):
+    """Compare the header, files and arrays of two streams."""
+    assert type(stream) is type(expected)
+    assert stream.header == expected.header
+    assert stream.files == expected.files
+    assert np.array_equal(stream.data, expected.data)
+    assert np.array_equal(stream.time, expected.time)
+
+
+def test_save_and_load_lake_store():
+    """Test a store round trip, with lazy loading."""
+    temp_folder = tempfile.mkdtemp(prefix='lakestoretest_')
+    store_path = os.path.join(temp_folder, 'store')
+    lake = create_sample_lake()
+
+    written = lake_store.save_lake_store(store_path, lake)
+    assert sorted(written) == ['cpc', 'cpc_avg']
+
+    loaded = lake_store.load_lake_store(store_path)
+    assert loaded.settings == lake.settings
+    assert loaded.path_to_data == '/data'
+    assert loaded.list_datastreams() == ['cpc', 'cpc_avg']
+    # nothing read until accessed
+    assert loaded.datastreams.stored('cpc') is not None
+
+    stream = loaded.datastreams['cpc']
+    assert loaded.datastreams.stored('cpc') is None
+    assert_stream_equal(stream, lake.datastreams['cpc'])
+    averaged = loaded.datastreams['cpc_avg']
+    assert isinstance(averaged, StreamAveraged)
+    assert averaged.average_window == 60
+    assert np.array_equal(averaged.standard_deviation, np.zeros((2, 2)))
+
+    shutil.rmtree(temp_folder)
+
+
+def test_save_lake_store_only_writes_changes():
+    """Test that unchanged streams are not rewritten."""
+    temp_folder = tempfile.mkdtemp(prefix='lakestoretest_')
+    store_path = os.path.join(temp_folder, 'store')
+    lake_store.save_lake_store(store_path, create_sample_lake())
+
+    loaded = lake_store.load_lake_store(store_path)
+    loaded.datastreams['processed'] = Stream(
+        header=['c'],
+        data=np.ones((1, 5)),
+        time=np.arange(5, dtype=float),
+    )
+    assert lake_store.save_lake_store(store_path, loaded) == ['processed']
+
+    # read but unchanged is also skipped, changed is written
+    assert loaded.datastreams['cpc_avg'].average_window == 60
+    loaded.datastreams['cpc'].data[0, 0] = -1
+    assert lake_store.save_lake_store(store_path, loaded) == ['cpc']
+
+    # removed streams are dropped from the store
+    del loaded.datastreams['processed']
+    lake_store.save_lake_store(store_path, loaded)
+    reloaded = lake_store.load_lake_store(store_path)
+    assert reloaded.list_datastreams() == ['cpc', 'cpc_avg']
+    assert reloaded.datastreams['cpc'].data[0, 0] == -1
+    assert len(os.listdir(os.path.join(
+        store_path, lake_store.STREAMS_FOLDER))) == 2
+
+    shutil.rmtree(temp_folder)
+
+
+def test_load_datalake_legacy_pickle():
+    """Test that loader.load_datalake still reads pickled lakes."""
+    temp_folder = tempfile.mkdtemp(prefix='lakestoretest_')
+    os.makedirs(os.path.join(temp_folder, 'output'))
+    lake = create_sample_lake()
+    with open(os.path.join(temp_folder, 'output', 'datalake.pk'), 'wb') as f:
+        pickle.dump(lake, f)
+    loaded = loader.load_datalake(temp_folder)
+    assert_stream_equal(loaded.datastreams['cpc'], lake.datastreams['cpc'])
+
+    # a saved store takes precedence over the pickle
+    loader.save_datalake(temp_folder, lake)
+    loaded = loader.load_datalake(temp_folder)
+    assert isinstance(loaded.datastreams, lake_store.LazyStreamDict)
+    assert_stream_equal(loaded.datastreams['cpc'], lake.datastreams['cpc'])
+
+    shutil.rmtree(temp_folder)
+
+
+def test_load_lake_store_mmap():
+    """Test read-only memory-mapped loading and window slicing."""
+    from datacula import convert
+
+    temp_folder = tempfile.mkdtemp(prefix='lakestoretest_')
+    store_path = os.path.join(temp_folder, 'store')
+    lake = create_sample_lake()
+    lake_store.save_lake_store(store_path, lake)
+
+    loaded = lake_store.load_lake_store(store_path, mmap_mode='r')
+    stream = loaded.datastreams['cpc']
+    assert isinstance(stream.data, np.memmap)
+    assert not stream.data.flags.writeable
+
+    window = convert.time_window_slice(stream.time, 1.0, 3.0)
+    assert np.array_equal(stream.time[window], [1.0, 2.0])
+    assert np.array_equal(
+        stream.data[:, window], lake.datastreams['cpc'].data[:, 1:3])
+
+    # mapped streams are not rewritten, unless a field changed
+    assert lake_store.save_lake_store(store_path, loaded) == []
+    stream.files.append(['file2.csv', 200])
+    assert lake_store.save_lake_store(store_path, loaded) == ['cpc']
+
+    del stream, loaded
+    shutil.rmtree(temp_folder)
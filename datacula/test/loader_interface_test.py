@@ -104,3 +104,100 @@ def test_get_new_files():
     assert first_pass == False
     assert len(full_paths) == 0
     assert len(file_info) == 0
+
+
+def test_load_files_interface_workers():
+    """test the process pool path gives the same stream as the serial one"""
+    import os
+    import shutil
+    import tempfile
+    import numpy as np
+    from datacula import settings_generator
+    from datacula.test.data.get_example_data import get_data_folder
+
+    source_folder = os.path.join(get_data_folder(), 'CPC_3010_data')
+    temp_folder = tempfile.mkdtemp(prefix='interfacetest_')
+    shutil.copytree(source_folder, os.path.join(temp_folder, 'CPC'))
+
+    settings = settings_generator.for_general_1d_load(
+        relative_data_folder='CPC',
+        filename_regex='*.csv',
+        data_checks={
+            "characters": [10, 100],
+            "char_counts": {",": 4},
+            "skip_rows": 0,
+            "skip_end": 0,
+        },
+        data_column=[1, 2],
+        data_header=['CPC_count[#/sec]', 'Temperature[degC]'],
+        time_column=0,
+        time_format='epoch',
+    )
+    serial = import_interface.load_files_interface(
+        path=temp_folder,
+        settings=settings,
+    )
+    parallel = import_interface.load_files_interface(
+        path=temp_folder,
+        settings=settings,
+        workers=2,
+    )
+
+    assert len(parallel.files) == 2
+    assert parallel.files == serial.files
+    assert parallel.header == serial.header
+    assert np.array_equal(parallel.time, serial.time)
+    assert np.array_equal(parallel.data, serial.data, equal_nan=True)
+
+    delete_temp_files(temp_folder)
+
+
+def test_get_new_files_mtime_and_catalog():
+    """test the mtime comparison and the saved file catalog"""
+    import os
+
+    subfolder_name, temp_folder, _, file_names = generate_files(file_count=3)
+    settings = {
+        'relative_data_folder': subfolder_name,
+        'filename_regex': '*',
+        'MIN_SIZE_BYTES': 10,
+    }
+    # hidden files are skipped, as with glob
+    with open(os.path.join(temp_folder, subfolder_name, '.hidden'), 'wb') as f:
+        f.write(b'0' * 100)
+
+    _, _, file_info = import_interface.get_new_files(
+        path=temp_folder,
+        import_settings=settings,
+        use_mtime=True,
+    )
+    assert sorted(info[0] for info in file_info) == sorted(file_names)
+    assert all(len(info) == 3 for info in file_info)
+
+    # round trip through the catalog
+    catalog_path = os.path.join(temp_folder, 'catalog.json')
+    assert import_interface.load_file_catalog(catalog_path) == []
+    import_interface.save_file_catalog(catalog_path, file_info)
+    loaded_list = import_interface.load_file_catalog(catalog_path)
+    assert loaded_list == file_info
+
+    # a rewritten file of the same size is only new when using mtime
+    touched = os.path.join(temp_folder, subfolder_name, file_names[0])
+    stat = os.stat(touched)
+    os.utime(touched, (stat.st_atime, stat.st_mtime + 10))
+    full_paths, first_pass, _ = import_interface.get_new_files(
+        path=temp_folder,
+        import_settings=settings,
+        loaded_list=loaded_list,
+    )
+    assert first_pass is False
+    assert full_paths == []
+    full_paths, _, _ = import_interface.get_new_files(
+        path=temp_folder,
+        import_settings=settings,
+        loaded_list=loaded_list,
+        use_mtime=True,
+    )
+    assert full_paths == [touched]
+
+    delete_temp_files(temp_folder)
@@ -69,3 +69,71 @@ def test_parse_time_column():
         assert False, "Expected ValueError"
     except ValueError:
         assert True
+
+
+def test_sample_data():
+    """Test the sample_data function."""
+    import numpy as np
+    data = [
+        '1657342801,1.5,on,,nan',
+        '1657342802,-2,OFF,.,N',
+        '1657342803,+3e2, 4 ,1',
+    ]
+    epoch_time, data_array = loader.sample_data(
+        data=data,
+        time_column=0,
+        time_format='epoch',
+        data_columns=[1, 2, 3, 4, 7],
+        delimiter=',',
+    )
+    assert np.array_equal(
+        epoch_time, np.array([1657342801, 1657342802, 1657342803]))
+    expected = np.array([
+        [1.5, 1, np.nan, np.nan, np.nan],
+        [-2, 0, np.nan, 0, np.nan],
+        [300, 4, 1, np.nan, np.nan],
+    ])
+    assert np.array_equal(data_array, expected, equal_nan=True)
+
+    # a one element list of time columns gives a 1D time array
+    epoch_time, _ = loader.sample_data(data, [0], 'epoch', [1], ',')
+    assert epoch_time.shape == (3,)
+
+    # Test case with a value that matches no vocabulary
+    try:
+        loader.sample_data(['1657342801,abc'], 0, 'epoch', [1], ',')
+        assert False, "Expected ValueError"
+    except ValueError:
+        assert True
+
+
+def test_data_raw_chunks():
+    """Test the data_raw_chunks generator against data_format_checks."""
+    import os
+    import tempfile
+    import pytest
+
+    rows = ['header line', 'a,b,c'] + [
+        f'{i},{i*2},{i*3}  ' for i in range(20)] + ['x', 'end,of,file']
+    temp_folder = tempfile.mkdtemp(prefix='loadertest_')
+    file_path = os.path.join(temp_folder, 'chunks.csv')
+    with open(file_path, 'w', encoding='utf8') as file:
+        file.write('\n'.join(rows) + '\n')
+
+    data_checks = {
+        "characters": [4, 20],
+        "char_counts": {",": 2},
+        "skip_rows": 2,
+        "skip_end": 1
+    }
+    expected = loader.data_format_checks(
+        loader.data_raw_loader(file_path), data_checks)
+
+    chunks = list(loader.data_raw_chunks(file_path, data_checks, 6))
+    assert [len(chunk) for chunk in chunks] == [6, 6, 6, 2]
+    assert [row for chunk in chunks for row in chunk] == expected
+
+    with pytest.raises(ValueError):
+        list(loader.data_raw_chunks(file_path, {"skip_rows": 100}))
+
+    assert loader.data_raw_head(file_path, 2) == rows[:2]
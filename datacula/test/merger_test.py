@@ -1,7 +1,9 @@
 """Test the loader module."""
 
+import warnings
 import numpy as np
 from datacula import merger
+from datacula.stream import Stream
 
 
 def create_sample_data():
@@ -137,4 +139,76 @@ def test_combine_data_same_time_1D_data():
     ])
     assert np.array_equal(merged_data, expected_data)
     expected_header_list = ['header1', 'header2', 'header3']
-    assert np.all(merged_header_list == expected_header_list)
\ No newline at end of file
+    assert np.all(merged_header_list == expected_header_list)
+
+
+def test_stream_add_data():
+    # Setup
+    stream = Stream(header=['header1', 'header2'])
+    for start in [0, 10, 5]:
+        merger.stream_add_data(
+            stream,
+            time_new=np.arange(start, start + 3, dtype=float),
+            data_new=np.ones((2, 3)) * start,
+        )
+
+    # Verification
+    assert np.array_equal(
+        stream.time, [0, 1, 2, 5, 6, 7, 10, 11, 12])
+    assert np.array_equal(
+        stream.data[0], [0, 0, 0, 5, 5, 5, 10, 10, 10])
+
+
+def test_interpolate_channels_matches_per_channel_interp():
+    # Setup
+    rng = np.random.default_rng(0)
+    time_new = np.sort(rng.choice(200, 30, replace=False)).astype(float)
+    time = np.sort(rng.random(100) * 220 - 10)
+    data_new = rng.random((6, 30))
+    data_new[rng.random((6, 30)) < 0.3] = np.nan
+    data_new[3] = np.nan
+    data_new[4, :-1] = np.nan
+
+    # Execution
+    data_interp = merger.interpolate_channels(time, time_new, data_new)
+
+    # Verification
+    for i in range(6):
+        mask = ~np.isnan(data_new[i])
+        if not mask.any():
+            assert np.all(np.isnan(data_interp[i]))
+            continue
+        expected = np.interp(
+            time, time_new[mask], data_new[i, mask],
+            left=data_new[i, mask][0], right=data_new[i, mask][-1])
+        assert np.allclose(data_interp[i], expected, rtol=1e-12)
+
+    # repeated timestamps, all samples valid, without a divide warning
+    time_new = np.array([0.0, 10.0, 10.0, 20.0, 30.0, 30.0, 40.0])
+    data_new = rng.random((2, 7))
+    time = np.concatenate((time_new, [-5.0, 5.0, 15.0, 35.0, 45.0]))
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        data_interp = merger.interpolate_channels(time, time_new, data_new)
+    for i in range(2):
+        expected = np.interp(time, time_new, data_new[i])
+        assert np.allclose(data_interp[i], expected, rtol=1e-12)
+
+
+def test_stream_add_processed_data():
+    # Setup
+    data, time, header_list = create_sample_data()
+    stream = Stream(header=header_list, data=data, time=time)
+
+    # Execution
+    merger.stream_add_processed_data(
+        stream,
+        data_new=np.array([7, 7]),
+        time_new=np.array([1, 4]),
+        header_new=['header3'],
+    )
+
+    # Verification
+    assert stream.header == ['header1', 'header2', 'header3']
+    assert stream.return_header_dict['header3'] == 2
+    assert np.array_equal(stream.data[2], [7, 7, 7, 7, 7])
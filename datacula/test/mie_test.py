@@ -0,0 +1,232 @@
+"""Test the mie module."""
+
+import shutil
+import tempfile
+import numpy as np
+import PyMieScatt as ps
+from scipy.integrate import trapezoid
+from datacula import convert, mie
+from datacula.lake import Lake
+
+
+def test_mie_efficiencies_matches_automieq():
+    """Test the vectorized efficiencies against PyMieScatt per diameter."""
+    diameters = np.concatenate(([0.0, 2.0, 5.0], np.geomspace(10, 20000, 60)))
+    for m in [1.45, 1.5 + 0.01j, 1.33 + 0.5j]:
+        results = mie.mie_efficiencies(m, 450, diameters)
+        for index, diameter in enumerate(diameters):
+            expected = ps.AutoMieQ(m, 450, diameter)
+            assert np.allclose(
+                [value[index] for value in results], expected,
+                rtol=1e-8, atol=1e-12)
+
+
+def test_mie_sd_vectorized():
+    """Test Mie_SD against a sum of PyMieScatt efficiencies."""
+    diameters = np.geomspace(20, 800, 40)
+    counts = np.linspace(100, 1000, 40)
+    expected = sum(
+        ps.AutoMieQ(1.5 + 0.01j, 450, diameter)[0]
+        * np.pi * (diameter / 2)**2 * count * 1e-6
+        for diameter, count in zip(diameters, counts))
+    assert np.isclose(
+        mie.Mie_SD(1.5 + 0.01j, 450, diameters, counts, extinction_only=True),
+        expected, rtol=1e-10)
+
+
+def test_mie_table_round_trip_and_interpolation():
+    """Test building, memory-mapping and interpolating a small table."""
+    temp_folder = tempfile.mkdtemp(prefix='mietabletest_')
+    mie.build_mie_table(
+        temp_folder,
+        m_real=np.array([1.44, 1.46, 1.48]),
+        m_imag=np.array([0.0, 0.01]),
+        size_parameter=np.geomspace(0.05, 10, 1500))
+    table = mie.load_mie_table(temp_folder)
+    assert isinstance(table.values, np.memmap)
+    assert table.max_relative_error['Q_ext'] < 1e-2
+    assert table.max_relative_error['g'] < 1e-2
+
+    # between the refractive index nodes, and past the size parameter grid
+    diameters = np.array([1.0, 50.0, 300.0, 1000.0, 5000.0])
+    m = 1.47 + 0.005j
+    results = mie.mie_table_efficiencies(table, m, 450, diameters)
+    expected = mie.mie_efficiencies(m, 450, diameters)
+    assert np.allclose(results[0], expected[0], rtol=1e-2)
+    assert np.allclose(results[1], expected[1], rtol=1e-2)
+    assert np.isclose(results[0][-1], expected[0][-1], rtol=1e-12)
+
+    bext = mie.Mie_SD(m, 450, diameters, np.ones(5), extinction_only=True,
+                      mie_table=table)
+    assert np.isclose(
+        bext, mie.Mie_SD(m, 450, diameters, np.ones(5),
+                         extinction_only=True), rtol=1e-2)
+    try:
+        mie.mie_table_efficiencies(table, 1.6, 450, diameters)
+        assert False, 'expected ValueError'
+    except ValueError:
+        pass
+    del table
+    shutil.rmtree(temp_folder)
+
+
+def test_truncation_vectorized_geometry():
+    """Test the cumulative integration against a per-position trapezoid."""
+    theta, _, _, su = ps.ScatteringFunction(
+        1.5, 450, 300.0, angularResolution=0.2)
+    size_param = np.pi * 300.0 / 450
+    qsca_trunc, qsca_ideal = mie.truncated_scattering_efficiencies(
+        theta, su, size_param)
+    _, theta1, theta2, inside = mie.caps_truncation_limits()
+    for i, (low, high) in enumerate(zip(theta1, theta2)):
+        mask = (theta >= low) & (theta <= high)
+        expected = trapezoid(
+            2 * su[mask] * np.sin(theta[mask]) / size_param**2, theta[mask])
+        assert np.isclose(qsca_trunc[i], expected, rtol=1e-10, atol=1e-15)
+    assert np.all(qsca_ideal[~inside] == 0)
+
+    diameters = np.array([100.0, 300.0])
+    batch = mie.trunc_mono_diameters(1.5, diameters, discretize=False)
+    assert np.allclose(
+        batch, [mie.trunc_mono(1.5, d, discretize=False) for d in diameters],
+        rtol=1e-12)
+
+
+class ArrayStream():
+    """The return_data interface of the datalake streams, over arrays."""
+
+    def __init__(self, header, data):
+        self.header = header
+        self.data = data
+
+    def return_header_list(self):
+        return self.header
+
+    def return_data(self, keys=None):
+        if keys is None:
+            return self.data
+        return self.data[[self.header.index(key) for key in keys]]
+
+
+def test_kappa_fitting_caps_data_serial_and_pool():
+    """Test the batch kappa fit recovers kappa, also in a process pool."""
+    diameters = np.geomspace(50, 500, 20)
+    dndlogdp = 1000 * np.exp(-np.log(diameters / 150)**2 / 0.5)
+    particle_counts = convert.convert_sizer_dn(diameters, dndlogdp)
+    ratio = mie.extinction_ratio_wet_dry(
+        0.3, particle_counts, diameters, 0.1, 0.1, 0.8)
+
+    bext_dry = np.array([10.0, np.nan, 20.0])
+    caps = ArrayStream(
+        ['Bext_dry_CAPS_450nm[1/Mm]', 'dualCAPS_inlet_RH[%]',
+         'Bext_wet_CAPS_450nm[1/Mm]', 'Wet_RH_preCAPS[%]',
+         'Wet_RH_postCAPS[%]'],
+        np.array([bext_dry, [10.0] * 3, bext_dry * ratio,
+                  [80.0] * 3, [80.0] * 3]))
+    datalake = Lake(settings={})
+    datalake.datastreams['CAPS_data'] = caps
+    datalake.datastreams['smps_2D'] = ArrayStream(
+        list(diameters), np.tile(dndlogdp, (3, 1)).T)
+    datalake.datastreams['smps_1D'] = ArrayStream(
+        ['Relative_Humidity_(%)', 'Total_Conc_(#/cc)'],
+        np.array([[10.0] * 3, [np.sum(particle_counts)] * 3]))
+
+    kappa, truncation_dry, _ = mie.kappa_fitting_caps_data(
+        datalake, truncation_bsca=False)
+    # within the steps of the discretized Mie inputs
+    assert np.allclose(kappa[[0, 2], 0], 0.3, atol=1e-2)
+    # the +-5% refractive index variants move the fit
+    assert not np.allclose(kappa[[0, 2], 1], kappa[[0, 2], 0])
+    assert not np.allclose(kappa[[0, 2], 2], kappa[[0, 2], 0])
+    assert np.all(np.isnan(kappa[1]))
+    assert np.all(truncation_dry == 0)
+
+    # the batch blocks in a process pool give the same fit
+    kappa_blocks, _, _ = mie.kappa_fitting_caps_data(
+        datalake, truncation_bsca=False, workers=2, batch_size=2)
+    assert np.array_equal(kappa_blocks, kappa, equal_nan=True)
+
+    kappa_pool, _, _ = mie.kappa_fitting_caps_data(
+        datalake, truncation_bsca=False, workers=2, solver='fminbound')
+    kappa_serial, _, _ = mie.kappa_fitting_caps_data(
+        datalake, truncation_bsca=False, solver='fminbound')
+    assert np.array_equal(kappa_pool, kappa_serial, equal_nan=True)
+    # the batch bisection and fminbound agree within the Mie discretization
+    assert np.allclose(kappa_serial, kappa, atol=1e-2, equal_nan=True)
+
+
+def test_fit_extinction_ratio_with_kappa_batch():
+    """Test the lockstep bisection against the scalar fit."""
+    diameters = np.geomspace(50, 500, 20)
+    particle_counts = np.array([
+        convert.convert_sizer_dn(
+            diameters, 1000 * np.exp(-np.log(diameters / mode)**2 / 0.5))
+        for mode in (100, 150, 250)])
+    kappa = np.array([0.1, 0.4, 0.7])
+    ratio = mie.extinction_ratio_wet_dry_batch(
+        kappa, particle_counts, diameters, 0.1 * np.ones(3),
+        0.1 * np.ones(3), 0.85 * np.ones(3), discretize_Mie=False)
+    assert np.isclose(ratio[1], mie.extinction_ratio_wet_dry(
+        0.4, particle_counts[1], diameters, 0.1, 0.1, 0.85,
+        discretize_Mie=False), rtol=1e-12)
+
+    fitted = mie.fit_extinction_ratio_with_kappa_batch(
+        np.ones(3), ratio, particle_counts, diameters, 0.1, 0.1, 0.85,
+        discretize_Mie=False)
+    assert np.allclose(fitted, kappa, atol=1e-5)
+    # a ratio above the bracket ends at the upper bound
+    fitted = mie.fit_extinction_ratio_with_kappa_batch(
+        np.ones(1), ratio[:1] * 10, particle_counts[:1], diameters,
+        0.1, 0.1, 0.85, discretize_Mie=False)
+    assert np.isclose(fitted[0], 1, atol=1e-5)
+
+    # with the wet humidity below the dry one the ratio falls with kappa
+    ratio = mie.extinction_ratio_wet_dry_batch(
+        kappa, particle_counts, diameters, 0.1 * np.ones(3),
+        0.85 * np.ones(3), 0.1 * np.ones(3), discretize_Mie=False)
+    assert ratio[0] < 1
+    fitted = mie.fit_extinction_ratio_with_kappa_batch(
+        np.ones(3), ratio, particle_counts, diameters, 0.1, 0.85, 0.1,
+        discretize_Mie=False)
+    assert np.allclose(fitted, kappa, atol=1e-5)
+
+    # solved in blocks of two samples, the same as one block
+    chunked = mie.fit_extinction_ratio_with_kappa_batch(
+        np.ones(3), ratio, particle_counts, diameters, 0.1, 0.85, 0.1,
+        discretize_Mie=False, batch_size=2)
+    assert np.array_equal(chunked, fitted)
+
+
+def test_mie_kernel_optics():
+    """Test kernel products against Mie_SD and the wet extinction."""
+    diameters = np.geomspace(50, 500, 20)
+    particle_counts = np.array([
+        convert.convert_sizer_dn(
+            diameters, 1000 * np.exp(-np.log(diameters / mode)**2 / 0.5))
+        for mode in (100, 250)])
+    kernel = mie.mie_kernel(1.45, 450, diameters)
+    optics = mie.kernel_optics(kernel, particle_counts)
+    for index in range(2):
+        bext, bsca, _, _, _, bback, _ = mie.Mie_SD(
+            1.45, 450, diameters, particle_counts[index])
+        assert np.allclose(optics[index], [bext, bsca, bback], rtol=1e-12)
+
+    stack = mie.build_mie_kernel_stack(
+        diameters, 450, np.linspace(1.33, 1.45, 13),
+        growth_factor=np.linspace(1.0, 2.0, 41))
+    wet = mie.humidified_kernel_optics(
+        stack, particle_counts, kappa=[0.2, 0.5],
+        water_activity_sizer=[0.1, 0.1], water_activity_sample=[0.8, 0.85])
+    for index, (kappa, water_activity) in enumerate([(0.2, 0.8),
+                                                     (0.5, 0.85)]):
+        expected, _ = mie.extinction_ratio_wet_dry(
+            kappa, particle_counts[index], diameters, 0.1, water_activity,
+            water_activity, discretize_Mie=False, return_coefficients=True)
+        assert np.isclose(wet[index, 0], expected, rtol=1e-2)
+    try:
+        mie.humidified_kernel_optics(
+            stack, particle_counts[:1], kappa=[5.0],
+            water_activity_sizer=[0.1], water_activity_sample=[0.95])
+        assert False, 'expected ValueError'
+    except ValueError:
+        pass
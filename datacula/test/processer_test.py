@@ -0,0 +1,30 @@
+"""Test the processer module."""
+
+import numpy as np
+from datacula import processer
+
+
+def test_iterate_merge_distributions_matches_per_column_merge():
+    """Test the sparse merge against merge_distributions per column."""
+    rng = np.random.default_rng(0)
+    diameters_lower = np.geomspace(10, 600, 50)
+    diameters_upper = np.geomspace(300, 10000, 20)
+    concentration_lower = rng.random((50, 30))
+    concentration_upper = rng.random((20, 30))
+
+    merged_diameter, merged_2d = processer.iterate_merge_distributions(
+        concentration_lower,
+        diameters_lower,
+        concentration_upper,
+        diameters_upper
+    )
+
+    for i in range(30):
+        expected_2d, expected_diameter = processer.merge_distributions(
+            concentration_lower[:, i],
+            diameters_lower,
+            concentration_upper[:, i],
+            diameters_upper
+        )
+        assert np.allclose(merged_diameter, expected_diameter)
+        assert np.allclose(merged_2d[:, i], expected_2d, rtol=1e-12)
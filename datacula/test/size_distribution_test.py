@@ -0,0 +1,33 @@
+"""Test the size_distribution module."""
+
+import numpy as np
+from datacula import size_distribution
+
+
+def test_mean_properties_matrix_matches_mean_properties():
+    """Test the matrix version against mean_properties per time step."""
+    rng = np.random.default_rng(0)
+    diameters = np.geomspace(10, 800, 40)
+    dndlogdp = rng.random((40, 50)) * 1000
+    dndlogdp[:15, 3] = 0  # nothing below ~50 nm
+    dndlogdp[2, 10:20] = np.nan  # only ranges including bin 2 are nan
+    dndlogdp[30, 15] = np.nan
+    total_concentration = rng.random(50) * 1e4 + 1
+    limits_list = [None, [0, 100], [20, 300], [100, 1000], [0, 5]]
+
+    for total in [None, total_concentration]:
+        results = size_distribution.mean_properties_matrix(
+            dndlogdp, diameters, total, limits_list)
+        assert len(results) == 7
+        assert results[0].shape == (len(limits_list), 50)
+        for i, limits in enumerate(limits_list):
+            for j in range(50):
+                expected = size_distribution.mean_properties(
+                    dndlogdp[:, j],
+                    diameters,
+                    None if total is None else total[j],
+                    sizer_limits=limits
+                )
+                assert np.allclose(
+                    [value[i, j] for value in results], expected,
+                    rtol=1e-9, equal_nan=True)
@@ -153,4 +153,30 @@ def test_threshold_outliers_all():
 
     expected_mask = np.array([True, True, False, False, True, False, False, True, True, True])
 
-    assert np.allclose(stats.mask_outliers(data, bottom=bottom, top=top, value=value, invert=invert), expected_mask)
\ No newline at end of file
+    assert np.allclose(stats.mask_outliers(data, bottom=bottom, top=top, value=value, invert=invert), expected_mask)
+
+
+def test_average_bins_gappy():
+    """Test average_bins against nanmean/nanstd on data with gaps."""
+    time_stream = np.concatenate(
+        (np.arange(0, 100, 1.0), np.arange(1000, 1100, 1.0)))
+    data_stream = np.vstack((time_stream, time_stream ** 0.5))
+    data_stream[1, 5:15] = np.nan
+    average_base_time = np.arange(0, 1200, 30.0)
+
+    mean, std, count, filled = stats.average_bins(
+        time_stream, average_base_time, data_stream)
+
+    for i in range(1, len(average_base_time)):
+        in_bin = (time_stream >= average_base_time[i-1]) \
+            & (time_stream < average_base_time[i])
+        assert filled[i] == in_bin.any()
+        if not in_bin.any():
+            assert np.all(np.isnan(mean[:, i]))
+            assert np.all(count[:, i] == 0)
+            continue
+        selected = data_stream[:, in_bin]
+        assert np.allclose(mean[:, i], np.nanmean(selected, axis=1))
+        assert np.allclose(std[:, i], np.nanstd(selected, axis=1))
+        assert np.array_equal(
+            count[:, i], np.sum(~np.isnan(selected), axis=1))
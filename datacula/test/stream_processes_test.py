@@ -0,0 +1,130 @@
+"""Test the stream_processes module."""
+
+import numpy as np
+from datacula import stream_processes
+from datacula.stream import Stream
+
+
+def create_sample_stream():
+    """Create a gappy two channel stream with a few NaN samples."""
+    rng = np.random.default_rng(1)
+    time = np.sort(rng.uniform(3.0, 1000.0, 400))
+    time = time[(time < 300) | (time > 500)]
+    data = rng.normal(size=(2, len(time)))
+    data[0, ::7] = np.nan
+    return Stream(header=['a', 'b'], data=data, time=time)
+
+
+def test_update_averaged_stream_matches_full_average():
+    """Test that chunked updates give the same bins as one average."""
+    stream = create_sample_stream()
+    full = stream_processes.average_stream(stream, 60)
+    assert full.start_time == 0.0
+    assert np.allclose(np.diff(full.time), 60)
+
+    # chunks out of order, the first one ahead of the rest
+    first = Stream(header=['a', 'b'], data=stream.data[:, 200:250],
+                   time=stream.time[200:250])
+    averaged = stream_processes.average_stream(first, 60, start_time=0.0)
+    for index in [slice(250, None), slice(0, 120), slice(120, 200)]:
+        stream_processes.update_averaged_stream(
+            averaged, stream.time[index], stream.data[:, index])
+
+    assert np.array_equal(averaged.time, full.time)
+    assert np.array_equal(averaged.sample_count, full.sample_count)
+    assert np.allclose(averaged.data, full.data, equal_nan=True)
+    assert np.allclose(averaged.standard_deviation, full.standard_deviation,
+                       equal_nan=True)
+    # the gap has empty bins
+    gap = (full.time > 360) & (full.time <= 480)
+    assert np.all(full.sample_count[:, gap] == 0)
+    assert np.all(np.isnan(full.data[:, gap]))
+
+
+def test_reaverage_stream_matches_direct_average():
+    """Test coarsening the accumulators against averaging the raw data."""
+    stream = create_sample_stream()
+    fine = stream_processes.average_stream(stream, 60)
+    coarse = stream_processes.reaverage_stream(fine, 300)
+    direct = stream_processes.average_stream(stream, 300)
+
+    assert np.array_equal(coarse.time, direct.time)
+    assert np.array_equal(coarse.sample_count, direct.sample_count)
+    assert np.allclose(coarse.data, direct.data, equal_nan=True)
+    assert np.allclose(coarse.standard_deviation, direct.standard_deviation,
+                       equal_nan=True)
+
+    try:
+        stream_processes.reaverage_stream(fine, 90)
+        assert False, 'expected ValueError'
+    except ValueError:
+        pass
+
+
+def test_average_pyramid_and_lake_average_datastream():
+    """Test serving averages from the pyramid levels, and the Lake cache."""
+    from datacula.lake import Lake
+
+    stream = create_sample_stream()
+    stream.time = stream.time + 86400.0 * 3 + 5000.0
+    pyramid = stream_processes.build_average_pyramid(stream)
+    assert sorted(pyramid) == list(stream_processes.PYRAMID_LEVELS)
+    assert all(level.start_time == 86400.0 * 3 for level in pyramid.values())
+
+    # 20 min comes from the 10 min level
+    assert stream_processes.pyramid_level_for(pyramid, 1200) == 600
+    assert stream_processes.pyramid_level_for(pyramid, 45) is None
+    averaged = stream_processes.average_from_pyramid(pyramid, 1200)
+    direct = stream_processes.average_stream(
+        stream, 1200, start_time=86400.0 * 3)
+    assert np.array_equal(averaged.sample_count, direct.sample_count)
+    assert np.allclose(averaged.data, direct.data, equal_nan=True)
+
+    # earlier samples keep the levels aligned on the day boundary
+    stream_processes.update_average_pyramid(
+        pyramid, np.array([86400.0 * 2 + 30.0]), np.array([[1.0], [2.0]]))
+    assert all(level.start_time == 86400.0 * 2 for level in pyramid.values())
+    assert pyramid[86400].sample_count[0, 0] == 1
+
+    lake = Lake(settings={})
+    lake.datastreams['cpc'] = stream
+    lake.build_average_pyramids()
+    first = lake.average_datastream('cpc', 1200)
+    assert lake.average_datastream('cpc', 1200) is first
+    assert np.allclose(first.data, direct.data, equal_nan=True)
+    # no level divides 45 s, averaged from the raw data
+    assert lake.average_datastream('cpc', 45).average_window == 45
+
+
+def test_lake_average_datastream_follows_stream_changes():
+    """Test that the Lake drops its averages once the stream changes."""
+    from datacula.lake import Lake
+    from datacula.merger import stream_add_processed_data
+
+    stream = create_sample_stream()
+    lake = Lake(settings={})
+    lake.datastreams['cpc'] = stream
+    lake.build_average_pyramids()
+    first = lake.average_datastream('cpc', 600)
+    assert first.data.shape[0] == 2
+
+    # a new channel
+    stream_add_processed_data(
+        stream,
+        data_new=np.ones((1, len(stream.time))),
+        time_new=stream.time,
+        header_new=['c'],
+    )
+    with_channel = lake.average_datastream('cpc', 600)
+    assert with_channel is not first
+    assert with_channel.header == ['a', 'b', 'c']
+    assert np.allclose(with_channel.data[:2], first.data, equal_nan=True)
+
+    # appended samples
+    stream.append(np.array([2000.0]), np.array([[1.0], [2.0], [3.0]]))
+    appended = lake.average_datastream('cpc', 600)
+    assert appended.time[-1] > with_channel.time[-1]
+
+    # a replaced stream
+    lake.datastreams['cpc'] = create_sample_stream()
+    assert lake.average_datastream('cpc', 600).header == ['a', 'b']
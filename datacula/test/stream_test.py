@@ -1,7 +1,7 @@
 """Test the Stream class."""
 
 import numpy as np
-from datacula.stream import Stream, StreamAveraged
+from datacula.stream import Stream, StreamAveraged, HeaderIndex
 
 
 def test_stream_initialization():
@@ -76,3 +76,116 @@ def test_stream_averaged_initialization():
     assert stream_averaged.stop_time == stop_time
     assert np.array_equal(stream_averaged.standard_deviation,
                           standard_deviation)
+
+
+def test_stream_append():
+    """Test the amortized append of the Stream class."""
+    stream = Stream(header=['header1', 'header2'])
+    stream.append(np.array([1.0, 2.0]), np.array([[1, 2], [3, 4]]))
+    stream.append(np.array([3.0]), np.array([[5], [6]]))
+    assert np.array_equal(stream.time, [1.0, 2.0, 3.0])
+    assert np.array_equal(stream.data, [[1, 2, 5], [3, 4, 6]])
+
+    # out of order data is merged into the overlapping tail only
+    stream.append(np.array([2.5, 0.5]), np.array([[7, 8], [9, 10]]))
+    assert np.array_equal(stream.time, [0.5, 1.0, 2.0, 2.5, 3.0])
+    assert np.array_equal(stream.data, [[8, 1, 2, 7, 5], [10, 3, 4, 9, 6]])
+
+    # reassigned arrays are picked up on the next append
+    stream.data = stream.data[:, 1:]
+    stream.time = stream.time[1:]
+    stream.append(np.array([4.0]), np.array([[11], [12]]))
+    assert np.array_equal(stream.time, [1.0, 2.0, 2.5, 3.0, 4.0])
+    assert np.array_equal(stream.data, [[1, 2, 7, 5, 11], [3, 4, 9, 6, 12]])
+
+
+def test_stream_header_index():
+    """Test the header index of the Stream class follows the header."""
+    stream = Stream(header=['header1', 'header2'])
+    assert stream.return_header_dict == {'header1': 0, 'header2': 1}
+    header_index = stream.header_index
+
+    # appended names are indexed incrementally, on the same index
+    stream.header.append('header3')
+    header_index.extend(['header4'])
+    assert stream.header_index is header_index
+    assert stream.header == ['header1', 'header2', 'header3', 'header4']
+    assert header_index.indices(['header4', 'header3']) == [3, 2]
+    assert header_index.missing(['header5', 'header1']) == ['header5']
+
+    # a reassigned header gets a new index
+    stream.header = ['a', 'b']
+    assert stream.return_header_dict == {'a': 0, 'b': 1}
+    assert 'header1' not in stream.header_index
+    assert HeaderIndex(['a', 'b', 'a']).index('a') == 0
+
+
+def test_stream_window():
+    """Test the time window views of Stream and StreamAveraged."""
+    stream = StreamAveraged(
+        header=['header1', 'header2'],
+        data=np.arange(20.0).reshape(2, 10),
+        time=np.arange(10.0),
+        average_window=1.0,
+        start_time=0.0,
+        stop_time=10.0,
+        standard_deviation=np.ones((2, 10)),
+    )
+    window = stream.window(2.0, 5.0)
+    assert isinstance(window, StreamAveraged)
+    assert np.array_equal(window.time, [2.0, 3.0, 4.0])
+    assert np.array_equal(window.data, [[2, 3, 4], [12, 13, 14]])
+    assert np.shares_memory(window.data, stream.data)
+    assert np.shares_memory(
+        window.standard_deviation, stream.standard_deviation)
+    assert window.sample_count.size == 0
+    assert window.header == stream.header
+    assert len(window.datetime64) == 3
+
+    # open ended and empty windows
+    assert np.array_equal(stream.window(start=8.0).time, [8.0, 9.0])
+    assert np.array_equal(stream.window(stop=1.0).time, [0.0])
+    assert stream.window(20.0, 30.0).data.shape == (2, 0)
+
+    # appending to a window leaves the stream unchanged
+    window.append(np.array([4.5]), np.array([[0.0], [0.0]]))
+    assert np.array_equal(stream.data[:, 5], [5, 15])
+
+
+def test_stream_window_unchanged_by_source_append():
+    """Test an out of order append to the source keeps its windows."""
+    stream = Stream(header=['header1'])
+    stream.append(np.arange(11.0), np.arange(11.0)[np.newaxis, :])
+    window = stream.window(5.0, 11.0)
+
+    stream.append(np.array([4.5]), np.array([[99.0]]))
+    assert np.array_equal(window.time, np.arange(5.0, 11.0))
+    assert np.array_equal(window.data, [np.arange(5.0, 11.0)])
+    assert np.array_equal(stream.window(4.0, 6.0).data, [[4.0, 99.0, 5.0]])
+
+
+def test_stream_datetime64_cache():
+    """Test the datetime64 property is cached until time changes."""
+    stream = Stream(header=['header1'])
+    stream.append(np.array([0.0, 1.0]), np.array([[1, 2]]))
+    first = stream.datetime64
+    assert stream.datetime64 is first
+
+    stream.append(np.array([2.0]), np.array([[3]]))
+    assert len(stream.datetime64) == 3
+    stream.time = np.array([10.0, 11.0, 12.0])
+    assert stream.datetime64[0] == np.datetime64(10, 's')
+
+
+def test_stream_append_out_of_order_keeps_views():
+    """Test an out of order append does not change earlier views."""
+    stream = Stream(header=['header1'])
+    stream.append(np.arange(11.0), np.arange(11.0)[np.newaxis, :] * 10)
+    held_time = stream.time
+    held_data = stream.data
+
+    stream.append(np.array([4.5]), np.array([[99.0]]))
+    assert np.array_equal(held_time, np.arange(11.0))
+    assert np.array_equal(held_data[0], np.arange(11.0) * 10)
+    assert np.array_equal(stream.time[4:7], [4.0, 4.5, 5.0])
+    assert np.array_equal(stream.data[0, 4:7], [40.0, 99.0, 50.0])
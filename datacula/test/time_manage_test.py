@@ -1,6 +1,7 @@
 """Test the time_manage module."""
 
-from datacula.time_manage import time_str_to_epoch
+import numpy as np
+from datacula.time_manage import time_str_to_epoch, time_str_to_epoch_array
 
 
 def test_time_str_to_epoch():
@@ -24,4 +25,38 @@ def test_time_str_to_epoch():
     # Test with a time in Sydney
     timezone_identifier = "Australia/Sydney"
     expected = 1624019661.0
-    assert time_str_to_epoch(time, time_format, timezone_identifier) == expected
\ No newline at end of file
+    assert time_str_to_epoch(time, time_format, timezone_identifier) == expected
+
+
+def test_time_str_to_epoch_array():
+    """Test the batch conversion matches time_str_to_epoch."""
+    # across the 2021 fall DST transition in New York
+    time = [
+        "2021-11-06 23:59:59", "2021-11-07 00:30:00", "2021-11-07 01:15:00",
+        "2021-11-07 01:45:00", "2021-11-07 02:00:00", "2021-11-07 03:00:00",
+        "2021-02-28 12:00:00", "2020-02-29 12:00:00",
+    ]
+    time_format = "%Y-%m-%d %H:%M:%S"
+    for timezone_identifier in ["UTC", "America/New_York", "Asia/Kolkata"]:
+        expected = np.array([
+            time_str_to_epoch(x, time_format, timezone_identifier)
+            for x in time])
+        assert np.array_equal(
+            time_str_to_epoch_array(time, time_format, timezone_identifier),
+            expected)
+
+    # Test a format without a fixed-width fast path
+    time = ["07/10/22 10:13:41.5", "07/10/22 10:13:42.5"]
+    time_format = "%m/%d/%y %H:%M:%S.%f"
+    expected = np.array([
+        time_str_to_epoch(x, time_format, "UTC") for x in time])
+    assert np.array_equal(
+        time_str_to_epoch_array(time, time_format, "UTC"), expected)
+
+    # Test case with an invalid date
+    try:
+        time_str_to_epoch_array(
+            ["2021-02-30 00:00:00"], "%Y-%m-%d %H:%M:%S", "UTC")
+        assert False, "Expected ValueError"
+    except ValueError:
+        assert True
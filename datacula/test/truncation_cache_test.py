@@ -0,0 +1,55 @@
+"""Test the truncation_cache module."""
+
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+from datacula import mie
+from datacula.truncation_cache import TruncationCache, cache_key
+
+
+def test_truncation_cache_round_trip_and_eviction():
+    """Test storing, reopening, pickling and evicting entries."""
+    temp_folder = tempfile.mkdtemp(prefix='truncationcachetest_')
+    path = os.path.join(temp_folder, 'truncation.sqlite')
+    assert cache_key(m=1.5, diameter=100.0) == \
+        cache_key(diameter=100.0, m=1.5)
+    assert cache_key(m=1.5, diameter=100.0) != \
+        cache_key(m=1.5, diameter=120.0)
+
+    cache = TruncationCache(path, max_entries=3)
+    cache.put_many({'a': 1.0, 'b': 2.0, 'c': 3.0})
+    assert cache.get_many(['a', 'b', 'missing']) == {'a': 1.0, 'b': 2.0}
+    # c is the least recently used, and evicted
+    cache.put('d', 4.0)
+    assert len(cache) == 3
+    assert cache.get('c') is None
+
+    reopened = pickle.loads(pickle.dumps(cache))
+    assert reopened.get('d') == 4.0
+    cache.close()
+    reopened.close()
+    shutil.rmtree(temp_folder)
+
+
+def test_truncation_for_diameters_uses_cache():
+    """Test that cached corrections are reused and new ones stored."""
+    temp_folder = tempfile.mkdtemp(prefix='truncationcachetest_')
+    cache = TruncationCache(os.path.join(temp_folder, 'truncation.sqlite'))
+    diameters = np.array([100.0, 200.0])
+
+    expected = mie.truncation_for_diameters(
+        1.5, diameters, 150, 450, truncation_cache=cache)
+    assert len(cache) == 2
+    key = mie.truncation_cache_key(1.5, 100.0, 450)
+    assert cache.get(key) == expected[0]
+
+    # a planted value shows the cache is read before computing
+    cache.put(key, 2.0)
+    reused = mie.truncation_for_diameters(
+        1.5, diameters, 150, 450, truncation_cache=cache)
+    assert reused[0] == 2.0
+    assert reused[1] == expected[1]
+    cache.close()
+    shutil.rmtree(temp_folder)
@@ -1,6 +1,17 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional, Tuple
+import numpy as np
 import pytz
 
+# strptime directives with a fixed number of digits, used by the vectorized
+# fast path in time_str_to_epoch_array
+FIXED_WIDTH_DIRECTIVES = {
+    '%Y': 4, '%y': 2, '%m': 2, '%d': 2, '%H': 2, '%M': 2, '%S': 2}
+# local time segment length, in seconds, used to find the UTC offset within
+# days that hold a DST transition. Transitions fall on 15 minute boundaries.
+TIMEZONE_SEGMENT_SEC = 900
+
 
 def time_str_to_epoch(
         time: str,
@@ -38,3 +49,218 @@ def time_str_to_epoch(
     time_epoch = time_obj.timestamp()
 
     return time_epoch
+
+
+@lru_cache(maxsize=64)
+def fixed_width_time_format(
+        time_format: str
+) -> Optional[Tuple[int, tuple, tuple]]:
+    """Compile a strptime format into a fixed-width parsing plan. Only
+    formats made of FIXED_WIDTH_DIRECTIVES and literal characters have a
+    plan. The result is cached, keyed by the format string.
+
+    Parameters:
+    -----------
+    time_format : str
+        The format of the time string, e.g. '%Y-%m-%d %H:%M:%S'.
+
+    Returns:
+    --------
+    plan : tuple or None
+        (width, fields, literals), where fields is a tuple of
+        (directive, start, length) and literals is a tuple of
+        (position, character). None if the format is not fixed-width.
+    """
+    fields = []
+    literals = []
+    position = 0
+    index = 0
+    while index < len(time_format):
+        if time_format[index] == '%':
+            directive = time_format[index:index + 2]
+            if directive == '%%':
+                literals.append((position, '%'))
+                position += 1
+            elif directive in FIXED_WIDTH_DIRECTIVES:
+                length = FIXED_WIDTH_DIRECTIVES[directive]
+                fields.append((directive, position, length))
+                position += length
+            else:
+                return None
+            index += 2
+        else:
+            literals.append((position, time_format[index]))
+            position += 1
+            index += 1
+    return position, tuple(fields), tuple(literals)
+
+
+def fixed_width_to_naive_epoch(
+        time: np.ndarray,
+        plan: Tuple[int, tuple, tuple],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse an array of fixed-width time strings to naive epoch seconds,
+    i.e. the local wall time counted as if it were UTC.
+
+    Parameters:
+    -----------
+    time : np.ndarray
+        1-D array of time strings.
+    plan : tuple
+        The parsing plan from fixed_width_time_format.
+
+    Returns:
+    --------
+    naive_epoch : np.ndarray
+        Naive epoch seconds, undefined where valid is False.
+    valid : np.ndarray
+        Boolean mask of the strings that matched the plan and hold a
+        valid date and time.
+    """
+    width, fields, literals = plan
+    codes = time.astype(f'U{max(width, 1)}').view(np.uint32).reshape(
+        len(time), max(width, 1)).astype(np.int64)
+    valid = np.char.str_len(time) == width
+
+    for position, character in literals:
+        valid &= codes[:, position] == ord(character)
+
+    values = {'%Y': 1900, '%m': 1, '%d': 1, '%H': 0, '%M': 0, '%S': 0}
+    for directive, start, length in fields:
+        digits = codes[:, start:start + length] - ord('0')
+        valid &= np.all((digits >= 0) & (digits <= 9), axis=1)
+        number = digits @ (10 ** np.arange(length - 1, -1, -1))
+        if directive == '%y':  # same pivot as strptime
+            directive = '%Y'
+            number = np.where(number < 69, 2000 + number, 1900 + number)
+        values[directive] = number
+
+    year = np.broadcast_to(values['%Y'], valid.shape)
+    month = np.broadcast_to(values['%m'], valid.shape)
+    day = np.broadcast_to(values['%d'], valid.shape)
+    hour = np.broadcast_to(values['%H'], valid.shape)
+    minute = np.broadcast_to(values['%M'], valid.shape)
+    second = np.broadcast_to(values['%S'], valid.shape)
+    valid &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) \
+        & (hour <= 23) & (minute <= 59) & (second <= 59)
+
+    # calendar arithmetic on the valid rows, other rows get a safe date
+    month_index = np.where(valid, (year - 1970) * 12 + month - 1, 0)
+    months = month_index.astype('datetime64[M]')
+    days = months.astype('datetime64[D]') \
+        + np.where(valid, day - 1, 0).astype('timedelta64[D]')
+    valid &= days.astype('datetime64[M]') == months  # e.g. Feb 30
+
+    naive_epoch = days.astype(np.int64) * 86400 \
+        + hour * 3600 + minute * 60 + second
+    return naive_epoch.astype(np.float64), valid
+
+
+def naive_to_utc_offset(
+        naive_epoch: np.ndarray,
+        timezone_identifier: str,
+) -> np.ndarray:
+    """Look up the UTC offset for an array of naive epoch seconds, with the
+    same pytz localize rules as time_str_to_epoch.
+
+    The offset is looked up at the start and end of each local day. Only
+    days where those differ, i.e. days holding a DST transition, are looked
+    up again once per TIMEZONE_SEGMENT_SEC segment of local time.
+
+    Parameters:
+    -----------
+    naive_epoch : np.ndarray
+        Naive epoch seconds, local wall time counted as if it were UTC.
+    timezone_identifier : str
+        The time zone identifier for the local time.
+
+    Returns:
+    --------
+    offset : np.ndarray
+        The UTC offset in seconds for each input time.
+    """
+    time_zone = pytz.timezone(timezone_identifier)
+
+    def utc_offset(naive_seconds):
+        return time_zone.localize(
+            datetime(1970, 1, 1) + timedelta(seconds=float(naive_seconds))
+        ).utcoffset().total_seconds()
+
+    segment = np.floor(naive_epoch / TIMEZONE_SEGMENT_SEC)
+    last_segment = 86400 - TIMEZONE_SEGMENT_SEC
+    days, day_inverse = np.unique(
+        np.floor(naive_epoch / 86400), return_inverse=True)
+    day_inverse = day_inverse.reshape(-1)
+    day_offset = np.zeros(len(days))
+    offset = np.zeros(len(naive_epoch))
+    for i, day in enumerate(days):
+        day_offset[i] = utc_offset(day * 86400)
+        if utc_offset(day * 86400 + last_segment) != day_offset[i]:
+            in_day = day_inverse == i
+            segments, inverse = np.unique(
+                segment[in_day], return_inverse=True)
+            offset[in_day] = np.array([
+                utc_offset(segment_i * TIMEZONE_SEGMENT_SEC)
+                for segment_i in segments
+            ])[inverse.reshape(-1)]
+            day_offset[i] = np.nan
+    constant_day = ~np.isnan(day_offset[day_inverse])
+    offset[constant_day] = day_offset[day_inverse][constant_day]
+    return offset
+
+
+def time_str_to_epoch_array(
+        time: np.ndarray,
+        time_format: str,
+        timezone_identifier: str,
+) -> np.ndarray:
+    """Convert an array of time strings to UTC (epoch) in one call. This is
+    the batch version of time_str_to_epoch, and returns the same values.
+
+    Fixed-width numeric formats (see FIXED_WIDTH_DIRECTIVES) are parsed
+    with vectorized digit arithmetic. The UTC offset is then looked up once
+    per segment of local time, see naive_to_utc_offset. Any other format,
+    or strings that do not match the fixed-width layout, go through
+    time_str_to_epoch once per unique string.
+
+    Parameters:
+    -----------
+    time : np.ndarray
+        1-D array (or list) of time strings.
+    time_format : str
+        The format of the time strings. See time_str_to_epoch.
+    timezone_identifier : str
+        The time zone identifier for the time strings.
+
+    Returns:
+    --------
+    time_epoch : np.ndarray
+        The float64 epoch times in seconds.
+
+    Raises:
+    -------
+    ValueError
+        If a time string does not match the time_format.
+    """
+    time = np.asarray(time, dtype=str).reshape(-1)
+    time_epoch = np.zeros(len(time), dtype=np.float64)
+    if len(time) == 0:
+        return time_epoch
+
+    plan = fixed_width_time_format(time_format)
+    if plan is not None:
+        naive_epoch, valid = fixed_width_to_naive_epoch(time, plan)
+        if valid.any():
+            time_epoch[valid] = naive_epoch[valid] - naive_to_utc_offset(
+                naive_epoch[valid], timezone_identifier)
+    else:
+        valid = np.zeros(len(time), dtype=bool)
+
+    if not valid.all():
+        unique_time, inverse = np.unique(time[~valid], return_inverse=True)
+        unique_epoch = np.array([
+            time_str_to_epoch(str(time_str), time_format, timezone_identifier)
+            for time_str in unique_time
+        ])
+        time_epoch[~valid] = unique_epoch[inverse.reshape(-1)]
+    return time_epoch
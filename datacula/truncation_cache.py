@@ -0,0 +1,169 @@
+"""A persistent, content-addressed cache for CAPS truncation corrections.
+
+The corrections are stored in a SQLite file in WAL mode, so several
+processes can read while one writes, and the file can be copied between
+machines. Entries are keyed by a sha256 of the canonical JSON of the inputs,
+and the least recently used entries are evicted above max_entries.
+"""
+
+from typing import Dict, Iterable, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+CACHE_FORMAT_VERSION = 1
+QUERY_CHUNK_SIZE = 500
+
+
+def cache_key(**parts) -> str:
+    """
+    Returns the content address of a cache entry.
+
+    Parameters:
+    ----------
+    **parts : json serializable
+        Everything the cached value depends on, e.g. the refractive index,
+        wavelength, diameter and instrument geometry.
+
+    Returns:
+    -------
+    str
+        The sha256 hex digest of the canonical JSON of the parts.
+    """
+    parts['cache_format_version'] = CACHE_FORMAT_VERSION
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class TruncationCache():
+    """
+    Size-bounded SQLite cache of float values by key.
+
+    The connection is opened on first use in each process, so the cache can
+    be passed to worker processes.
+
+    Attributes:
+    ----------
+        path (str): The SQLite file.
+        max_entries (int): The number of entries kept, least recently used
+            entries are evicted beyond it.
+        timeout (float): Seconds to wait for a lock held by another process.
+    """
+
+    def __init__(
+                self,
+                path: str,
+                max_entries: int = 1_000_000,
+                timeout: float = 30.0
+            ):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._connection_value = None
+        self._connection_pid = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_connection_value'] = None
+        state['_connection_pid'] = None
+        return state
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns the connection of this process, opening it if needed."""
+        if self._connection_value is None or \
+                self._connection_pid != os.getpid():
+            folder = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(folder, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS truncation ('
+                'key TEXT PRIMARY KEY, value REAL NOT NULL, '
+                'last_used REAL NOT NULL)')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS truncation_last_used '
+                'ON truncation (last_used)')
+            connection.commit()
+            self._connection_value = connection
+            self._connection_pid = os.getpid()
+        return self._connection_value
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, float]:
+        """
+        Looks up keys, and marks the found entries as recently used.
+
+        Parameters:
+        ----------
+        keys : Iterable[str]
+            The keys, see cache_key.
+
+        Returns:
+        -------
+        dict
+            The cached value of each key found.
+        """
+        keys = list(dict.fromkeys(keys))
+        connection = self._connection()
+        found = {}
+        for start in range(0, len(keys), QUERY_CHUNK_SIZE):
+            chunk = keys[start:start + QUERY_CHUNK_SIZE]
+            rows = connection.execute(
+                'SELECT key, value FROM truncation WHERE key IN (' +
+                ','.join('?' * len(chunk)) + ')', chunk).fetchall()
+            found.update(rows)
+        if found:
+            now = time.time()
+            with connection:
+                connection.executemany(
+                    'UPDATE truncation SET last_used = ? WHERE key = ?',
+                    [(now, key) for key in found])
+        return found
+
+    def get(self, key: str) -> Optional[float]:
+        """Returns the cached value of key, or None."""
+        return self.get_many([key]).get(key)
+
+    def put_many(self, values: Dict[str, float]) -> None:
+        """
+        Stores values by key, then evicts the least recently used entries
+        beyond max_entries.
+
+        Parameters:
+        ----------
+        values : dict
+            The value of each key, see cache_key.
+        """
+        if not values:
+            return
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO truncation (key, value, last_used) '
+                'VALUES (?, ?, ?)',
+                [(key, float(value), now) for key, value in values.items()])
+            excess = connection.execute(
+                'SELECT COUNT(*) FROM truncation').fetchone()[0] \
+                - self.max_entries
+            if excess > 0:
+                connection.execute(
+                    'DELETE FROM truncation WHERE key IN (SELECT key FROM '
+                    'truncation ORDER BY last_used LIMIT ?)', (excess,))
+
+    def put(self, key: str, value: float) -> None:
+        """Stores one value, see put_many."""
+        self.put_many({key: value})
+
+    def __len__(self) -> int:
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM truncation').fetchone()[0]
+
+    def close(self) -> None:
+        """Closes the connection of this process."""
+        if self._connection_value is not None:
+            self._connection_value.close()
+        self._connection_value = None
+        self._connection_pid = None